@@ -10,6 +10,7 @@ from dtest import Tester, create_ks, mk_bman_path
 from tools.assertions import (assert_all, assert_invalid, assert_one,
                               assert_unavailable)
 from tools.jmxutils import (JolokiaAgent, make_mbean)
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 ported_to_in_jvm = pytest.mark.ported_to_in_jvm
@@ -377,7 +378,7 @@ class TestBatch(Tester):
                                      protocol_version=protocol_version, install_byteman=True)
 
         coordinator = self.cluster.nodelist()[coordinator_idx]
-        coordinator.byteman_submit([mk_bman_path('fail_after_batchlog_write.btm')])
+        byteman_submit(coordinator, [mk_bman_path('fail_after_batchlog_write.btm')])
         logger.debug("Injected byteman scripts to enable batchlog replay {}".format(coordinator.name))
 
         query = """
@@ -22,6 +22,7 @@ from tools.assertions import (assert_almost_equal, assert_bootstrap_state, asser
 from tools.data import query_c1c2
 from tools.intervention import InterruptBootstrap, KillOnBootstrap, KillOnReadyToBootstrap
 from tools.misc import new_node, generate_ssl_stores
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 ported_to_in_jvm = pytest.mark.ported_to_in_jvm
@@ -191,7 +192,7 @@ class BootstrapTester(Tester):
 
         logger.debug("Submitting byteman script to {} to".format(node1.name))
         # Sleep longer than streaming_socket_timeout_in_ms to make sure the node will not be killed
-        node1.byteman_submit([mk_bman_path('stream_5s_sleep.btm')])
+        byteman_submit(node1, [mk_bman_path('stream_5s_sleep.btm')])
 
         # Bootstraping a new node with very small streaming_socket_timeout_in_ms
         node2 = new_node(cluster)
@@ -450,9 +451,9 @@ class BootstrapTester(Tester):
         cluster.start()
         # kill stream to node3 in the middle of streaming to let it fail
         if cluster.version() < '4.0':
-            node1.byteman_submit([self.byteman_submit_path_pre_4_0])
+            byteman_submit(node1, [self.byteman_submit_path_pre_4_0])
         else:
-            node1.byteman_submit([self.byteman_submit_path_4_0])
+            byteman_submit(node1, [self.byteman_submit_path_4_0])
         node1.stress(['write', 'n=1K', 'no-warmup', 'cl=TWO', '-schema', 'replication(factor=2)', '-rate', 'threads=50'])
         cluster.flush()
 
@@ -1019,9 +1020,9 @@ class BootstrapTester(Tester):
         cluster.start()
         # kill stream to node2 in the middle of streaming to let it fail
         if cluster.version() < '4.0':
-            node1.byteman_submit([self.byteman_submit_path_pre_4_0])
+            byteman_submit(node1, [self.byteman_submit_path_pre_4_0])
         else:
-            node1.byteman_submit([self.byteman_submit_path_4_0])
+            byteman_submit(node1, [self.byteman_submit_path_4_0])
         node1.stress(['write', 'n=1K', 'no-warmup', 'cl=ONE', '-schema', 'replication(factor=3)', '-rate', 'threads=50', '-mode', 'native', 'cql3', 'user=cassandra', 'password=cassandra'])
         cluster.flush()
 
@@ -1049,11 +1050,11 @@ class BootstrapTester(Tester):
 
         # kill stream to node3 in the middle of streaming to let it fail
         if cluster.version() < '4.0':
-            node1.byteman_submit([self.byteman_submit_path_pre_4_0])
-            node2.byteman_submit([self.byteman_submit_path_pre_4_0])
+            byteman_submit(node1, [self.byteman_submit_path_pre_4_0])
+            byteman_submit(node2, [self.byteman_submit_path_pre_4_0])
         else:
-            node1.byteman_submit([self.byteman_submit_path_4_0])
-            node2.byteman_submit([self.byteman_submit_path_4_0])
+            byteman_submit(node1, [self.byteman_submit_path_4_0])
+            byteman_submit(node2, [self.byteman_submit_path_4_0])
         node3.start(jvm_args=["-Dcassandra.write_survey=true", "-Dcassandra.ring_delay_ms=5000", "-Dcassandra.reset_bootstrap_progress=false"])
         self.assert_log_had_msg(node3, 'Some data streaming failed')
         self.assert_log_had_msg(node3, "Not starting client transports in write_survey mode as it's bootstrapping or auth is enabled")
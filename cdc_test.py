@@ -19,6 +19,7 @@ from ccmlib.node import Node
 from cqlsh_tests.cqlsh_tools import assert_resultset_contains
 from dtest import Tester, create_ks, logger
 from tools.assertions import assert_length_equal
+from tools.commitlog import segment_files, segment_table_ids
 from tools.data import rows_to_list
 from tools.files import size_of_files_in_dir
 from tools.funcutils import get_rate_limited_function
@@ -603,6 +604,9 @@ class TestCDC(Tester):
                               for name in source_path if name.endswith('_cdc.idx')}
         # assertNotEqual(source_cdc_indexes, {})
         assert source_cdc_indexes != {}
+        # and the segments in cdc_raw hold the mutations of the CDC table
+        assert any(cdc_table_info.options['id'] in segment_table_ids(path)
+                   for path in segment_files(source_path))
 
         # create a new node to use for cdc_raw cl segment replay
         loading_node = self._init_new_loading_node(ks_name, cdc_table_info.create_stmt, self.cluster.version() < '4')
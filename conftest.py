@@ -1,4 +1,5 @@
 import copy
+import fnmatch
 try:
     import collections.abc as collections
 except ImportError:
@@ -14,7 +15,6 @@ from ccmlib.version import LooseVersion
 # Python 3 imports
 from itertools import zip_longest
 
-import ccmlib.repository
 import netifaces as ni
 import pytest
 from ccmlib.common import validate_install_dir, is_win, get_version_from_build
@@ -25,7 +25,8 @@ from dtest import running_in_docker, cleanup_docker_environment_before_test_exec
 from dtest_config import DTestConfig
 from dtest_setup import DTestSetup
 from dtest_setup_overrides import DTestSetupOverrides
-from upgrade_tests import upgrade_manifest
+from tools import collection_cache, harness_profile, phase_timing
+from upgrade_tests import build_cache, upgrade_manifest
 
 logger = logging.getLogger(__name__)
 
@@ -105,8 +106,35 @@ def pytest_addoption(parser):
                      help="Comma-separated list of target version names (e.g., 'indev_5_0_x'). Narrows results from --upgrade-version-selection")
     parser.addoption("--upgrade-target-version-only", action="store_true", default=False,
                      help="When running upgrade tests, only run tests upgrading to the current version")
+    parser.addoption("--share-upgrade-prefixes", action="store_true", default=False,
+                     help="Run upgrade tests depth first through their upgrade paths, and resume parallel upgrade "
+                          "tests from a snapshot of the longest version prefix already run by another test")
+    parser.addoption("--rolling-upgrade-batch-size", action="store", default=1, type=int,
+                     help="Max number of nodes the rolling upgrade tests restart together, in rack-aware "
+                          "batches which keep QUORUM on every token range")
+    parser.addoption("--warm-upgrade-build-cache", action="store_true", default=False,
+                     help="Build every version needed by the upgrade paths selected with --upgrade-version-selection "
+                          "(and the source/target filters) into the upgrade build cache, then exit without running tests")
     parser.addoption("--metatests", action="store_true", default=False,
                      help="Run only meta tests")
+    parser.addoption("--phase-timings-file", action="store", default=None,
+                     help="Write a json summary of the time every test spent in each of its phases to this "
+                          "path (see tools/phase_timing.py)")
+    parser.addoption("--profile-harness", action="store_true", default=False,
+                     help="Profile the setup, call and teardown of every test, writing a profile per test and "
+                          "a report of the top functions of the session to --profile-harness-dir "
+                          "(see tools/harness_profile.py)")
+    parser.addoption("--profile-harness-dir", action="store", default=os.path.join("logs", "harness_profiles"),
+                     help="Directory the profiles of --profile-harness are written to")
+    parser.addoption("--profile-harness-top", action="store", default=30, type=int,
+                     help="Number of functions listed in the report of --profile-harness")
+    parser.addoption("--ignore-unsupported-modules", action="store_true", default=False,
+                     help="Do not collect the test modules whose tests all have a since max_version older "
+                          "than the version under test (e.g. the thrift tests on 4.0+), rather than "
+                          "importing them to skip every test")
+    parser.addoption("--collection-cache", action="store_true", default=False,
+                     help="Cache the tests selected with the given options, and only collect the modules "
+                          "holding them when they are cached (see tools/collection_cache.py)")
 
 
 def pytest_configure(config):
@@ -115,8 +143,89 @@ def pytest_configure(config):
         dtest_config = DTestConfig()
         dtest_config.setup(config)
         upgrade_manifest.set_config(config)
+        config.stash[_cassandra_version_stash_key] = dtest_config.cassandra_version_from_build
+        if config.getoption("--warm-upgrade-build-cache"):
+            warm_upgrade_build_cache()
         if dtest_config.metatests and config.args[0] == str(os.getcwd()):
             config.args = ['./meta_tests']
+        if config.getoption("--collection-cache"):
+            use_collection_cache(config)
+        if config.getoption("--profile-harness"):
+            config.stash[_harness_profiler_stash_key] = harness_profile.HarnessProfiler(
+                config.getoption("--profile-harness-dir"), config.getoption("--profile-harness-top"))
+
+
+_cassandra_version_stash_key = pytest.StashKey()
+_collection_cache_stash_key = pytest.StashKey()
+_harness_profiler_stash_key = pytest.StashKey()
+
+
+def use_collection_cache(config):
+    """
+    Narrows the collection down to the modules holding the tests the collection cache has
+    for the current arguments. If it has none, the selected tests are stored once collected,
+    see pytest_collection_finish.
+    """
+    cache = collection_cache.CollectionCache()
+    key = collection_cache.collection_key(cache, config.args, config.getoption,
+                                          sufficient_system_resources_for_resource_intensive_tests(),
+                                          java_version=upgrade_manifest.CURRENT_JAVA_VERSION,
+                                          keyword=config.getoption("keyword"),
+                                          markexpr=config.getoption("markexpr"),
+                                          ignore=config.getoption("ignore"))
+    tests = cache.get(key)
+    config.stash[_collection_cache_stash_key] = (cache, key, tests is not None)
+    if tests is None:
+        logger.info("The selected tests are not in the collection cache yet")
+        return
+    # only paths can be narrowed down: node ids already select less than their module
+    if tests and all(os.path.isdir(arg) for arg in config.args):
+        config.args = [os.path.join(cache.root, module) for module in collection_cache.cached_modules(tests)]
+        logger.info("Collecting the {} modules holding the {} cached tests".format(len(config.args), len(tests)))
+
+
+def pytest_ignore_collect(collection_path, config):
+    """
+    With --ignore-unsupported-modules, ignores the test modules whose tests would all be skipped by
+    fixture_since, so that their imports (e.g. the thrift bindings) are not loaded at all.
+    """
+    if not config.getoption("--ignore-unsupported-modules") or collection_path.suffix != '.py':
+        return None
+    current_version = config.stash.get(_cassandra_version_stash_key, None)
+    # the since marks of upgrade tests apply to the versions of their upgrade path
+    if current_version is None or 'upgrade_tests' in collection_path.parts:
+        return None
+    if not any(fnmatch.fnmatch(collection_path.name, pattern) for pattern in config.getini("python_files")):
+        return None
+    max_versions = collection_cache.module_max_versions(str(collection_path))
+    if max_versions and all(loose_version_compare(current_version, LooseVersion(max_version)) > 0
+                            for max_version in max_versions):
+        logger.info("Not collecting {}, whose tests all stop at {} or before".format(
+            collection_path.name, max(max_versions, key=LooseVersion)))
+        return True
+    return None
+
+
+def pytest_collection_finish(session):
+    cached = session.config.stash.get(_collection_cache_stash_key, None)
+    if cached is None:
+        return
+    cache, key, hit = cached
+    # a collection which failed to import some module is not worth caching
+    if not hit and session.testsfailed == 0:
+        cache.put(key, [collection_cache.item_entry(item) for item in session.items])
+    cache.save()
+
+
+def warm_upgrade_build_cache():
+    version_metas = []
+    for path in upgrade_manifest.build_upgrade_pairs():
+        version_metas.extend(upgrade_manifest.jdk_compatible_steps([path.starting_meta, path.upgrade_meta]))
+    install_dirs = build_cache.warm_up(version_metas)
+    for version, install_dir in sorted(install_dirs.items()):
+        logger.info("{}: {}".format(version, install_dir or "not cacheable"))
+    pytest.exit("Warmed the upgrade build cache with {} of {} versions".format(
+        len([d for d in install_dirs.values() if d]), len(install_dirs)), returncode=0)
 
 
 def sufficient_system_resources_for_resource_intensive_tests():
@@ -327,8 +436,74 @@ def fixture_dtest_create_cluster_func():
     return DTestSetup.create_ccm_cluster
 
 
+_phase_timing_stash_key = pytest.StashKey()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_setup(item):
+    phase_timing.start_test()
+    profiler = item.config.stash.get(_harness_profiler_stash_key, None)
+    if profiler is not None:
+        profiler.start_test(item.nodeid)
+    with phase_timing.phase('setup'):
+        yield
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    with phase_timing.phase('test_body'):
+        yield
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item, nextitem):
+    with phase_timing.phase('teardown'):
+        yield
+    profiler = item.config.stash.get(_harness_profiler_stash_key, None)
+    if profiler is not None:
+        profiler.finish_test()
+
+
+def record_phase_timings(item):
+    """
+    Adds the phases of the test which just tore down to its junit properties and to the
+    json summary of the session.
+    """
+    durations = phase_timing.finish_test()
+    if not durations:
+        return
+    item.user_properties.extend(phase_timing.junit_properties(durations))
+    report = item.config.stash.setdefault(_phase_timing_stash_key, phase_timing.PhaseTimingReport())
+    report.record(item.nodeid, durations)
+
+
+def pytest_sessionfinish(session):
+    profiler = session.config.stash.get(_harness_profiler_stash_key, None)
+    if profiler is not None:
+        profiler.write_report(xdist_worker_path(harness_profile.REPORT_NAME))
+    report = session.config.stash.get(_phase_timing_stash_key, None)
+    path = session.config.getoption("--phase-timings-file")
+    if report is None or not path:
+        return
+    report.write(xdist_worker_path(path))
+
+
+def xdist_worker_path(path):
+    """
+    @return the path suffixed with the name of the xdist worker, if running in one
+    """
+    worker = os.environ.get('PYTEST_XDIST_WORKER')
+    if not worker:
+        return path
+    root, ext = os.path.splitext(path)
+    return "{}-{}{}".format(root, worker, ext)
+
+
 @pytest.hookimpl(hookwrapper=True, tryfirst=True)
 def pytest_runtest_makereport(item, call):
+    # the junit properties of a test are those of its item when its teardown report is made
+    if call.when == 'teardown':
+        record_phase_timings(item)
     outcome = yield
     rep = outcome.get_result()
     setattr(item, "rep_" + rep.when, rep)
@@ -373,7 +548,8 @@ def fixture_dtest_setup(request,
     failed = False
     try:
         if not dtest_setup.allow_log_errors:
-            errors = check_logs_for_errors(dtest_setup)
+            with phase_timing.phase('log_scan'):
+                errors = check_logs_for_errors(dtest_setup)
             if len(errors) > 0:
                 failed = True
                 pytest.fail(reason='Unexpected error found in node logs (see stdout for full details). Errors: [{errors}]'
@@ -382,7 +558,8 @@ def fixture_dtest_setup(request,
         try:
             # save the logs for inspection
             if failed or not dtest_config.delete_logs:
-                copy_logs(request, dtest_setup.cluster)
+                with phase_timing.phase('log_copy'):
+                    copy_logs(request, dtest_setup.cluster)
         except Exception as e:
             logger.error("Error saving log: %s", str(e))
         finally:
@@ -464,7 +641,7 @@ def fixture_since(request, fixture_dtest_setup):
             if 'current' == upgrade_path.starting_meta.variant:
                 starting_version = LooseVersion(upgrade_path.starting_meta.version)
             else:
-                ccm_repo_cache_dir, _ = ccmlib.repository.setup(upgrade_path.starting_meta.version)
+                ccm_repo_cache_dir = build_cache.install_dir_for(upgrade_path.starting_meta)
                 starting_version = get_version_from_build(ccm_repo_cache_dir)
             skip_msg = _skip_msg(starting_version, since, max_version)
             if skip_msg:
@@ -472,7 +649,7 @@ def fixture_since(request, fixture_dtest_setup):
             if 'current' == upgrade_path.upgrade_meta.variant:
                 ending_version = LooseVersion(upgrade_path.upgrade_meta.version)
             else:
-                ccm_repo_cache_dir, _ = ccmlib.repository.setup(upgrade_path.upgrade_meta.version)
+                ccm_repo_cache_dir = build_cache.install_dir_for(upgrade_path.upgrade_meta)
                 ending_version = get_version_from_build(ccm_repo_cache_dir)
             skip_msg = _skip_msg(ending_version, since, max_version)
             if skip_msg:
@@ -520,12 +697,12 @@ def fixture_ported_to_in_jvm(request, fixture_dtest_setup):
                 skip_msg = _skip_ported_msg(LooseVersion(upgrade_path.upgrade_meta.family), ported_from_version)
                 if skip_msg:
                     pytest.skip(skip_msg)
-            ccm_repo_cache_dir, _ = ccmlib.repository.setup(upgrade_path.starting_meta.version)
+            ccm_repo_cache_dir = build_cache.install_dir_for(upgrade_path.starting_meta)
             starting_version = get_version_from_build(ccm_repo_cache_dir)
             skip_msg = _skip_ported_msg(starting_version, ported_from_version)
             if skip_msg:
                 pytest.skip(skip_msg)
-            ccm_repo_cache_dir, _ = ccmlib.repository.setup(upgrade_path.upgrade_meta.version)
+            ccm_repo_cache_dir = build_cache.install_dir_for(upgrade_path.upgrade_meta)
             ending_version = get_version_from_build(ccm_repo_cache_dir)
             skip_msg = _skip_ported_msg(ending_version, ported_from_version)
             if skip_msg:
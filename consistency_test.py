@@ -16,6 +16,7 @@ from tools.assertions import (assert_all, assert_length_equal, assert_none,
 from dtest import MultiError, Tester, create_ks, create_cf
 from tools.data import (create_c1c2_table, insert_c1c2, insert_columns,
                         query_c1c2, rows_to_list)
+from tools.token_ranges import TokenRangeVerifier
 
 since = pytest.mark.since
 ported_to_in_jvm = pytest.mark.ported_to_in_jvm
@@ -1557,10 +1558,11 @@ class TestConsistency(Tester):
 
         node1.stop(wait_other_notice=True)
 
-        # Check node2 for all the keys that should have been repaired
+        # Check node2 for all the keys that should have been repaired, range by range
         session = self.patient_cql_connection(node2, keyspace='ks')
-        for n in range(0, 10000):
-            query_c1c2(session, n, ConsistencyLevel.ONE)
+        verifier = TokenRangeVerifier(session, 'ks', 'cf', columns=('key', 'c1', 'c2'),
+                                      consistency_level=ConsistencyLevel.ONE)
+        verifier.verify(('k{}'.format(n), 'value1', 'value2') for n in range(0, 10000))
 
     def test_quorum_available_during_failure(self):
         cl = ConsistencyLevel.QUORUM
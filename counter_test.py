@@ -9,6 +9,7 @@ from cassandra.query import SimpleStatement
 
 from tools.assertions import assert_invalid, assert_length_equal, assert_one
 from dtest import Tester, create_ks, create_cf, mk_bman_path
+from tools.byteman import preload_byteman_rules, versioned_rule_path
 from tools.data import rows_to_list
 from ccmlib.version import LooseVersion
 
@@ -101,12 +102,9 @@ class TestCounters(Tester):
         nodes = cluster.nodelist()
         # Have node 1 and 3 cheat a bit during the leader election for a counter mutation; note that cheating
         # takes place iff there is an actual chance for node 2 to be picked.
-        if cluster.version() < '4.0':
-            nodes[0].update_startup_byteman_script(mk_bman_path('pre4.0/election_counter_leader_favor_node2.btm'))
-            nodes[2].update_startup_byteman_script(mk_bman_path('pre4.0/election_counter_leader_favor_node2.btm'))
-        else:
-            nodes[0].update_startup_byteman_script(mk_bman_path('4.0/election_counter_leader_favor_node2.btm'))
-            nodes[2].update_startup_byteman_script(mk_bman_path('4.0/election_counter_leader_favor_node2.btm'))
+        favor_node2 = versioned_rule_path('election_counter_leader_favor_node2.btm', cluster.version())
+        preload_byteman_rules(nodes[0], [favor_node2])
+        preload_byteman_rules(nodes[2], [favor_node2])
 
         cluster.start()
         session = self.patient_cql_connection(nodes[0])
@@ -116,7 +114,7 @@ class TestCounters(Tester):
         # Now stop the node and restart but first install a rule to slow down how fast node 2 will update the list
         # nodes that are alive
         nodes[1].stop(wait=True, wait_other_notice=False)
-        nodes[1].update_startup_byteman_script(mk_bman_path('gossip_alive_callback_sleep.btm'))
+        preload_byteman_rules(nodes[1], [mk_bman_path('gossip_alive_callback_sleep.btm')])
         nodes[1].start(no_wait=True, wait_other_notice=False)
 
         # Until node 2 is fully alive try to force other nodes to pick him as mutation leader.
@@ -26,6 +26,7 @@ from tools.data import rows_to_list
 from tools.metadata_wrapper import (UpdatingClusterMetadataWrapper,
                                     UpdatingKeyspaceMetadataWrapper,
                                     UpdatingTableMetadataWrapper)
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -776,7 +777,7 @@ class TestMiscellaneousCQL(CQLTester):
         cluster = self.cluster
         cluster.populate(3, install_byteman=True).start()
         node1, _, node3 = cluster.nodelist()
-        node3.byteman_submit([mk_bman_path('truncate_fail.btm')])
+        byteman_submit(node3, [mk_bman_path('truncate_fail.btm')])
 
         session = self.patient_exclusive_cql_connection(node1)
         create_ks(session, 'ks', 3)
@@ -0,0 +1,9 @@
+import pytest
+
+from .cqlsh_worker import close_cqlsh_workers
+
+
+@pytest.fixture(autouse=True)
+def fixture_close_cqlsh_workers():
+    yield
+    close_cqlsh_workers()
@@ -1,7 +1,16 @@
 from __future__ import unicode_literals
 
 import csv
+import json
+import math
+import multiprocessing
+import os
 import random
+import shutil
+import tempfile
+import zlib
+from collections import Counter, namedtuple
+from itertools import zip_longest
 from typing import List
 
 import cassandra
@@ -27,13 +36,127 @@ def csv_rows(filename, delimiter=None):
             yield row
 
 
-def assert_csvs_items_equal(filename1, filename2):
+# the comparisons below spill their inputs to disk in partitions of about this
+# many bytes, each compared in memory by a worker process
+COMPARE_PARTITION_BYTES = 32 * 1024 * 1024
+
+ItemsDiff = namedtuple('ItemsDiff', 'count_x count_y only_x only_y num_only_x num_only_y')
+
+
+def _encode_item(item):
+    return json.dumps(item, default=str, ensure_ascii=False)
+
+
+def _spill_partitions(items, directory, side, num_partitions):
+    """
+    Writes every item to one of num_partitions files, chosen by a hash of the item,
+    so that equal items of both sides end up in partitions with the same index.
+
+    @return the number of items written
+    """
+    files = [open(os.path.join(directory, '{}-{}'.format(side, i)), 'w', encoding='utf-8')
+             for i in range(num_partitions)]
+    count = 0
+    try:
+        for item in items:
+            line = _encode_item(item)
+            files[zlib.crc32(line.encode('utf-8')) % num_partitions].write(line + '\n')
+            count += 1
+    finally:
+        for f in files:
+            f.close()
+    return count
+
+
+def _diff_counts(lines_x, lines_y, max_reported):
+    """
+    @return an ItemsDiff of two iterables of encoded items, treated as multisets
+    """
+    counts = Counter()
+    count_x = count_y = 0
+    for line in lines_x:
+        counts[line] += 1
+        count_x += 1
+    for line in lines_y:
+        counts[line] -= 1
+        count_y += 1
+    only_x = sorted(line for line, c in counts.items() if c > 0)
+    only_y = sorted(line for line, c in counts.items() if c < 0)
+    return ItemsDiff(count_x, count_y, only_x[:max_reported], only_y[:max_reported],
+                     sum(counts[line] for line in only_x), -sum(counts[line] for line in only_y))
+
+
+def _diff_partition(args):
+    path_x, path_y, max_reported = args
+    with open(path_x, encoding='utf-8') as x, open(path_y, encoding='utf-8') as y:
+        return _diff_counts((line.rstrip('\n') for line in x), (line.rstrip('\n') for line in y), max_reported)
+
+
+def diff_items(items_x, items_y, size_hint=0, max_reported=10, processes=None):
+    """
+    Compares two iterables of items (csv lines, or rows as lists of strings) regardless
+    of their order, like comparing both sides sorted but without sorting them in memory.
+
+    If size_hint, the expected size in bytes of either side, is over COMPARE_PARTITION_BYTES,
+    both sides are streamed into hash partitions on disk instead of being held in memory,
+    and the partitions are compared by a pool of processes.
+
+    @return an ItemsDiff with the number of items of each side, and the first (in sorted
+            order) max_reported items found on one side only
+    """
+    num_partitions = int(math.ceil(size_hint / COMPARE_PARTITION_BYTES))
+    if num_partitions <= 1:
+        diff = _diff_counts(map(_encode_item, items_x), map(_encode_item, items_y), max_reported)
+    else:
+        directory = tempfile.mkdtemp(prefix='dtest-csv-diff-')
+        try:
+            _spill_partitions(items_x, directory, 'x', num_partitions)
+            _spill_partitions(items_y, directory, 'y', num_partitions)
+            tasks = [(os.path.join(directory, 'x-{}'.format(i)), os.path.join(directory, 'y-{}'.format(i)),
+                      max_reported) for i in range(num_partitions)]
+            with multiprocessing.Pool(processes or min(num_partitions, os.cpu_count() or 1)) as pool:
+                diffs = pool.map(_diff_partition, tasks)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        diff = ItemsDiff(sum(d.count_x for d in diffs), sum(d.count_y for d in diffs),
+                         sorted(line for d in diffs for line in d.only_x)[:max_reported],
+                         sorted(line for d in diffs for line in d.only_y)[:max_reported],
+                         sum(d.num_only_x for d in diffs), sum(d.num_only_y for d in diffs))
+    return diff._replace(only_x=[json.loads(line) for line in diff.only_x],
+                         only_y=[json.loads(line) for line in diff.only_y])
+
+
+def format_items_diff(diff, name_x='x', name_y='y'):
+    message = "{} has {} items, {} has {}".format(name_x, diff.count_x, name_y, diff.count_y)
+    for name, only, num_only in ((name_x, diff.only_x, diff.num_only_x), (name_y, diff.only_y, diff.num_only_y)):
+        if num_only:
+            message += "\n{} items only in {}, the first {}:".format(num_only, name, len(only))
+            message += ''.join("\n  {!r}".format(item) for item in only)
+    return message
+
+
+def first_ordered_difference(items_x, items_y):
+    """
+    Compares two iterables of items in order, one item at a time.
+
+    @return the (index, item of x, item of y) of the first position they differ at,
+            with None for the side which ran out of items, or None if they are equal
+    """
+    missing = object()
+    for i, (x, y) in enumerate(zip_longest(items_x, items_y, fillvalue=missing)):
+        if x != y:
+            return i, None if x is missing else x, None if y is missing else y
+    return None
+
+
+def assert_csvs_items_equal(filename1, filename2, max_reported=10):
+    """
+    Asserts two files have the same lines, in any order, without holding either in memory.
+    """
     with open(filename1, 'r') as x, open(filename2, 'r') as y:
-        list_x = list(x.readlines())
-        list_y = list(y.readlines())
-        list_x.sort()
-        list_y.sort()
-        assert list_x == list_y
+        diff = diff_items(x, y, size_hint=max(os.path.getsize(filename1), os.path.getsize(filename2)),
+                          max_reported=max_reported)
+    assert not diff.num_only_x and not diff.num_only_y, format_items_diff(diff, filename1, filename2)
 
 
 def random_list(gen=None, n=None):
@@ -51,11 +174,11 @@ def random_list(gen=None, n=None):
 
 
 def write_rows_to_csv(filename, data):
-    with open(filename, 'w') as csvfile:
-        writer = csv.writer(csvfile)
-        for row in data:
-            writer.writerow(row)
-        csvfile.close
+    """
+    Writes rows to a csv file. See csv_generator for generating large files of random rows.
+    """
+    with open(filename, 'w', buffering=4 * 1024 * 1024) as csvfile:
+        csv.writer(csvfile).writerows(data)
 
 
 def deserialize_date_fallback_int(byts, protocol_version):
@@ -0,0 +1,205 @@
+"""
+Long-lived cqlsh processes, so that tests running many cqlsh command batches
+don't pay for starting the Python interpreter and importing cqlsh and the
+driver for every batch.
+
+A worker is started once per node and set of cqlsh options, and then fed one
+command batch at a time over its stdin. The worker (cqlsh_worker_server.py) tells
+it is ready, then each request and each reply is a single JSON line:
+
+    {"stdin": <commands>}
+    {"stdout": <text>, "stderr": <text>, "rc": <exit status>}
+
+The worker is started the way node.run_cqlsh starts cqlsh: with the environment
+and arguments of ccm's client extension hooks, through the node's bin/cqlsh, so
+that it runs under the interpreter bin/cqlsh picks and with the arguments it
+passes on. bin/cqlsh is copied next to a cqlsh.py which starts the worker in its
+place. Nodes whose bin/cqlsh can't start the worker that way (e.g. one which
+does not run the cqlsh.py next to it) fall back to node.run_cqlsh.
+
+The worker runs the node's `bin/cqlsh.py` in process for every request, as if it
+had been started with those arguments and stdin, with file descriptors 1 and 2
+redirected to temporary files so that the output of the processes COPY forks is
+captured too. Replies are written to a copy of the original stdout, which
+nothing else writes to.
+
+cqlsh reads its options and cqlshrc again for every request, but anything cqlsh
+keeps at module level survives between requests.
+"""
+import atexit
+import json
+import logging
+import os
+import select
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import OrderedDict, namedtuple
+
+from ccmlib import extension
+from ccmlib.node import ToolError
+
+logger = logging.getLogger(__name__)
+
+# how many idle workers are kept around, across nodes and option sets
+MAX_WORKERS = 8
+STARTUP_TIMEOUT = 30
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cqlsh_worker_server.py')
+
+# the cqlsh.py next to the copy of bin/cqlsh, run with the interpreter and arguments
+# bin/cqlsh picks
+_LAUNCHER = """import os
+import sys
+os.execv(sys.executable, [sys.executable, {server!r}, {cqlsh_py!r}] + sys.argv[1:])
+"""
+
+
+class CqlshWorkerError(Exception):
+    pass
+
+
+class CqlshWorker(object):
+    """
+    A cqlsh worker process for one node and set of cqlsh options.
+
+    @param node the node to connect to
+    @param cqlsh_options the cqlsh command line options, as passed to node.run_cqlsh
+    """
+
+    def __init__(self, node, cqlsh_options=None):
+        self.cqlsh_options = list(cqlsh_options or [])
+        cqlsh = node.get_tool('cqlsh')
+        cqlsh_py = cqlsh + '.py'
+        for path in (cqlsh, cqlsh_py):
+            if not os.path.exists(path):
+                raise CqlshWorkerError("{} does not exist".format(path))
+
+        # the same environment and arguments as node.run_cqlsh
+        env = node.get_env()
+        extension.append_to_client_env(node, env)
+        args = list(self.cqlsh_options)
+        extension.append_to_cqlsh_args(node, env, args)
+        host, port = node.network_interfaces['binary']
+        args += [host, str(port)]
+
+        self.launcher_dir = tempfile.mkdtemp(prefix='cqlsh_worker')
+        shutil.copy(cqlsh, self.launcher_dir)
+        with open(os.path.join(self.launcher_dir, 'cqlsh.py'), 'w') as f:
+            f.write(_LAUNCHER.format(server=SERVER, cqlsh_py=os.path.abspath(cqlsh_py)))
+        try:
+            self.process = subprocess.Popen([os.path.join(self.launcher_dir, 'cqlsh')] + args, env=env,
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                            stderr=subprocess.DEVNULL, universal_newlines=True, encoding='utf-8')
+        except OSError:
+            shutil.rmtree(self.launcher_dir, ignore_errors=True)
+            raise
+        if not self._read_reply(STARTUP_TIMEOUT).get('ready'):
+            self.close()
+            raise CqlshWorkerError("{} did not start a cqlsh worker".format(cqlsh))
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def _read_reply(self, timeout):
+        readable, _, _ = select.select([self.process.stdout], [], [], timeout)
+        line = self.process.stdout.readline() if readable else None
+        if not line:
+            self.close()
+            if line is None:
+                raise CqlshWorkerError("cqlsh worker {} did not reply within {}s".format(self.process.pid, timeout))
+            raise CqlshWorkerError("cqlsh worker {} exited with status {}".format(
+                self.process.pid, self.process.returncode))
+        try:
+            return json.loads(line)
+        except ValueError:
+            self.close()
+            raise CqlshWorkerError("cqlsh worker {} replied {!r}".format(self.process.pid, line))
+
+    def run(self, stdin_text, timeout=600):
+        """
+        Runs one command batch.
+
+        @return the (stdout, stderr, rc) of the batch
+        """
+        try:
+            self.process.stdin.write(json.dumps({'stdin': stdin_text}) + '\n')
+            self.process.stdin.flush()
+        except OSError as e:
+            raise CqlshWorkerError("cqlsh worker {} is gone: {}".format(self.process.pid, e))
+        reply = self._read_reply(timeout)
+        return reply['stdout'], reply['stderr'], reply['rc']
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process.stdout.close()
+        shutil.rmtree(self.launcher_dir, ignore_errors=True)
+
+
+_workers = OrderedDict()
+# the install directories whose bin/cqlsh could not start a worker
+_unsupported_install_dirs = set()
+
+
+def _get_worker(node, cqlsh_options):
+    key = (node.get_path(), node.get_install_dir(), tuple(cqlsh_options))
+    worker = _workers.pop(key, None)
+    if worker is None or not worker.is_alive():
+        worker = CqlshWorker(node, cqlsh_options)
+        logger.debug("Started cqlsh worker {} for {} with options {}".format(
+            worker.process.pid, node.name, cqlsh_options))
+    _workers[key] = worker
+    while len(_workers) > MAX_WORKERS:
+        _, oldest = _workers.popitem(last=False)
+        oldest.close()
+    return worker
+
+
+def close_cqlsh_workers():
+    """
+    Stops every cqlsh worker. Called after every cqlsh test, since the next test
+    gets a new cluster.
+    """
+    while _workers:
+        _, worker = _workers.popitem()
+        worker.close()
+
+
+atexit.register(close_cqlsh_workers)
+
+
+def run_cqlsh(node, cmds, cqlsh_options=None, timeout=600):
+    """
+    Same as node.run_cqlsh, but runs the commands in a cqlsh worker kept running
+    between calls, unless no worker can be started for this node.
+
+    @return a (stdout, stderr, rc) named tuple
+    @raise ToolError if cqlsh exits with a non zero status
+    """
+    cqlsh_options = list(cqlsh_options or [])
+    if cmds is None or sys.platform == 'win32' or node.get_install_dir() in _unsupported_install_dirs:
+        return node.run_cqlsh(cmds=cmds, cqlsh_options=cqlsh_options)
+    try:
+        worker = _get_worker(node, cqlsh_options)
+    except (CqlshWorkerError, OSError) as e:
+        logger.debug("Could not start a cqlsh worker, using a new cqlsh process: {}".format(e))
+        _unsupported_install_dirs.add(node.get_install_dir())
+        return node.run_cqlsh(cmds=cmds, cqlsh_options=cqlsh_options)
+
+    # the same input node.run_cqlsh writes to cqlsh's stdin
+    stdin_text = ''.join(cmd.strip() + ';\n' for cmd in cmds.split(';') if cmd.strip()) + 'quit;\n'
+    try:
+        stdout, stderr, rc = worker.run(stdin_text, timeout=timeout)
+    except CqlshWorkerError as e:
+        raise ToolError(['cqlsh', cmds, cqlsh_options], -1, '', str(e))
+    if rc != 0:
+        raise ToolError(['cqlsh', cmds, cqlsh_options], rc, stdout, stderr)
+    ret = namedtuple('Subprocess_Return', 'stdout stderr rc')
+    return ret(stdout=stdout, stderr=stderr, rc=rc)
@@ -0,0 +1,99 @@
+"""
+The cqlsh worker process, see cqlsh_worker: `python cqlsh_worker_server.py <path to cqlsh.py> <cqlsh arguments>`.
+
+It is started by the node's bin/cqlsh, so it runs under whichever interpreter bin/cqlsh
+picks, Python 2.7 for the cqlsh of 3.x, and only uses the standard library.
+"""
+from __future__ import print_function
+
+import io
+import json
+import os
+import runpy
+import sys
+import tempfile
+import traceback
+
+
+def _exit_status(code):
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    # like the interpreter, print a non integer exit code and exit with 1
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _stdin(text):
+    data = text.encode('utf-8')
+    if sys.version_info[0] < 3:
+        return io.BytesIO(data)
+    return io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+
+
+def _run_request(cqlsh_py, argv, stdin_text):
+    """
+    Runs cqlsh.py once in this process with the given arguments and stdin.
+
+    @return a dict with the captured stdout and stderr and the exit status
+    """
+    out, err = tempfile.TemporaryFile(), tempfile.TemporaryFile()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_fds = os.dup(1), os.dup(2)
+    saved_stdin, saved_argv = sys.stdin, sys.argv
+    os.dup2(out.fileno(), 1)
+    os.dup2(err.fileno(), 2)
+    sys.stdin = _stdin(stdin_text)
+    sys.argv = [cqlsh_py] + argv
+    try:
+        runpy.run_path(cqlsh_py, run_name='__main__')
+        rc = 0
+    except SystemExit as e:
+        rc = _exit_status(e.code)
+    except Exception:
+        traceback.print_exc()
+        rc = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        for fd in saved_fds:
+            os.close(fd)
+        sys.stdin, sys.argv = saved_stdin, saved_argv
+
+    reply = {'rc': rc}
+    for name, f in (('stdout', out), ('stderr', err)):
+        f.seek(0)
+        reply[name] = f.read().decode('utf-8', 'replace')
+        f.close()
+    return reply
+
+
+def _serve(cqlsh_py, argv):
+    """
+    Worker loop: tells the client it is ready, then reads one request per line from stdin
+    until it is closed.
+    """
+    replies = io.open(os.dup(1), 'wb')
+    # anything else written to stdout, e.g. by driver threads left behind by a
+    # previous request, must not end up in the replies
+    os.dup2(2, 1)
+
+    def reply(message):
+        replies.write((json.dumps(message) + '\n').encode('utf-8'))
+        replies.flush()
+
+    reply({'ready': True})
+    # not `for line in sys.stdin`, which reads ahead on Python 2
+    for line in iter(sys.stdin.readline, ''):
+        request = json.loads(line)
+        reply(_run_request(cqlsh_py, argv, request['stdin']))
+
+
+if __name__ == '__main__':
+    # the test modules next to this file must not shadow the modules cqlsh imports
+    sys.path.pop(0)
+    _serve(sys.argv[1], sys.argv[2:])
@@ -0,0 +1,237 @@
+"""
+Fast generation of large csv files for the COPY FROM tests and benchmarks.
+
+Rows are generated a column at a time rather than a cell at a time: each column
+of a chunk of rows is produced in bulk from a single random byte string or
+`choices` call and formatted as a value COPY FROM parses, and the chunk is
+then joined into one csv string and written with a single write. Chunks are
+generated by a pool of processes and written in order.
+
+Every chunk is seeded from the seed of the file and its first row, so a file
+only depends on its types, number of rows and seed, not on how many processes
+built it. cached_csv_fixture keeps the files it generates in DTEST_CSV_FIXTURE_DIR
+(by default ~/.ccm/dtest_csv_fixtures) and reuses them between runs.
+
+For example, a million rows of a table with an int key, a text and a list<int>:
+
+    filename = cached_csv_fixture(['int', 'text', 'list<int>'], 1000000, seed=42)
+"""
+import base64
+import datetime
+import hashlib
+import multiprocessing
+import os
+import random
+import re
+import time
+
+# bumped whenever the generated content changes, so that cached fixtures are regenerated
+GENERATOR_VERSION = 1
+CHUNK_ROWS = 50000
+
+_TEXT_LENGTH = 10
+_COLLECTION_SIZES = range(1, 6)
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+_INT_RANGES = {
+    'tinyint': (-2 ** 7, 2 ** 7 - 1),
+    'smallint': (-2 ** 15, 2 ** 15 - 1),
+    'int': (-2 ** 31, 2 ** 31 - 1),
+    'bigint': (-2 ** 63, 2 ** 63 - 1),
+    'counter': (0, 2 ** 31 - 1),
+    'varint': (-2 ** 80, 2 ** 80),
+}
+# types whose values are quoted when inside a collection
+_QUOTED_TYPES = ('ascii', 'text', 'varchar', 'inet', 'timestamp', 'date', 'time')
+
+
+def parse_cql_type(cql_type):
+    """
+    Parses a CQL type into a (name, [subtypes]) tree, e.g. 'map<int, frozen<list<text>>>'
+    into ('map', [('int', []), ('list', [('text', [])])]).
+    """
+    tokens = re.findall(r'[\w]+|[<>,]', cql_type.lower())
+
+    def parse(i):
+        name = tokens[i]
+        i += 1
+        subtypes = []
+        if i < len(tokens) and tokens[i] == '<':
+            while tokens[i] != '>':
+                subtype, i = parse(i + 1)
+                subtypes.append(subtype)
+            i += 1
+        if name == 'frozen':
+            return subtypes[0], i
+        return (name, subtypes), i
+
+    parsed, end = parse(0)
+    if end != len(tokens):
+        raise ValueError("Could not parse CQL type {}".format(cql_type))
+    return parsed
+
+
+def _randbytes(rng, n):
+    return rng.getrandbits(8 * n).to_bytes(n, 'little') if n else b''
+
+
+def _uuids(rng, n, version):
+    hex_digits = _randbytes(rng, 16 * n).hex()
+    variant = '89ab'
+    values = []
+    for i in range(0, 32 * n, 32):
+        h = hex_digits[i:i + 32]
+        values.append('{}-{}-{}{}-{}{}-{}'.format(h[0:8], h[8:12], version, h[13:16],
+                                                  variant[int(h[16], 16) % 4], h[17:20], h[20:32]))
+    return values
+
+
+def _texts(rng, n):
+    chars = base64.b64encode(_randbytes(rng, n * _TEXT_LENGTH)).decode('ascii')
+    return [chars[i:i + _TEXT_LENGTH] for i in range(0, n * _TEXT_LENGTH, _TEXT_LENGTH)]
+
+
+def _simple_column(rng, name, n):
+    """
+    @return n random values of a non collection type, as COPY FROM parses them
+    """
+    if name in _INT_RANGES:
+        low, high = _INT_RANGES[name]
+        if high - low < 2 ** 32:
+            return [str(v + low) for v in rng.choices(range(high - low + 1), k=n)]
+        return [str(rng.getrandbits(high.bit_length() + 1) + low) for _ in range(n)]
+    if name in ('ascii', 'text', 'varchar'):
+        return _texts(rng, n)
+    if name == 'boolean':
+        return rng.choices(('True', 'False'), k=n)
+    if name in ('float', 'double'):
+        return [repr(rng.uniform(-1e6, 1e6)) for _ in range(n)]
+    if name == 'decimal':
+        return ['{:.5f}'.format(rng.uniform(-1e6, 1e6)) for _ in range(n)]
+    if name == 'blob':
+        hex_digits = _randbytes(rng, 8 * n).hex()
+        return ['0x' + hex_digits[i:i + 16] for i in range(0, 16 * n, 16)]
+    if name == 'inet':
+        octets = _randbytes(rng, 3 * n)
+        return ['10.{}.{}.{}'.format(*octets[i:i + 3]) for i in range(0, 3 * n, 3)]
+    if name == 'uuid':
+        return _uuids(rng, n, 4)
+    if name == 'timeuuid':
+        return _uuids(rng, n, 1)
+    if name == 'timestamp':
+        return [time.strftime('%Y-%m-%d %H:%M:%S+0000', time.gmtime(s)) for s in rng.choices(range(2 ** 31), k=n)]
+    if name == 'date':
+        return [(_EPOCH + datetime.timedelta(days=d)).strftime('%Y-%m-%d') for d in rng.choices(range(50000), k=n)]
+    if name == 'time':
+        return ['{:02d}:{:02d}:{:02d}.{:09d}'.format(s // 3600, s // 60 % 60, s % 60, ns)
+                for s, ns in zip(rng.choices(range(86400), k=n), rng.choices(range(10 ** 9), k=n))]
+    if name == 'duration':
+        return ['{}d{}h{}m'.format(d, h, m) for d, h, m in zip(rng.choices(range(365), k=n),
+                                                               rng.choices(range(24), k=n),
+                                                               rng.choices(range(60), k=n))]
+    raise ValueError("Generating {} values is not supported".format(name))
+
+
+def _element_column(rng, cql_type, n):
+    values = generate_column(rng, cql_type, n)
+    if cql_type[0] in _QUOTED_TYPES:
+        return ["'{}'".format(v) for v in values]
+    return values
+
+
+def generate_column(rng, cql_type, n):
+    """
+    @return n random values of the given parsed CQL type (see parse_cql_type), as strings
+            COPY FROM parses. These are not what COPY TO would export: set and map
+            elements are not sorted, doubles have all of their digits and timestamps
+            have no milliseconds
+    """
+    name, subtypes = cql_type
+    if name == 'tuple':
+        elements = [_element_column(rng, subtype, n) for subtype in subtypes]
+        return ['({})'.format(', '.join(values)) for values in zip(*elements)]
+    if name not in ('list', 'set', 'map'):
+        return _simple_column(rng, name, n)
+
+    sizes = rng.choices(_COLLECTION_SIZES, k=n)
+    total = sum(sizes)
+    columns = [_element_column(rng, subtype, total) for subtype in subtypes]
+    values = []
+    start = 0
+    for size in sizes:
+        if name == 'map':
+            keys = dict.fromkeys(columns[0][start:start + size])
+            body = ', '.join('{}: {}'.format(k, v) for k, v in zip(keys, columns[1][start:start + size]))
+            values.append('{' + body + '}')
+        elif name == 'set':
+            values.append('{' + ', '.join(dict.fromkeys(columns[0][start:start + size])) + '}')
+        else:
+            values.append('[' + ', '.join(columns[0][start:start + size]) + ']')
+        start += size
+    return values
+
+
+def _csv_quote(values):
+    return ['"' + v.replace('"', '""') + '"' if (',' in v or '"' in v or '\n' in v) else v for v in values]
+
+
+def generate_chunk(args):
+    """
+    Generates the csv text of rows [first_row, first_row + num_rows) of a file.
+
+    The first column holds the row number (prefixed with 'key' for text types), so
+    that every row has a distinct partition key when it is the first column of the key.
+    """
+    cql_types, first_row, num_rows, seed = args
+    rng = random.Random('{}-{}'.format(seed, first_row))
+    parsed = [parse_cql_type(t) for t in cql_types]
+    key_name = parsed[0][0]
+    if key_name in ('ascii', 'text', 'varchar'):
+        columns = [['key{}'.format(i) for i in range(first_row, first_row + num_rows)]]
+    elif key_name in _INT_RANGES:
+        columns = [[str(i) for i in range(first_row, first_row + num_rows)]]
+    else:
+        columns = [generate_column(rng, parsed[0], num_rows)]
+    columns.extend(_csv_quote(generate_column(rng, t, num_rows)) for t in parsed[1:])
+    return ''.join(','.join(row) + '\n' for row in zip(*columns))
+
+
+def generate_csv(filename, cql_types, num_rows, seed=0, header=None, processes=None, chunk_rows=CHUNK_ROWS):
+    """
+    Writes num_rows random rows of the given CQL types to a csv file, generating chunks
+    of chunk_rows rows in a pool of processes.
+
+    @param header a list of column names to write as the first line, if any
+    """
+    chunks = [(list(cql_types), first_row, min(chunk_rows, num_rows - first_row), seed)
+              for first_row in range(0, num_rows, chunk_rows)]
+    with open(filename, 'w', buffering=4 * 1024 * 1024) as f:
+        if header:
+            f.write(','.join(header) + '\n')
+        if len(chunks) <= 1:
+            for chunk in chunks:
+                f.write(generate_chunk(chunk))
+            return
+        with multiprocessing.Pool(processes or min(len(chunks), os.cpu_count() or 1)) as pool:
+            for text in pool.imap(generate_chunk, chunks):
+                f.write(text)
+
+
+def cached_csv_fixture(cql_types, num_rows, seed=0, header=None, directory=None):
+    """
+    Same as generate_csv, into a file kept between runs and only generated the first
+    time it is asked for.
+
+    @return the name of the csv file, which must not be modified
+    """
+    directory = directory or os.environ.get('DTEST_CSV_FIXTURE_DIR',
+                                            os.path.join(os.path.expanduser('~'), '.ccm', 'dtest_csv_fixtures'))
+    os.makedirs(directory, exist_ok=True)
+    key = hashlib.sha256(repr((GENERATOR_VERSION, list(cql_types), num_rows, seed, header)).encode('utf-8'))
+    filename = os.path.join(directory, key.hexdigest()[:24] + '.csv')
+    if not os.path.exists(filename):
+        # generated under a name of its own, so that concurrent runs never see a partial file
+        staging = '{}.{}.tmp'.format(filename, os.getpid())
+        generate_csv(staging, cql_types, num_rows, seed=seed, header=header)
+        os.rename(staging, filename)
+    return filename
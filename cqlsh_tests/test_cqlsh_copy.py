@@ -12,6 +12,7 @@ import re
 import time
 from collections import namedtuple
 from decimal import Decimal
+from itertools import zip_longest
 from ccmlib.version import LooseVersion
 from tempfile import NamedTemporaryFile, gettempdir, template
 from uuid import uuid1, uuid4
@@ -29,8 +30,10 @@ from . import util
 from .cqlsh_test_types import (Address, Datetime, ImmutableDict,
                                ImmutableSet, Name, UTC, drop_microseconds)
 from .cqlsh_tools import (assert_csvs_items_equal,
-                          csv_rows, monkeypatch_driver, random_list,
+                          csv_rows, diff_items, first_ordered_difference,
+                          format_items_diff, monkeypatch_driver, random_list,
                           unmonkeypatch_driver, write_rows_to_csv)
+from .csv_generator import generate_csv
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -43,10 +46,9 @@ PARTITIONERS = {
 }
 
 
-class TestCqlshCopy(Tester):
+class CqlshCopyTester(Tester):
     """
-    Tests the COPY TO and COPY FROM features in cqlsh.
-    @jira_ticket CASSANDRA-3906
+    Cluster setup, schemas and helpers shared by the COPY tests and benchmarks.
     """
 
     @pytest.fixture(autouse=True)
@@ -159,6 +161,8 @@ class TestCqlshCopy(Tester):
         """
         Run cqlsh on node1 adding the debug and cqlshrc to the clqsh options, unless the caller
         has specified its own options.
+
+        Commands are run in a cqlsh worker shared by every call with the same options.
         """
         if cqlsh_options is None:
             cqlsh_options = []
@@ -319,44 +323,50 @@ class TestCqlshCopy(Tester):
 
     def assertCsvResultEqual(self, csv_filename, results, table_name=None,
                              columns=None, cql_type_names=None, sort_data=True):
-
-        csv_results = list(csv_rows(csv_filename))
-        self.maxDiff = None
-
+        """
+        Asserts the rows of a csv file are the given results, an iterable of rows as lists
+        of strings. Neither side is held in memory, see cqlsh_tools.diff_items.
+        """
         if sort_data:
-            csv_results = sorted(csv_results)
-            results = sorted(results)
-
-        try:
-            assert csv_results == results
-        except Exception as e:
-            if len(csv_results) != len(results):
-                logger.warning("Different # of entries. CSV: {}, vs query results : {}".format(len(csv_results), len(results)))
-            else:
-                line_matches = True
-                for i in range(0, len(csv_results)):
-                    if not line_matches:
-                        break
-                    for x in range(0, len(csv_results[i])):
-                        if csv_results[i][x] != results[i][x]:
-                            if line_matches:
-                                line_matches = False
-                            logger.warning("Value in csv at [{}][{}]: {}".format(i, x, str(csv_results[i][x])))
-                            logger.warning("Value in query at [{}][{}]: {}".format(i, x, str(results[i][x])))
-
-            raise e
+            diff = diff_items(csv_rows(csv_filename), results, size_hint=os.path.getsize(csv_filename))
+            if diff.num_only_x or diff.num_only_y:
+                if diff.count_x != diff.count_y:
+                    logger.warning("Different # of entries. CSV: {}, vs query results : {}".format(
+                        diff.count_x, diff.count_y))
+                assert False, format_items_diff(diff, 'CSV', 'query results')
+            return
+
+        difference = first_ordered_difference(csv_rows(csv_filename), results)
+        if difference is not None:
+            i, csv_row, result_row = difference
+            if csv_row is not None and result_row is not None:
+                for x, (csv_value, result_value) in enumerate(zip_longest(csv_row, result_row)):
+                    if csv_value != result_value:
+                        logger.warning("Value in csv at [{}][{}]: {}".format(i, x, str(csv_value)))
+                        logger.warning("Value in query at [{}][{}]: {}".format(i, x, str(result_value)))
+            assert False, "CSV and query results differ at row {}: {} != {}".format(i, csv_row, result_row)
 
     def stringify_results(self, results, format_fn=str):
         """
         Given an object returned from a CQL query, returns a string formatted by
         the cqlsh formatting utilities.
         """
-        processed = []
+        return list(self.iter_stringified_results(results, format_fn))
 
+    def iter_stringified_results(self, results, format_fn=str):
+        """
+        Same as stringify_results, one row at a time, so that results are paged in
+        as they are compared rather than held in memory.
+        """
         for row in results:
-            processed.append([format_fn(v) for v in row])
+            yield [format_fn(v) for v in row]
 
-        return processed
+
+class TestCqlshCopy(CqlshCopyTester):
+    """
+    Tests the COPY TO and COPY FROM features in cqlsh.
+    @jira_ticket CASSANDRA-3906
+    """
 
     def test_list_data(self):
         """
@@ -1134,11 +1144,7 @@ class TestCqlshCopy(Tester):
 
         tempfile = self.get_temp_file()
         num_rows = 10000
-
-        with open(tempfile.name, 'w') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=['a', 'b', 'c'])
-            for i in range(num_rows):
-                writer.writerow({'a': i, 'b': 0, 'c': 2.0})
+        generate_csv(tempfile.name, ['int', 'int', 'float'], num_rows)
 
         failures = {'failing_batch': {'id': 3, 'failures': 2}}
         os.environ['CQLSH_COPY_TEST_FAILURES'] = json.dumps(failures)
@@ -2869,8 +2875,8 @@ class TestCqlshCopy(Tester):
         logger.debug('Importing from csv file {}'.format(tempfile.name))
         self.run_cqlsh(cmds="COPY {} FROM '{}' WITH MAXBATCHSIZE=1".format(stress_ks_table_name, tempfile.name))
 
-        results = self.stringify_results(self.session.execute("SELECT * FROM {}".format(stress_ks_table_name)),
-                                         format_fn=self.format_blob)
+        results = self.iter_stringified_results(self.session.execute("SELECT * FROM {}".format(stress_ks_table_name)),
+                                                format_fn=self.format_blob)
         self.assertCsvResultEqual(tempfile.name, results, stress_table_name)
 
         # Import without prepared statements and verify
@@ -2880,8 +2886,8 @@ class TestCqlshCopy(Tester):
         self.run_cqlsh(cmds="COPY {} FROM '{}' WITH MAXBATCHSIZE=1 AND PREPAREDSTATEMENTS=FALSE"
                        .format(stress_ks_table_name, tempfile.name))
 
-        results = self.stringify_results(self.session.execute("SELECT * FROM {}".format(stress_ks_table_name)),
-                                         format_fn=self.format_blob)
+        results = self.iter_stringified_results(self.session.execute("SELECT * FROM {}".format(stress_ks_table_name)),
+                                                format_fn=self.format_blob)
         self.assertCsvResultEqual(tempfile.name, results, stress_table_name)
 
     def test_copy_from_with_brackets_in_UDT(self):
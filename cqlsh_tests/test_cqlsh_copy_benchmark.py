@@ -0,0 +1,251 @@
+"""
+Throughput benchmarks of cqlsh COPY FROM and COPY TO.
+
+The benchmarks load a table of every CQL type the COPY tests use but user types
+(which csv_generator does not generate) with a given number of random rows and time COPY FROM and COPY TO at several NUMPROCESSES, CHUNKSIZE and
+MAXBATCHSIZE settings. Each run records the rows per second, the peak RSS of the
+cqlsh process tree (cqlsh and the processes COPY forks) and the mean coordinator
+latencies of the requests COPY made into a JSON results file. The latencies are the
+differences of the ClientRequest Latency and TotalLatency counts of node1 read over
+JMX right before and right after the timed COPY, so they leave out the requests of
+the setup (loading the table, counting its rows). The csv files loaded are generated
+by csv_generator.cached_csv_fixture and kept between runs.
+
+They only run when DTEST_COPY_BENCHMARK_RESULTS is set to the results file to
+write. Under xdist, every worker writes its own file, suffixed with the name of the
+worker. Other settings:
+
+- DTEST_COPY_BENCHMARK_ROWS: comma separated numbers of rows (default 10000,100000)
+- DTEST_COPY_BENCHMARK_BASELINE: a results file of an earlier run; a run more than
+  DTEST_COPY_BENCHMARK_TOLERANCE (default 0.2) slower than its baseline fails
+"""
+import csv
+import json
+import logging
+import os
+import subprocess
+import threading
+import time
+
+import psutil
+import pytest
+from ccmlib.node import ToolError
+
+from conftest import xdist_worker_path
+from tools.jmxutils import JolokiaAgent, make_mbean
+from .csv_generator import cached_csv_fixture
+from .test_cqlsh_copy import CqlshCopyTester
+
+since = pytest.mark.since
+logger = logging.getLogger(__name__)
+
+RESULTS_FILE = os.environ.get('DTEST_COPY_BENCHMARK_RESULTS')
+BASELINE_FILE = os.environ.get('DTEST_COPY_BENCHMARK_BASELINE')
+TOLERANCE = float(os.environ.get('DTEST_COPY_BENCHMARK_TOLERANCE', 0.2))
+BENCHMARK_ROWS = [int(n) for n in os.environ.get('DTEST_COPY_BENCHMARK_ROWS', '10000,100000').split(',')]
+
+COPY_FROM_SETTINGS = [
+    {'NUMPROCESSES': 1, 'CHUNKSIZE': 5000, 'MAXBATCHSIZE': 20},
+    {'NUMPROCESSES': 4, 'CHUNKSIZE': 5000, 'MAXBATCHSIZE': 20},
+    {'NUMPROCESSES': 4, 'CHUNKSIZE': 1000, 'MAXBATCHSIZE': 10},
+    {'NUMPROCESSES': 4, 'CHUNKSIZE': 20000, 'MAXBATCHSIZE': 50},
+]
+COPY_TO_SETTINGS = [
+    {'NUMPROCESSES': 1},
+    {'NUMPROCESSES': 4},
+]
+LATENCY_SCOPES = ('Read', 'Write', 'RangeSlice')
+
+# the columns of the all datatypes table of the COPY tests, but its user types
+BENCHMARK_COLUMNS = [
+    ('a', 'ascii'), ('b', 'bigint'), ('c', 'blob'), ('d', 'boolean'), ('e', 'decimal'), ('f', 'double'),
+    ('g', 'float'), ('h', 'inet'), ('i', 'int'), ('j', 'text'), ('k', 'timestamp'), ('l', 'timeuuid'),
+    ('m', 'uuid'), ('n', 'varchar'), ('o', 'varint'), ('p', 'list<int>'), ('q', 'set<text>'),
+    ('r', 'map<timestamp, text>'), ('s', 'tuple<int, text, boolean>'),
+    ('v', 'frozen<map<frozen<map<int, int>>, frozen<set<text>>>>'), ('w', 'frozen<set<frozen<set<inet>>>>'),
+    ('x', 'map<text, frozen<list<text>>>'), ('y', 'map<int, blob>'), ('z', 'list<blob>'), ('za', 'set<blob>'),
+]
+
+pytestmark = pytest.mark.skipif(not RESULTS_FILE, reason="COPY benchmarks only run with DTEST_COPY_BENCHMARK_RESULTS set")
+
+
+def _settings_id(settings):
+    return '-'.join('{}={}'.format(k.lower(), v) for k, v in sorted(settings.items()))
+
+
+def benchmark_key(direction, num_rows, settings):
+    return 'COPY {} rows={} {}'.format(direction, num_rows, _settings_id(settings))
+
+
+def read_request_latencies(jmx):
+    """
+    @return a dict of {scope: (requests, total latency micros)} of the coordinator
+            requests of a node since it started
+    """
+    return {scope: tuple(jmx.read_attribute(make_mbean('metrics', type='ClientRequest', scope=scope, name=name), 'Count')
+                         for name in ('Latency', 'TotalLatency'))
+            for scope in LATENCY_SCOPES}
+
+
+def latency_deltas(before, after):
+    """
+    @param before, after {scope: (requests, total latency micros)}, see read_request_latencies
+    @return a dict of {scope: {'requests': count, 'mean_micros': latency}} of the requests
+            made between the two readings, for the scopes with any request
+    """
+    deltas = {}
+    for scope, (requests, total) in after.items():
+        requests -= before[scope][0]
+        if requests > 0:
+            deltas[scope.lower()] = {'requests': requests, 'mean_micros': (total - before[scope][1]) / requests}
+    return deltas
+
+
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    """
+    @return a list of (key, baseline rows/s, rows/s) for every benchmark of results
+            more than tolerance slower than the same benchmark in baseline
+    """
+    regressions = []
+    for key, result in results.items():
+        if key in baseline and result['rows_per_s'] < baseline[key]['rows_per_s'] * (1 - tolerance):
+            regressions.append((key, baseline[key]['rows_per_s'], result['rows_per_s']))
+    return regressions
+
+
+class PeakRssSampler(object):
+    """
+    Samples the total RSS of a process and its children until stopped.
+    """
+
+    def __init__(self, pid, interval=0.1):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak_rss = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _sample(self):
+        rss = 0
+        for p in [self.process] + self.process.children(recursive=True):
+            try:
+                rss += p.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.peak_rss = max(self.peak_rss, self._sample())
+            except psutil.Error:
+                break
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.peak_rss
+
+
+@since('2.1')
+class TestCqlshCopyBenchmark(CqlshCopyTester):
+    """
+    Benchmarks of cqlsh COPY FROM and COPY TO, see the module docstring.
+    """
+
+    def _cqlsh_options(self):
+        return ['--cqlshrc={}'.format(self.cqlshrc)]
+
+    def _timed_cqlsh(self, cmds):
+        """
+        Runs cqlsh in a new process, like node.run_cqlsh, sampling the RSS of its process tree.
+
+        @return (elapsed seconds, peak RSS in bytes, stdout)
+        """
+        cqlsh = self.node1.get_tool('cqlsh')
+        host, port = self.node1.network_interfaces['binary']
+        start = time.time()
+        p = subprocess.Popen([cqlsh] + self._cqlsh_options() + [host, str(port)], env=self.node1.get_env(),
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+        sampler = PeakRssSampler(p.pid)
+        stdout, stderr = p.communicate(cmds + ';\nquit;\n')
+        elapsed = time.time() - start
+        peak_rss = sampler.stop()
+        if p.returncode != 0:
+            raise ToolError(['cqlsh', cmds], p.returncode, stdout, stderr)
+        return elapsed, peak_rss, stdout
+
+    def _timed_copy(self, cmds):
+        """
+        Runs a COPY command with _timed_cqlsh, reading the request latencies of node1
+        right before and right after it.
+
+        @return (elapsed seconds, peak RSS in bytes, latencies of the requests of the COPY)
+        """
+        with JolokiaAgent(self.node1) as jmx:
+            before = read_request_latencies(jmx)
+            elapsed, peak_rss, _ = self._timed_cqlsh(cmds)
+            return elapsed, peak_rss, latency_deltas(before, read_request_latencies(jmx))
+
+    def _prepare_benchmark_table(self):
+        self.prepare()
+        self.session.execute("CREATE TABLE copybenchmark ({}, PRIMARY KEY (a))".format(
+            ', '.join('{} {}'.format(name, cql_type) for name, cql_type in BENCHMARK_COLUMNS)))
+
+    def _fixture(self, num_rows):
+        """
+        @return a csv file of num_rows random rows of the benchmark table, with distinct keys
+        """
+        return cached_csv_fixture([cql_type for _, cql_type in BENCHMARK_COLUMNS], num_rows)
+
+    def _record(self, direction, num_rows, settings, elapsed, peak_rss, latencies):
+        key = benchmark_key(direction, num_rows, settings)
+        result = {'rows_per_s': num_rows / elapsed,
+                  'seconds': elapsed,
+                  'peak_rss_mb': peak_rss / 1024 ** 2,
+                  'server_latencies': latencies,
+                  'cassandra_version': str(self.cluster.cassandra_version())}
+        logger.info("{}: {:.0f} rows/s, peak RSS {:.0f}MB".format(key, result['rows_per_s'], result['peak_rss_mb']))
+
+        results_file = xdist_worker_path(RESULTS_FILE)
+        results = {}
+        if os.path.exists(results_file):
+            with open(results_file) as f:
+                results = json.load(f)
+        results[key] = result
+        with open(results_file, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+        if BASELINE_FILE:
+            with open(BASELINE_FILE) as f:
+                regressions = find_regressions({key: result}, json.load(f))
+            assert not regressions, "{} regressed from {:.0f} to {:.0f} rows/s".format(*regressions[0])
+
+    def _copy_cmd(self, direction, filename, settings):
+        return "COPY ks.copybenchmark {} '{}' WITH {}".format(
+            direction, filename, ' AND '.join('{}={}'.format(k, v) for k, v in sorted(settings.items())))
+
+    @pytest.mark.parametrize('num_rows', BENCHMARK_ROWS)
+    @pytest.mark.parametrize('settings', COPY_FROM_SETTINGS, ids=_settings_id)
+    def test_copy_from(self, num_rows, settings):
+        self._prepare_benchmark_table()
+        fixture = self._fixture(num_rows)
+
+        elapsed, peak_rss, latencies = self._timed_copy(self._copy_cmd('FROM', fixture, settings))
+        assert num_rows == self.session.execute("SELECT COUNT(*) FROM copybenchmark", timeout=120).one()[0]
+        self._record('FROM', num_rows, settings, elapsed, peak_rss, latencies)
+
+    @pytest.mark.parametrize('num_rows', BENCHMARK_ROWS)
+    @pytest.mark.parametrize('settings', COPY_TO_SETTINGS, ids=_settings_id)
+    def test_copy_to(self, num_rows, settings):
+        self._prepare_benchmark_table()
+        self.run_cqlsh(cmds="COPY ks.copybenchmark FROM '{}'".format(self._fixture(num_rows)))
+
+        exported = self.get_temp_file(suffix='.csv')
+        elapsed, peak_rss, latencies = self._timed_copy(self._copy_cmd('TO', exported.name, settings))
+        with open(exported.name) as f:
+            assert num_rows == sum(1 for _ in csv.reader(f))
+        self._record('TO', num_rows, settings, elapsed, peak_rss, latencies)
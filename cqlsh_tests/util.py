@@ -3,14 +3,18 @@ from collections import namedtuple
 import pytest
 from ccmlib.node import ToolError
 
+from .cqlsh_worker import run_cqlsh
+
 
 def run_cqlsh_safe(node, cmds, cqlsh_options=None, expect_error=True):
     """
     cqlsh behavior has changed to set an error code on exit. This wrapper
     makes it easier to run cqlsh commands while expecting exceptions.
+
+    Commands are run in a long-lived cqlsh worker, see cqlsh_worker.
     """
     try:
-        ret = node.run_cqlsh(cmds=cmds, cqlsh_options=cqlsh_options)
+        ret = run_cqlsh(node, cmds=cmds, cqlsh_options=cqlsh_options)
         if expect_error:
             pytest.fail("Expected ToolError but didn't get one")
         return ret
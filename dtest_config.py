@@ -26,6 +26,8 @@ class DTestConfig:
         self.delete_logs = False
         self.execute_upgrade_tests = False
         self.execute_upgrade_tests_only = False
+        self.share_upgrade_prefixes = False
+        self.rolling_upgrade_batch_size = 1
         self.disable_active_log_watching = False
         self.keep_test_dir = False
         self.keep_failed_test_dir = False
@@ -75,6 +77,8 @@ class DTestConfig:
         self.delete_logs = config.getoption("--delete-logs")
         self.execute_upgrade_tests = config.getoption("--execute-upgrade-tests")
         self.execute_upgrade_tests_only = config.getoption("--execute-upgrade-tests-only")
+        self.share_upgrade_prefixes = config.getoption("--share-upgrade-prefixes")
+        self.rolling_upgrade_batch_size = config.getoption("--rolling-upgrade-batch-size") or 1
         self.disable_active_log_watching = config.getoption("--disable-active-log-watching")
         self.keep_test_dir = config.getoption("--keep-test-dir")
         self.keep_failed_test_dir = config.getoption("--keep-failed-test-dir")
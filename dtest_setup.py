@@ -26,6 +26,8 @@ from ccmlib.version import LooseVersion
 
 from tools.context import log_filter
 from tools.funcutils import merge_dicts
+from tools.misc import SSL_STORE_FILES
+from tools import cluster_start, phase_timing
 
 logger = logging.getLogger(__name__)
 
@@ -264,13 +266,14 @@ class DTestSetup(object):
                             idle_heartbeat_interval=60,
                             allow_beta_protocol_version=True,
                             execution_profiles=profiles)
-        session = cluster.connect(wait_for_all_pools=True)
+        with phase_timing.phase('connect'):
+            session = cluster.connect(wait_for_all_pools=True)
 
         if keyspace is not None:
             session.set_keyspace(keyspace)
 
         self.connections.append(session)
-        return session
+        return phase_timing.instrument_session(session)
 
     def patient_cql_connection(self, node, keyspace=None,
                                user=None, password=None, timeout=60, compression=True,
@@ -419,6 +422,23 @@ class DTestSetup(object):
         """
         self.log_watch_thread.join(timeout=60)
 
+    def start_cluster(self, parallel=True, ready=cluster_start.READY_EVENTS, timeout=120, nodes=None, **kwargs):
+        """
+        Starts the nodes of the cluster which are not running, concurrently and the seeds
+        first, and waits for all of them to be ready, rather than following cluster.start
+        with watch_log_for and wait_for_binary_interface calls (see tools/cluster_start.py).
+
+        @param parallel whether to start the nodes concurrently
+        @param ready the readiness events to wait for, among 'gossip', 'cql' and 'thrift'
+        @param timeout the seconds all of the nodes have to be ready in
+        @param nodes the nodes to start, all the nodes of the cluster by default
+        @param kwargs the arguments of node.start, e.g. jvm_args
+        @return the nodes started
+        """
+        with phase_timing.phase('node_start'):
+            return cluster_start.start_nodes(self.cluster, nodes=nodes, parallel=parallel, ready=ready,
+                                             timeout=timeout, **kwargs)
+
     def stop_cluster(self, gently=False):
         """
         Stops the cluster; if 'gently' is requested and a NodeError occurs, then
@@ -459,7 +479,7 @@ class DTestSetup(object):
                     self.cluster.remove()
 
                     logger.debug("clearing ssl stores from [{0}] directory".format(self.test_path))
-                    for filename in ('keystore.jks', 'truststore.jks', 'ccm_node.cer'):
+                    for filename in SSL_STORE_FILES:
                         try:
                             os.remove(os.path.join(self.test_path, filename))
                         except OSError as e:
@@ -616,10 +636,11 @@ class DTestSetup(object):
         # cluster_options = []
         self.iterations += 1
         self.create_cluster_func = create_cluster_func
-        self.cluster = self.create_cluster_func(self)
-        self.init_default_config()
-        self.maybe_setup_jacoco()
-        self.set_cluster_log_levels()
+        with phase_timing.phase('cluster_create'):
+            self.cluster = phase_timing.instrument_cluster(self.create_cluster_func(self))
+            self.init_default_config()
+            self.maybe_setup_jacoco()
+            self.set_cluster_log_levels()
 
         # cls.init_config()
         # write_last_test_file(cls.test_path, cls.cluster)
@@ -7,6 +7,7 @@ from cassandra import InvalidRequest
 
 from dtest import Tester, create_ks
 from tools.assertions import assert_one
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -101,5 +102,5 @@ class TestGuardrails(BaseGuardrailsTester):
 
     def disk_usage_injection(self, node, state, clear_byteman=True):
         if clear_byteman:
-            node.byteman_submit(['-u'])
-        node.byteman_submit(["./byteman/guardrails/disk_usage_{}.btm".format(state)])
+            byteman_submit(node, ['-u'])
+        byteman_submit(node, ["./byteman/guardrails/disk_usage_{}.btm".format(state)])
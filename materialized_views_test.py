@@ -27,6 +27,7 @@ from tools.assertions import (assert_all, assert_crc_check_chance_equal,
 from tools.data import rows_to_list
 from tools.misc import new_node
 from tools.jmxutils import (JolokiaAgent, make_mbean)
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -989,7 +990,7 @@ class TestMaterializedViews(Tester):
         self.fixture_dtest_setup.allow_log_errors = True
 
         script_version = '5_1' if self.cluster.version() >= LooseVersion('5.1') else '4x' if self.cluster.version() >= '4' else '3x'
-        node.byteman_submit([mk_bman_path('merge_schema_failure_{}.btm'.format(script_version))])
+        byteman_submit(node, [mk_bman_path('merge_schema_failure_{}.btm'.format(script_version))])
         with pytest.raises(NoHostAvailable):
             session.execute("ALTER TABLE users RENAME username TO user")
 
@@ -1099,11 +1100,11 @@ class TestMaterializedViews(Tester):
         logger.debug("Avoid premature MV build finalization with byteman")
         for node in self.cluster.nodelist():
             if self.cluster.version() >= '4':
-                node.byteman_submit([mk_bman_path('4.0/skip_view_build_finalization.btm')])
-                node.byteman_submit([mk_bman_path('4.0/skip_view_build_task_finalization.btm')])
+                byteman_submit(node, [mk_bman_path('4.0/skip_view_build_finalization.btm')])
+                byteman_submit(node, [mk_bman_path('4.0/skip_view_build_task_finalization.btm')])
             else:
-                node.byteman_submit([mk_bman_path('pre4.0/skip_finish_view_build_status.btm')])
-                node.byteman_submit([mk_bman_path('pre4.0/skip_view_build_update_distributed.btm')])
+                byteman_submit(node, [mk_bman_path('pre4.0/skip_finish_view_build_status.btm')])
+                byteman_submit(node, [mk_bman_path('pre4.0/skip_view_build_update_distributed.btm')])
 
         session.execute("CREATE TABLE t (id int PRIMARY KEY, v int, v2 text, v3 decimal)")
 
@@ -1168,7 +1169,7 @@ class TestMaterializedViews(Tester):
 
         logger.debug("Slowing down MV build with byteman")
         for node in self.cluster.nodelist():
-            node.byteman_submit([mk_bman_path('4.0/view_builder_task_sleep.btm')])
+            byteman_submit(node, [mk_bman_path('4.0/view_builder_task_sleep.btm')])
 
         logger.debug("Create a MV")
         session.execute(("CREATE MATERIALIZED VIEW t_by_v AS SELECT * FROM t "
@@ -1217,7 +1218,7 @@ class TestMaterializedViews(Tester):
 
         logger.debug("Slowing down MV build with byteman")
         for node in nodes:
-            node.byteman_submit([mk_bman_path('4.0/view_builder_task_sleep.btm')])
+            byteman_submit(node, [mk_bman_path('4.0/view_builder_task_sleep.btm')])
 
         logger.debug("Create a MV")
         session.execute(("CREATE MATERIALIZED VIEW t_by_v AS SELECT * FROM t "
@@ -1287,7 +1288,7 @@ class TestMaterializedViews(Tester):
 
         logger.debug("Slowing down MV build with byteman")
         for node in nodes:
-            node.byteman_submit([mk_bman_path('4.0/view_builder_task_sleep.btm')])
+            byteman_submit(node, [mk_bman_path('4.0/view_builder_task_sleep.btm')])
 
         logger.debug("Create a MV")
         session.execute(("CREATE MATERIALIZED VIEW t_by_v AS SELECT * FROM t "
@@ -2578,7 +2579,7 @@ class TestMaterializedViews(Tester):
         session.cluster.control_connection.wait_for_schema_agreement()
 
         logger.debug('Make node1 fail {} view writes'.format(fail_phase))
-        node1.byteman_submit([mk_bman_path('fail_{}_view_write.btm'.format(fail_phase))])
+        byteman_submit(node1, [mk_bman_path('fail_{}_view_write.btm'.format(fail_phase))])
 
         logger.debug('Write 1000 rows - all node1 writes should fail')
 
@@ -0,0 +1,61 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from upgrade_tests.build_cache import BuildCache, build_java_version, resolve_version
+
+
+class TestBuildCache(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = BuildCache(root=self.root, max_bytes=250, min_idle_s=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _add_entry(self, version, size, last_used):
+        key = self.cache.cache_key(version, 11)
+        os.makedirs(os.path.join(self.root, key))
+        meta_path = os.path.join(self.root, key, 'dtest_build_cache.json')
+        with open(meta_path, 'w') as f:
+            json.dump({'version': version, 'resolved': version, 'size': size}, f)
+        os.utime(meta_path, (last_used, last_used))
+        return key
+
+    def test_cache_key(self):
+        assert BuildCache.cache_key('abc', 11) == BuildCache.cache_key('abc', 11, ())
+        assert BuildCache.cache_key('abc', 11) != BuildCache.cache_key('abc', 17)
+        assert BuildCache.cache_key('abc', 11) != BuildCache.cache_key('abc', 11, ('-Dfoo',))
+
+    def test_build_java_version(self):
+        assert build_java_version((8, 11), 11, environ={'JAVA8_HOME': '/jdk8'}) == 11
+        assert build_java_version((8,), 11, environ={'JAVA8_HOME': '/jdk8'}) == 8
+        assert build_java_version((11, 17), 8, environ={'JAVA11_HOME': '/jdk11', 'JAVA17_HOME': '/jdk17'}) == 17
+        # built with the JDK of the tests when no JDK of the version is available
+        assert build_java_version((8,), 11, environ={}) == 11
+
+    def test_released_versions_resolve_to_themselves(self):
+        assert resolve_version('4.0.19') == '4.0.19'
+        assert resolve_version('binary:4.0.19') == 'binary:4.0.19'
+        assert resolve_version('clone:/some/dir') is None
+        assert resolve_version('alias:bdp/6.8-dev') is None
+
+    def test_evicts_least_recently_used_first(self):
+        now = time.time()
+        oldest = self._add_entry('4.0.1', 100, now - 3000)
+        older = self._add_entry('4.0.2', 100, now - 2000)
+        newer = self._add_entry('4.0.3', 100, now - 1000)
+        self.cache.evict()
+        assert sorted(key for key, _, _ in self.cache.entries()) == sorted([older, newer])
+        assert not os.path.exists(os.path.join(self.root, oldest))
+
+    def test_does_not_evict_recently_used_entries(self):
+        now = time.time()
+        self._add_entry('4.0.1', 200, now - 10)
+        self._add_entry('4.0.2', 200, now - 20)
+        self.cache.evict()
+        assert len(self.cache.entries()) == 2
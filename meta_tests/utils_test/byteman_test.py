@@ -0,0 +1,100 @@
+import os
+import socket
+import tempfile
+import threading
+from unittest import TestCase
+
+from mock import Mock
+
+from dtest import BYTEMAN_DIR
+from tools.byteman import (BytemanClient, BytemanError, preload_byteman_rules, rule_file,
+                           versioned_rule_path)
+
+
+class FakeAgent(object):
+    """
+    Answers every request with the given response, keeping the requests it got.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.requests = []
+        self.server = socket.socket()
+        self.server.bind(('localhost', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with conn, conn.makefile('rw') as f:
+                request = []
+                for line in f:
+                    request.append(line)
+                    if line.strip() in ('ENDLOAD', 'ENDDELETE', 'DELETEALL', 'LIST'):
+                        break
+                self.requests.append(''.join(request))
+                f.write(self.response + 'OK\n')
+
+    def close(self):
+        self.server.close()
+
+
+class TestBytemanClient(TestCase):
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.btm', delete=False) as f:
+            f.write("RULE first rule\nCLASS A\nMETHOD m\nDO return\nENDRULE\n\n"
+                    "RULE second rule\nCLASS B\nMETHOD m\nDO return\nENDRULE")
+        self.path = f.name
+        self.addCleanup(os.unlink, self.path)
+
+    def _agent(self, response):
+        agent = FakeAgent(response)
+        self.addCleanup(agent.close)
+        return agent, BytemanClient(agent.port)
+
+    def test_rule_file(self):
+        rules = rule_file(self.path)
+        assert rules.rule_names == ['first rule', 'second rule']
+        assert rule_file(self.path) is rules
+
+    def test_load_and_unload(self):
+        agent, client = self._agent("install rule first rule\n")
+        client.load([self.path])
+        client.unload([self.path])
+        text = rule_file(self.path).text
+        assert agent.requests == ['LOAD\nSCRIPT {}\n{}ENDSCRIPT\nENDLOAD\n'.format(self.path, text),
+                                  'DELETE\nSCRIPT {}\n{}ENDSCRIPT\nENDDELETE\n'.format(self.path, text)]
+
+    def test_load_error(self):
+        _, client = self._agent("ERROR : Failed to parse rule first rule\n")
+        with self.assertRaises(BytemanError):
+            client.load([self.path])
+
+    def test_is_loaded(self):
+        _, client = self._agent("# File {} line 1\nRULE first rule\nCLASS A\n".format(self.path))
+        assert not client.is_loaded(self.path)
+
+
+class TestVersionedRules(TestCase):
+
+    def test_versioned_rule_path(self):
+        name = 'election_counter_leader_favor_node2.btm'
+        assert versioned_rule_path(name, '3.11') == os.path.join(BYTEMAN_DIR, 'pre4.0', name)
+        assert versioned_rule_path(name, '4.0.5') == os.path.join(BYTEMAN_DIR, '4.0', name)
+        assert versioned_rule_path(name, '5.1') == os.path.join(BYTEMAN_DIR, '4.0', name)
+        assert versioned_rule_path('stop_writes.btm', '4.1') == os.path.join(BYTEMAN_DIR, 'stop_writes.btm')
+        with self.assertRaises(BytemanError):
+            versioned_rule_path('no_such_rule.btm', '4.1')
+
+    def test_preload_byteman_rules(self):
+        node = Mock()
+        first, second = (os.path.join(BYTEMAN_DIR, name) for name in ('stop_writes.btm', 'stop_reads.btm'))
+        preload_byteman_rules(node, [first, second])
+        node.update_startup_byteman_script.assert_called_once_with('{},script:{}'.format(first, second))
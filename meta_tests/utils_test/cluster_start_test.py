@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from ccmlib.node import NodeError, TimeoutError
+
+from tools.cluster_start import LogWatch, start_nodes, wait_for_logs
+
+
+class FakeProcess(object):
+
+    def __init__(self, returncode=None):
+        self.returncode = returncode
+
+    def poll(self):
+        return self.returncode
+
+
+class FakeNode(object):
+    """
+    A node which logs that it started its messaging service after a delay, then gossips with
+    the nodes running.
+    """
+
+    def __init__(self, cluster, i, delay=0.2):
+        self.cluster = cluster
+        self.name = 'node{}'.format(i)
+        self.delay = delay
+        self.network_interfaces = {'storage': ('127.0.0.{}'.format(i), 7000)}
+        self.running = False
+        self.started_at = None
+
+    def address(self):
+        return self.network_interfaces['storage'][0]
+
+    def logfilename(self):
+        return os.path.join(self.cluster.path, self.name + '.log')
+
+    def mark_log(self):
+        path = self.logfilename()
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def is_running(self):
+        return self.running
+
+    def log(self, line):
+        with open(self.logfilename(), 'a') as f:
+            f.write(line + '\n')
+
+    def start(self, wait_other_notice=True, wait_for_binary_proto=False, jvm_args=None):
+        assert not wait_other_notice and not wait_for_binary_proto
+        self.started_at = time.monotonic()
+        threading.Thread(target=self._run).start()
+        return FakeProcess()
+
+    def _run(self):
+        time.sleep(self.delay)
+        with self.cluster.lock:
+            self.log("Starting Messaging Service on /{}:7000".format(self.address()))
+            for other in self.cluster.nodelist():
+                if other.running:
+                    other.log("InetAddress /{} is now UP".format(self.address()))
+                    self.log("InetAddress /{} is now UP".format(other.address()))
+            self.running = True
+
+
+class FakeCluster(object):
+
+    def __init__(self, path, node_count, seed_count):
+        self.path = path
+        self.lock = threading.Lock()
+        self.nodes = [FakeNode(self, i + 1) for i in range(node_count)]
+        self.seeds = self.nodes[:seed_count]
+
+    def nodelist(self):
+        return self.nodes
+
+
+class TestClusterStart(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_log_watch_reads_complete_lines(self):
+        node = FakeNode(FakeCluster(self.directory, 1, 1), 1)
+        node.log("old line: Starting listening for CQL clients")
+        watch = LogWatch(node, node.mark_log())
+        watch.expect(["Starting listening for CQL clients", "now UP"])
+        with open(node.logfilename(), 'a') as f:
+            f.write("Starting listening for CQL")
+        assert not watch.poll()
+        with open(node.logfilename(), 'a') as f:
+            f.write(" clients on /127.0.0.1:9042\n")
+        assert watch.poll()
+        assert list(watch.pending) == ["now UP"]
+
+    def test_wait_for_logs_deadline(self):
+        node = FakeNode(FakeCluster(self.directory, 1, 1), 1)
+        watch = LogWatch(node)
+        watch.expect(["never logged"])
+        with self.assertRaisesRegex(TimeoutError, "node1: \\['never logged'\\]"):
+            wait_for_logs([watch], time.monotonic() + 0.3)
+
+    def test_failed_start(self):
+        node = FakeNode(FakeCluster(self.directory, 1, 1), 1)
+        watch = LogWatch(node, process=FakeProcess(1))
+        watch.expect(["never logged"])
+        with self.assertRaises(NodeError):
+            wait_for_logs([watch], time.monotonic() + 10)
+
+    def test_start_nodes_concurrently(self):
+        cluster = FakeCluster(self.directory, 6, 6)
+        start = time.monotonic()
+        started = start_nodes(cluster, ready=('gossip',), timeout=10)
+        elapsed = time.monotonic() - start
+        assert started == cluster.nodes
+        assert all(node.running for node in cluster.nodes)
+        # the slowest node rather than the sum of the nodes
+        assert elapsed < 1.0
+
+    def test_seeds_start_first(self):
+        cluster = FakeCluster(self.directory, 3, 1)
+        start_nodes(cluster, ready=('gossip',), timeout=10)
+        seed, node2, node3 = cluster.nodes
+        assert node2.started_at - seed.started_at >= seed.delay
+        assert node3.started_at - seed.started_at >= seed.delay
+        assert abs(node3.started_at - node2.started_at) < seed.delay
+
+    def test_running_nodes_see_the_nodes_started(self):
+        cluster = FakeCluster(self.directory, 3, 3)
+        start_nodes(cluster, nodes=cluster.nodes[:2], ready=('gossip',), timeout=10)
+        assert start_nodes(cluster, ready=('gossip',), timeout=10) == [cluster.nodes[2]]
+        with open(cluster.nodes[0].logfilename()) as f:
+            assert "/127.0.0.3 is now UP" in f.read()
+
+    def test_unknown_event(self):
+        with self.assertRaises(ValueError):
+            start_nodes(FakeCluster(self.directory, 1, 1), ready=('jmx',))
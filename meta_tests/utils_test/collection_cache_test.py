@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from tools.collection_cache import (CollectionCache, MAX_KEYS, cached_modules, class_test_nodeids, collection_key,
+                                    module_max_versions, normalize_test_args)
+
+TESTS = [
+    {'nodeid': 'a_test.py::TestA::test_one', 'marks': ['since'], 'since': {'args': ['4.0'], 'kwargs': {}}},
+    {'nodeid': 'a_test.py::test_function', 'marks': [], 'since': None},
+    {'nodeid': 'sub/b_test.py::TestB::test_two', 'marks': ['resource_intensive'], 'since': None},
+]
+
+
+class TestCollectionCache(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, 'sub'))
+        for path in ('a_test.py', 'sub/b_test.py'):
+            self._write(path, 'content of {}\n'.format(path))
+        self._write('pytest.ini', '[pytest]\n')
+        self.cache_path = os.path.join(self.root, '.pytest_cache', 'dtest_collection.json')
+        self.options = {'--use-vnodes': False, '--cassandra-dir': None}
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _write(self, path, content):
+        with open(os.path.join(self.root, path), 'w') as f:
+            f.write(content)
+
+    def _cache(self):
+        return CollectionCache(path=self.cache_path, root=self.root)
+
+    def _key(self, cache, args=(), **options):
+        values = dict(self.options, **options)
+        return collection_key(cache, [os.path.join(self.root, arg) for arg in args] or [self.root],
+                              values.get, sufficient_resources=False)
+
+    def test_stored_tests_are_found_again(self):
+        cache = self._cache()
+        key = self._key(cache)
+        assert cache.get(key) is None
+        cache.put(key, TESTS)
+        cache.save()
+
+        cache = self._cache()
+        assert cache.get(self._key(cache)) == TESTS
+        assert cached_modules(TESTS) == ['a_test.py', 'sub/b_test.py']
+        assert class_test_nodeids(TESTS) == ['a_test.py::TestA::test_one', 'sub/b_test.py::TestB::test_two']
+
+    def test_key_depends_on_arguments_options_and_sources(self):
+        cache = self._cache()
+        key = self._key(cache)
+        assert self._key(cache) == key
+        assert self._key(cache, args=['sub']) != key
+        assert self._key(cache, **{'--use-vnodes': True}) != key
+
+        self._write('sub/b_test.py', 'changed\n')
+        assert self._key(cache) != key
+
+    def test_key_depends_on_pytest_options(self):
+        cache = self._cache()
+
+        def key(pytest_options=None, **selection):
+            return collection_key(cache, [self.root], self.options.get, sufficient_resources=False,
+                                  pytest_options=pytest_options, **selection)
+        assert key('') == key()
+        assert key('-k repair') != key()
+        assert key('-k repair') != key('-k repair -m "not resource_intensive"')
+
+    def test_key_depends_on_environment(self):
+        cache = self._cache()
+
+        def key(java_version=11, **environ):
+            return collection_key(cache, [self.root], self.options.get, sufficient_resources=False,
+                                  java_version=java_version, environ=dict({'PATH': '/usr/bin'}, **environ))
+        assert key() == key(PATH='/bin', HOME='/root')
+        assert key(java_version=17) != key()
+        assert key(RUN_STATIC_UPGRADE_MATRIX='true') != key()
+        assert key(JAVA_HOME='/usr/lib/jvm/java-11') != key()
+        assert key(JAVA8_HOME='/usr/lib/jvm/java-8') != key()
+
+    def test_file_hashes_are_reused_until_files_change(self):
+        cache = self._cache()
+        key = self._key(cache)
+        path = os.path.join(self.root, 'a_test.py')
+        stat = os.stat(path)
+        # same mtime and size, so the stale hash is used
+        self._write('a_test.py', 'CONTENT of a_test.py\n')
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert self._key(cache) == key
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+        assert self._key(cache) != key
+
+    def test_keeps_the_latest_keys(self):
+        cache = self._cache()
+        for i in range(MAX_KEYS + 1):
+            cache.put(str(i), TESTS)
+        assert cache.get('0') is None
+        assert cache.get(str(MAX_KEYS)) == TESTS
+
+    def test_normalize_test_args(self):
+        assert normalize_test_args([self.root], self.root) == []
+        assert normalize_test_args([os.path.join(self.root, 'sub') + '::TestB', os.path.join(self.root, 'a_test.py')],
+                                   self.root) == ['a_test.py', 'sub::TestB']
+
+    def test_unreadable_cache_is_ignored(self):
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, 'w') as f:
+            f.write('{not json')
+        cache = self._cache()
+        assert cache.get(self._key(cache)) is None
+
+    def _max_versions(self, source):
+        self._write('module_test.py', source)
+        return module_max_versions(os.path.join(self.root, 'module_test.py'))
+
+    def test_module_max_versions(self):
+        assert self._max_versions(
+            "@since('2.0', max_version='4')\n"
+            "class TestA(Tester):\n"
+            "    def test_a(self): pass\n"
+            "    @since('2.1', max_version='3.11')\n"
+            "    def test_b(self): pass\n"
+            "class TestB(TestA):\n"
+            "    def test_c(self): pass\n"
+            "@pytest.mark.since('2.0', max_version='3.0')\n"
+            "def test_d(): pass\n") == ['3.11', '4', '4', '3.0']
+
+    def test_module_max_versions_of_unbounded_tests(self):
+        # a since mark of its own without max_version
+        assert self._max_versions(
+            "@since('2.0', max_version='4')\n"
+            "class TestA(Tester):\n"
+            "    @since('2.1')\n"
+            "    def test_a(self): pass\n") is None
+        # tests which may be inherited from another module
+        assert self._max_versions(
+            "class TestA(Base):\n"
+            "    @since('2.1', max_version='4')\n"
+            "    def test_a(self): pass\n") is None
+        assert self._max_versions("def test_a(): pass\n") is None
@@ -0,0 +1,86 @@
+import os
+import shutil
+import struct
+import tempfile
+import uuid
+import zlib
+from unittest import TestCase
+
+from tools.commitlog import CommitLogError, CommitLogSegment, segment_files, segment_table_ids
+from tools.hacks import _active_segment_usage
+
+SEGMENT_ID = 1571836519287 | (1 << 40)
+
+
+def crc_of_ints(*values, crc=0):
+    return zlib.crc32(b''.join(struct.pack('>I', v & 0xffffffff) for v in values), crc)
+
+
+def mutation_entry(table_id, key):
+    mutation = b'\x01' + table_id.bytes + bytes([len(key)]) + key + b'\x00' * 20
+    size = struct.pack('>i', len(mutation))
+    return size + struct.pack('>I', zlib.crc32(size)) + mutation + struct.pack('>I', zlib.crc32(mutation, zlib.crc32(size)))
+
+
+def segment_bytes(sections, version=7, size=4096):
+    """
+    The bytes of a segment whose sections hold the given lists of mutation entries
+    """
+    parameters = b'{}'
+    header = struct.pack('>iqH', version, SEGMENT_ID, len(parameters)) + parameters
+    crc = zlib.crc32(parameters, crc_of_ints(version, SEGMENT_ID, SEGMENT_ID >> 32, len(parameters)))
+    data = header + struct.pack('>I', crc)
+    for entries in sections:
+        position = len(data)
+        body = b''.join(entries)
+        end = position + 8 + len(body)
+        data += struct.pack('>iI', end, crc_of_ints(SEGMENT_ID, SEGMENT_ID >> 32, position)) + body
+    return data + b'\x00' * (size - len(data))
+
+
+class TestCommitLogSegment(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.tables = [uuid.uuid4(), uuid.uuid4()]
+
+    def _write(self, data, version=7):
+        path = os.path.join(self.directory, 'CommitLog-{}-{}.log'.format(version, SEGMENT_ID))
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_mutations(self):
+        path = self._write(segment_bytes([[mutation_entry(self.tables[0], b'k1'), mutation_entry(self.tables[1], b'k2')],
+                                          [mutation_entry(self.tables[0], b'k3')]]))
+        assert segment_files(self.directory) == [path]
+        with CommitLogSegment(path) as segment:
+            assert (segment.header.version, segment.header.id) == (7, SEGMENT_ID)
+            assert len(list(segment.sync_sections())) == 2
+            mutations = list(segment.mutations())
+        assert [(m.table_id, m.partition_key) for m in mutations] == [(self.tables[0], b'k1'), (self.tables[1], b'k2'),
+                                                                      (self.tables[0], b'k3')]
+        assert segment_table_ids(path) == set(self.tables)
+
+    def test_corrupted_mutation(self):
+        data = bytearray(segment_bytes([[mutation_entry(self.tables[0], b'k1')]]))
+        data[60] ^= 0xff
+        with CommitLogSegment(self._write(bytes(data))) as segment:
+            with self.assertRaises(CommitLogError):
+                list(segment.mutations())
+
+    def test_empty_segment(self):
+        with CommitLogSegment(self._write(segment_bytes([]))) as segment:
+            assert list(segment.sync_sections()) == []
+            assert segment.synced_size() == segment.header.size
+
+    def test_active_segment_usage(self):
+        # the active segment, followed by the empty one the node keeps ready
+        active = segment_bytes([[mutation_entry(self.tables[0], b'k1')]], size=8192)
+        self._write(active)
+        with open(os.path.join(self.directory, 'CommitLog-7-{}.log'.format(SEGMENT_ID + 1)), 'wb') as f:
+            f.write(b'\x00' * 8192)
+        with CommitLogSegment(os.path.join(self.directory, 'CommitLog-7-{}.log'.format(SEGMENT_ID))) as segment:
+            synced_size = segment.synced_size()
+        assert _active_segment_usage(self.directory) == (8192, synced_size)
@@ -0,0 +1,119 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from unittest import TestCase
+
+from ccmlib.node import ToolError
+
+from cqlsh_tests.cqlsh_worker import close_cqlsh_workers, run_cqlsh
+
+# stands in for bin/cqlsh.py: echoes its arguments and stdin, and exits with the
+# status given by an 'exit <n>;' command. The last line checks module state is
+# shared between runs of the same worker.
+FAKE_CQLSH = """
+import os
+import sys
+
+runs = sys.modules.setdefault('fake_cqlsh_runs', type(sys)('fake_cqlsh_runs'))
+runs.count = getattr(runs, 'count', 0) + 1
+print(' '.join(sys.argv[1:]))
+sys.stdout.flush()
+os.system('echo from a child process')
+for line in sys.stdin:
+    if line.startswith('exit'):
+        sys.stderr.write('exiting\\n')
+        sys.exit(int(line.split()[1].rstrip(';')))
+    print(line.strip())
+print('run {}'.format(runs.count))
+"""
+
+# stands in for bin/cqlsh: runs the cqlsh.py next to it, dropping the --python option
+FAKE_CQLSH_SCRIPT = """#!/bin/sh
+for arg do
+  shift
+  [ "$arg" = "--python" ] || set -- "$@" "$arg"
+done
+exec {python} "$(dirname "$0")/cqlsh.py" "$@"
+"""
+
+
+class FakeNode(object):
+
+    def __init__(self, path):
+        self.name = 'node1'
+        self.path = path
+        self.network_interfaces = {'binary': ('127.0.0.1', 9042)}
+        self.cqlsh_runs = 0
+
+    def get_path(self):
+        return self.path
+
+    def get_install_dir(self):
+        return self.path
+
+    def get_tool(self, toolname):
+        return os.path.join(self.path, 'bin', toolname)
+
+    def get_env(self):
+        return dict(os.environ)
+
+    def run_cqlsh(self, cmds=None, cqlsh_options=None):
+        self.cqlsh_runs += 1
+        return 'from node.run_cqlsh', '', 0
+
+
+class TestCqlshWorker(TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.path, 'bin'))
+        with open(os.path.join(self.path, 'bin', 'cqlsh.py'), 'w') as f:
+            f.write(FAKE_CQLSH)
+        self._write_cqlsh_script(FAKE_CQLSH_SCRIPT.format(python=sys.executable))
+        self.node = FakeNode(self.path)
+
+    def _write_cqlsh_script(self, text):
+        path = os.path.join(self.path, 'bin', 'cqlsh')
+        with open(path, 'w') as f:
+            f.write(text)
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+    def tearDown(self):
+        close_cqlsh_workers()
+        shutil.rmtree(self.path)
+
+    def test_commands_run_in_one_worker(self):
+        # the arguments are the ones bin/cqlsh passes on
+        out, err, rc = run_cqlsh(self.node, "SELECT * FROM ks.t; USE ks", cqlsh_options=['--debug', '--python'])
+        assert out.splitlines() == ['--debug 127.0.0.1 9042', 'from a child process',
+                                    'SELECT * FROM ks.t;', 'USE ks;', 'quit;', 'run 1']
+        assert (err, rc) == ('', 0)
+        assert self.node.cqlsh_runs == 0
+
+        out, _, _ = run_cqlsh(self.node, "SELECT * FROM ks.t", cqlsh_options=['--debug', '--python'])
+        assert out.splitlines()[-1] == 'run 2'
+
+        # other options get a worker of their own
+        out, _, _ = run_cqlsh(self.node, "SELECT * FROM ks.t")
+        assert out.splitlines()[-1] == 'run 1'
+
+    def test_exit_status(self):
+        with self.assertRaises(ToolError) as cm:
+            run_cqlsh(self.node, "exit 2; SELECT * FROM ks.t")
+        assert cm.exception.exit_status == 2
+        assert cm.exception.stderr == 'exiting\n'
+        assert 'SELECT' not in cm.exception.stdout
+
+        # the worker carries on after a failed batch
+        out, _, _ = run_cqlsh(self.node, "SELECT * FROM ks.t")
+        assert out.splitlines()[-1] == 'run 2'
+
+    def test_falls_back_to_run_cqlsh(self):
+        # a bin/cqlsh which does not run the cqlsh.py next to it
+        self._write_cqlsh_script("#!/bin/sh\nexec {} {} \"$@\"\n".format(
+            sys.executable, os.path.join(self.path, 'bin', 'cqlsh.py')))
+        assert run_cqlsh(self.node, "SELECT * FROM ks.t") == ('from node.run_cqlsh', '', 0)
+        assert run_cqlsh(self.node, "SELECT * FROM ks.t") == ('from node.run_cqlsh', '', 0)
+        assert self.node.cqlsh_runs == 2
@@ -0,0 +1,49 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from cqlsh_tests import cqlsh_tools
+from cqlsh_tests.cqlsh_tools import assert_csvs_items_equal, diff_items, first_ordered_difference
+
+
+class TestCsvCompare(TestCase):
+
+    def setUp(self):
+        self.partition_bytes = cqlsh_tools.COMPARE_PARTITION_BYTES
+
+    def tearDown(self):
+        cqlsh_tools.COMPARE_PARTITION_BYTES = self.partition_bytes
+
+    def _diff(self, size_hint):
+        rows_x = [[str(i), 'v{}'.format(i)] for i in range(1000)] + [['1', 'v1']]
+        rows_y = [[str(i), 'v{}'.format(i)] for i in reversed(range(1000)) if i != 500] + [['1', 'v1'], ['x', 'y']]
+        return diff_items(rows_x, rows_y, size_hint=size_hint, max_reported=5)
+
+    def test_diff_in_memory(self):
+        diff = self._diff(size_hint=0)
+        assert (diff.count_x, diff.count_y) == (1001, 1001)
+        assert diff.only_x == [['500', 'v500']]
+        assert diff.only_y == [['x', 'y']]
+        assert (diff.num_only_x, diff.num_only_y) == (1, 1)
+
+    def test_diff_partitioned(self):
+        cqlsh_tools.COMPARE_PARTITION_BYTES = 1024
+        assert self._diff(size_hint=10 * 1024) == self._diff(size_hint=0)
+
+    def test_assert_csvs_items_equal(self):
+        cqlsh_tools.COMPARE_PARTITION_BYTES = 1024
+        files = []
+        for lines in (['a,1\n', 'b,2\n', 'c,3\n'] * 100, ['c,3\n', 'a,1\n', 'b,2\n'] * 100, ['a,1\n', 'b,2\n'] * 150):
+            with tempfile.NamedTemporaryFile('w', delete=False) as f:
+                f.writelines(lines)
+            files.append(f.name)
+            self.addCleanup(os.unlink, f.name)
+        assert_csvs_items_equal(files[0], files[1])
+        with self.assertRaises(AssertionError) as cm:
+            assert_csvs_items_equal(files[0], files[2])
+        assert "100 items only in {}, the first 1:\n  'c,3\\n'".format(files[0]) in str(cm.exception)
+
+    def test_first_ordered_difference(self):
+        assert first_ordered_difference([[1], [2]], [[1], [2]]) is None
+        assert first_ordered_difference([[1], [2]], [[1], [3]]) == (1, [2], [3])
+        assert first_ordered_difference([[1]], [[1], [2]]) == (1, None, [2])
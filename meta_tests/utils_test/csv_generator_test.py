@@ -0,0 +1,52 @@
+import csv
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from cqlsh_tests.csv_generator import cached_csv_fixture, generate_csv, parse_cql_type
+
+TYPES = ['int', 'text', 'bigint', 'blob', 'boolean', 'decimal', 'double', 'inet', 'timestamp', 'uuid', 'timeuuid',
+         'varint', 'date', 'time', 'list<int>', 'set<text>', 'map<timestamp, text>', 'tuple<int, text, boolean>',
+         'frozen<map<int, frozen<list<text>>>>']
+
+
+class TestCsvGenerator(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _generate(self, name, **kwargs):
+        filename = os.path.join(self.directory, name)
+        generate_csv(filename, TYPES, 2500, seed=7, chunk_rows=1000, **kwargs)
+        with open(filename) as f:
+            return f.read()
+
+    def test_parse_cql_type(self):
+        assert parse_cql_type('frozen<map<int, frozen<list<text>>>>') == \
+            ('map', [('int', []), ('list', [('text', [])])])
+        with self.assertRaises(ValueError):
+            parse_cql_type('list<int>>')
+
+    def test_deterministic(self):
+        content = self._generate('a.csv', processes=1)
+        assert content == self._generate('b.csv', processes=3)
+
+        rows = list(csv.reader(content.splitlines()))
+        assert len(rows) == 2500
+        assert all(len(row) == len(TYPES) for row in rows)
+        assert [row[0] for row in rows] == [str(i) for i in range(2500)]
+        assert rows[0][14].startswith('[') and rows[0][17].startswith('(')
+
+    def test_cached_fixture(self):
+        filename = cached_csv_fixture(['text', 'int'], 10, seed=1, header=['a', 'b'], directory=self.directory)
+        mtime = os.path.getmtime(filename)
+        assert cached_csv_fixture(['text', 'int'], 10, seed=1, header=['a', 'b'], directory=self.directory) == filename
+        assert os.path.getmtime(filename) == mtime
+        assert cached_csv_fixture(['text', 'int'], 10, seed=2, directory=self.directory) != filename
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        assert lines[0] == 'a,b' and lines[1].startswith('key0,') and len(lines) == 11
@@ -0,0 +1,54 @@
+from itertools import count
+from unittest import TestCase
+
+from mock import Mock
+
+from tools.datahelp import create_rows, iter_data_dicts, parse_data_into_dicts
+
+DATA = """
+    | id | value   |
+    +----+---------+
+    | 1  | testing |
+  *3| 2  | [multi] |
+    | 3  | more    |
+    """
+
+
+class TestParseData(TestCase):
+
+    def test_parse_with_multiplier(self):
+        rows = parse_data_into_dicts(DATA, format_funcs={'id': int})
+        assert rows == [{'id': 1, 'value': 'testing'},
+                        {'id': 2, 'value': '[multi]'},
+                        {'id': 2, 'value': '[multi]'},
+                        {'id': 2, 'value': '[multi]'},
+                        {'id': 3, 'value': 'more'}]
+
+    def test_multiplied_rows_are_formatted_individually(self):
+        """
+        Each repetition of a multiplied row gets its own call to the format function.
+        """
+        counter = count()
+        rows = parse_data_into_dicts(DATA, format_funcs={'value': lambda v: next(counter)})
+        assert [r['value'] for r in rows] == [0, 1, 2, 3, 4]
+
+    def test_rows_are_generated_lazily(self):
+        """
+        No row is formatted before it is requested.
+        """
+        formatted = []
+        rows = iter_data_dicts(DATA, format_funcs={'id': lambda v: formatted.append(v) or v})
+        assert formatted == []
+        next(rows)
+        assert formatted == ['1']
+
+    def test_create_rows_rejects_short_rows(self):
+        session = Mock()
+        data = """
+            | id | value   |
+            +----+---------+
+            | 1  |
+            """
+        with self.assertRaisesRegex(ValueError, r"has no value for \['value'\]"):
+            create_rows(data, session, 'test')
+        session.execute.assert_not_called()
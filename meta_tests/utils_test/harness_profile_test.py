@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from tools.harness_profile import HarnessProfiler, is_wait_call, profile_file_name
+
+
+def parse_rows(rows):
+    return [row.split(',') for row in rows]
+
+
+class TestHarnessProfile(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_profile_file_name(self):
+        assert profile_file_name('a_test.py::TestA::test_a[1-2]') == 'a_test.py_TestA_test_a_1-2.prof'
+
+    def test_is_wait_call(self):
+        assert is_wait_call(('~', 0, '<built-in method time.sleep>'))
+        assert is_wait_call(('~', 0, "<method 'acquire' of '_thread.lock' objects>"))
+        assert is_wait_call(('~', 0, "<method 'recv_into' of '_socket.socket' objects>"))
+        assert not is_wait_call(('~', 0, "<method 'split' of 'str' objects>"))
+        assert not is_wait_call(('tools/misc.py', 10, 'sleep'))
+
+    def test_profiles_and_report(self):
+        profiler = HarnessProfiler(os.path.join(self.directory, 'profiles'), top=5)
+        for nodeid in ('a_test.py::TestA::test_a', 'a_test.py::TestA::test_b'):
+            profiler.start_test(nodeid)
+            time.sleep(0.05)
+            parse_rows(['1,2,3'] * 1000)
+            path = profiler.finish_test()
+            assert os.path.exists(path)
+        # finishing a test that was not started does nothing
+        assert profiler.finish_test() is None
+
+        path = profiler.write_report()
+        with open(path) as f:
+            report = f.read()
+        assert report.startswith('2 tests profiled')
+        assert 'parse_rows' in report
+        assert 'time.sleep' in report
+        stats = profiler.session_stats()
+        sleep = [tottime for function, (_, _, tottime, _, _) in stats.stats.items() if 'time.sleep' in function[2]]
+        assert sleep[0] >= 0.1
+
+    def test_no_report_without_profiles(self):
+        profiler = HarnessProfiler(self.directory)
+        assert profiler.write_report() is None
+        assert os.listdir(self.directory) == []
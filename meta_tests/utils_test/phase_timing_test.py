@@ -0,0 +1,154 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from tools import phase_timing
+from tools.phase_timing import PhaseTimingReport, instrument_cluster, instrument_session, statement_phase
+
+
+class FakeNode(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def start(self):
+        time.sleep(0.02)
+        self.wait_for_binary_interface()
+
+    def wait_for_binary_interface(self):
+        time.sleep(0.03)
+
+    def stop(self):
+        pass
+
+
+class FakeCluster(object):
+
+    def __init__(self):
+        self.nodes = []
+
+    def add(self, node, is_seed):
+        self.nodes.append(node)
+
+    def nodelist(self):
+        return self.nodes
+
+    def populate(self, count):
+        for i in range(count):
+            self.add(FakeNode('node{}'.format(i + 1)), True)
+
+    def start(self):
+        for node in self.nodes:
+            node.start()
+
+    def stop(self):
+        pass
+
+    def remove(self):
+        pass
+
+
+class FakeSession(object):
+
+    def execute(self, query):
+        time.sleep(0.01)
+
+
+class SimpleStatement(object):
+
+    def __init__(self, query_string):
+        self.query_string = query_string
+
+
+class BatchStatement(object):
+    pass
+
+
+class TestPhaseTiming(TestCase):
+
+    def setUp(self):
+        # the timer conftest.py started for this test, which these tests must not record into
+        self.harness_timer = phase_timing._current
+        phase_timing._current = None
+
+    def tearDown(self):
+        phase_timing._current = self.harness_timer
+
+    def test_nested_phases_are_excluded(self):
+        phase_timing.start_test()
+        with phase_timing.phase('test_body'):
+            time.sleep(0.02)
+            with phase_timing.phase('schema'):
+                time.sleep(0.2)
+        durations = phase_timing.finish_test()
+        assert 0.02 <= durations['test_body'] < 0.2
+        assert durations['schema'] >= 0.2
+
+    def test_other_threads_are_not_timed(self):
+        phase_timing.start_test()
+
+        def load():
+            with phase_timing.phase('data_load'):
+                time.sleep(0.01)
+        thread = threading.Thread(target=load)
+        with phase_timing.phase('test_body'):
+            thread.start()
+            thread.join()
+        assert list(phase_timing.finish_test()) == ['test_body']
+
+    def test_phases_are_ignored_outside_of_tests(self):
+        with phase_timing.phase('schema'):
+            pass
+        assert phase_timing.finish_test() == {}
+
+    def test_instrumented_cluster(self):
+        cluster = instrument_cluster(FakeCluster())
+        # instrumenting twice does not time twice
+        instrument_cluster(cluster)
+        phase_timing.start_test()
+        with phase_timing.phase('setup'):
+            cluster.populate(2)
+            cluster.start()
+        durations = phase_timing.finish_test()
+        assert set(durations) == {'setup', 'populate', 'node_start', 'wait_for_binary'}
+        assert durations['node_start'] >= 0.04
+        assert durations['wait_for_binary'] >= 0.06
+
+    def test_statement_phase(self):
+        assert statement_phase("CREATE TABLE ks.t (k int PRIMARY KEY)") == 'schema'
+        assert statement_phase("  alter keyspace ks WITH durable_writes = false") == 'schema'
+        assert statement_phase(SimpleStatement("INSERT INTO t (k) VALUES (1)")) == 'data_load'
+        assert statement_phase("BEGIN BATCH INSERT INTO t (k) VALUES (1) APPLY BATCH") == 'data_load'
+        assert statement_phase(BatchStatement()) == 'data_load'
+        assert statement_phase("SELECT * FROM t") is None
+        assert statement_phase(SimpleStatement("")) is None
+
+    def test_instrumented_session(self):
+        session = instrument_session(FakeSession())
+        phase_timing.start_test()
+        with phase_timing.phase('test_body'):
+            session.execute("CREATE KEYSPACE ks")
+            session.execute("SELECT * FROM t")
+        durations = phase_timing.finish_test()
+        assert set(durations) == {'test_body', 'schema'}
+
+    def test_report(self):
+        directory = tempfile.mkdtemp()
+        try:
+            report = PhaseTimingReport()
+            report.record('a_test.py::TestA::test_a', {'setup': 1.0, 'test_body': 2.0})
+            report.record('a_test.py::TestA::test_b', {'setup': 0.5, 'schema': 0.25})
+            path = os.path.join(directory, 'logs', 'phase_timings.json')
+            report.write(path)
+            with open(path) as f:
+                summary = json.load(f)
+            assert summary['test_count'] == 2
+            assert summary['totals'] == {'setup': 1.5, 'schema': 0.25, 'test_body': 2.0}
+            assert summary['tests']['a_test.py::TestA::test_b'] == {'setup': 0.5, 'schema': 0.25}
+            assert phase_timing.junit_properties({'setup': 1.0}) == [('phase_setup', '1.000')]
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,48 @@
+import os
+import tempfile
+from unittest import TestCase, skipUnless
+
+from tools import sslkeygen
+
+
+class TestCachedMaterial(TestCase):
+
+    def test_generated_once_per_key(self):
+        calls = []
+
+        def generate(directory):
+            calls.append(directory)
+            with open(os.path.join(directory, 'store'), 'w') as f:
+                f.write('material')
+
+        first = sslkeygen.cached_material(('test', 1), generate)
+        assert sslkeygen.cached_material(('test', 1), generate) == first
+        assert sslkeygen.cached_material(('test', 2), generate) != first
+        assert len(calls) == 2
+
+        linked = sslkeygen.link_or_copy(os.path.join(first, 'store'), os.path.join(tempfile.mkdtemp(), 'store'))
+        with open(linked) as f:
+            assert f.read() == 'material'
+
+
+@skipUnless(sslkeygen._can_generate_in_python(), "cryptography is not installed")
+class TestGenerateCredentials(TestCase):
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_credentials_are_reused_and_signed_by_their_ca(self):
+        node1 = sslkeygen.generate_credentials('127.0.0.1')
+        node2 = sslkeygen.generate_credentials('127.0.0.2', node1.cakeystore, node1.cacert)
+        again = sslkeygen.generate_credentials('127.0.0.1')
+        assert node1.basedir != again.basedir
+        assert self._read(node1.keystore) == self._read(again.keystore)
+
+        ca_key, ca_cert = sslkeygen._load_ca(node1.cakeystore)
+        cert = sslkeygen.x509.load_pem_x509_certificate(self._read(node2.cert))
+        assert cert.issuer == ca_cert.subject
+
+        # credentials generated without a CA do not share one
+        mismatched = sslkeygen.generate_credentials('127.0.0.2')
+        assert self._read(mismatched.cacert) != self._read(node1.cacert)
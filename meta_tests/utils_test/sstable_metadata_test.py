@@ -0,0 +1,64 @@
+import os
+import shutil
+import struct
+import tempfile
+import uuid
+import zlib
+from unittest import TestCase
+
+from tools.sstable_metadata import (SSTableMetadataError, estimated_droppable_tombstones, read_sstable_metadata,
+                                    read_toc)
+
+SSTABLES_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'sstables', 'ttl_test')
+
+
+class TestSSTableMetadata(TestCase):
+
+    def test_read_2_1(self):
+        metadata = read_sstable_metadata(os.path.join(SSTABLES_DIR, '2.1', 'ks-ttl_table-ka-2-Data.db'))
+        assert metadata.name.endswith('ks-ttl_table-ka-2')
+        assert (metadata.min_timestamp, metadata.max_timestamp) == (1518046660703919, 1518046660703919)
+        assert metadata.max_local_deletion_time == 1518046660
+        assert (metadata.sstable_level, metadata.repaired_at, metadata.pending_repair) == (0, 0, None)
+        assert metadata.tombstone_drop_times == [(1518046660.0, 2)]
+
+    def test_read_3_0(self):
+        metadata = read_sstable_metadata(os.path.join(SSTABLES_DIR, '3.0', 'mc-2-big-Data.db'))
+        assert (metadata.min_ttl, metadata.max_ttl) == (0, 630720000)
+        assert (metadata.sstable_level, metadata.repaired_at, metadata.total_rows) == (0, 0, 1)
+        assert estimated_droppable_tombstones(metadata, gc_before=-2146724091) == 0.0
+        assert estimated_droppable_tombstones(metadata, gc_before=1517523240) == 2.0
+        assert 'Statistics.db' in read_toc(metadata.name + '-Data.db')
+
+    def _write_na_sstable(self, pending_repair):
+        """
+        Writes the Statistics.db of an na sstable, which is a checksummed mc one with a pending repair
+        """
+        with open(os.path.join(SSTABLES_DIR, '3.0', 'mc-2-big-Statistics.db'), 'rb') as f:
+            data = f.read()
+        stats_start, stats_end = struct.unpack_from('>i', data, 24)[0], struct.unpack_from('>i', data, 32)[0]
+        stats = data[stats_start:stats_end] + b'\x01' + pending_repair.bytes + b'\x00'
+
+        head = struct.pack('>i', 1)
+        toc = struct.pack('>ii', 2, 4 + 4 + 8 + 4)
+        content = (head + struct.pack('>I', zlib.crc32(head)) +
+                   toc + struct.pack('>I', zlib.crc32(toc, zlib.crc32(head))) +
+                   stats + struct.pack('>I', zlib.crc32(stats)))
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'nb-1-big-Statistics.db')
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path, len(content)
+
+    def test_read_checksummed(self):
+        pending_repair = uuid.uuid1()
+        path, length = self._write_na_sstable(pending_repair)
+        metadata = read_sstable_metadata(path)
+        assert (metadata.version, metadata.pending_repair, metadata.is_transient) == ('nb', pending_repair, False)
+
+        with open(path, 'r+b') as f:
+            f.seek(length - 10)
+            f.write(b'\xff')
+        with self.assertRaises(SSTableMetadataError):
+            read_sstable_metadata(path)
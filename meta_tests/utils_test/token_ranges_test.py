@@ -0,0 +1,91 @@
+from unittest import TestCase
+
+from tools.token_ranges import combine_digests, plan_rolling_batches, row_digest, rows_digest, split_token_ranges
+
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+
+class TestSplitTokenRanges(TestCase):
+
+    def test_ranges_cover_whole_ring(self):
+        """
+        The ranges are contiguous and go from the minimum to the maximum token.
+        """
+        ranges = split_token_ranges([-100, 0, 100], 'Murmur3Token')
+        assert ranges == [(MIN_TOKEN, -100), (-100, 0), (0, 100), (100, MAX_TOKEN)]
+
+    def test_ranges_are_split(self):
+        """
+        Each range between two ring tokens is split into splits_per_range pieces.
+        """
+        ranges = split_token_ranges([0], 'Murmur3Token', splits_per_range=3)
+        assert len(ranges) == 6
+        assert ranges[0][0] == MIN_TOKEN
+        assert ranges[-1][1] == MAX_TOKEN
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+
+    def test_unsupported_partitioner(self):
+        with self.assertRaises(ValueError):
+            split_token_ranges([b'a'], 'BytesToken')
+
+
+class TestDigests(TestCase):
+
+    def test_digest_is_order_independent(self):
+        rows = [(1, 'a'), (2, 'b'), (3, 'c')]
+        assert rows_digest(rows) == rows_digest(reversed(rows))
+
+    def test_digest_is_mergeable(self):
+        rows = [(1, 'a'), (2, 'b'), (3, 'c')]
+        count, digest = rows_digest(rows)
+        assert count == 3
+        assert digest == combine_digests(rows_digest(rows[:1])[1], rows_digest(rows[1:])[1])
+
+    def test_digest_depends_on_content(self):
+        assert row_digest((1, 'a')) != row_digest((1, 'b'))
+
+
+def rolling_nodes(racks):
+    """
+    @param racks a dict of {rack: [node address]}
+    @return the (node, address, rack) tuples of plan_rolling_batches, with the address as node
+    """
+    return [(address, address, rack) for rack, addresses in sorted(racks.items()) for address in addresses]
+
+
+class TestPlanRollingBatches(TestCase):
+
+    def test_nodes_of_a_rack_are_batched_together(self):
+        """
+        With RF=3 over 3 racks every range has one replica per rack, so a whole rack can be down at once.
+        """
+        nodes = rolling_nodes({'rack1': ['a1', 'a2'], 'rack2': ['b1', 'b2'], 'rack3': ['c1', 'c2']})
+        replica_sets = [{'a1', 'b1', 'c1'}, {'a2', 'b2', 'c2'}, {'a1', 'b2', 'c1'}, {'a2', 'b1', 'c2'}]
+        batches = plan_rolling_batches(list(reversed(nodes)), replica_sets, 2)
+        assert batches == [['a2', 'a1'], ['b2', 'b1'], ['c2', 'c1']]
+
+    def test_batches_keep_quorum(self):
+        """
+        Two replicas of the same range are never in the same batch with RF=3.
+        """
+        nodes = rolling_nodes({'rack1': ['n1', 'n2', 'n3']})
+        batches = plan_rolling_batches(nodes, [{'n1', 'n2', 'n3'}], 3)
+        assert batches == [['n1'], ['n2'], ['n3']]
+
+    def test_batch_size(self):
+        """
+        With RF=5 two replicas can be down, whatever the batch size allows beyond that.
+        """
+        nodes = rolling_nodes({'rack1': ['n1', 'n2', 'n3', 'n4', 'n5']})
+        replica_sets = [{'n1', 'n2', 'n3', 'n4', 'n5'}]
+        assert plan_rolling_batches(nodes, replica_sets, 3) == [['n1', 'n2'], ['n3', 'n4'], ['n5']]
+        assert plan_rolling_batches(nodes, replica_sets, 1) == [['n1'], ['n2'], ['n3'], ['n4'], ['n5']]
+
+    def test_nodes_without_quorum_go_one_by_one(self):
+        """
+        With RF=1 no node can be down without losing QUORUM, the nodes are still upgraded one at a time.
+        """
+        nodes = rolling_nodes({'rack1': ['n1', 'n2']})
+        assert plan_rolling_batches(nodes, [{'n1'}, {'n2'}], 2) == [['n1'], ['n2']]
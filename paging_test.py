@@ -19,7 +19,7 @@ from tools.assertions import (assert_all, assert_invalid, assert_length_equal,
 from tools.data import rows_to_list
 from tools.datahelp import create_rows, flatten_into_set, parse_data_into_dicts
 from tools.misc import restart_cluster_and_update_config
-from tools.paging import PageAssertionMixin, PageFetcher
+from tools.paging import PageAssertionMixin, PageFetcher, PrefetchingPageFetcher
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -114,7 +114,7 @@ class TestPagingSize(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test", fetch_size=5, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         assert pf.pagecount() == 2
         assert pf.num_results_all() == [5, 4]
@@ -142,7 +142,7 @@ class TestPagingSize(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test", fetch_size=5, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         assert pf.num_results_all() == [5]
         assert pf.pagecount() == 1
@@ -172,7 +172,7 @@ class TestPagingSize(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test", consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         assert pf.num_results_all(), [5000, 1]
 
@@ -223,7 +223,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test where id = 1 order by value asc", fetch_size=5, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         assert pf.pagecount() == 2
         assert pf.num_results_all() == [5, 5]
@@ -273,7 +273,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test where id = 1 order by value asc", fetch_size=3, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         assert pf.pagecount() == 4
         assert pf.num_results_all(), [3, 3, 3, 1]
@@ -286,7 +286,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test where id = 1", fetch_size=3, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         assert pf.pagecount() == 4
         assert pf.num_results_all(), [3, 3, 3, 1]
@@ -368,7 +368,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
                 # this should not happen
                 pytest.fail("Invalid scenario configuration. Scenario is: {}".format(scenario))
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
             assert pf.num_results_all() == scenario['expect_pgsizes']
             assert pf.pagecount() == scenario['expect_pgcount']
 
@@ -401,7 +401,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test where value = 'and more testing' ALLOW FILTERING", fetch_size=4, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         assert pf.pagecount() == 2
         assert pf.num_results_all() == [4, 3]
@@ -445,7 +445,7 @@ class TestPagingData(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test where id = 1", fetch_size=3000, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         assert pf.pagecount() == 4
         assert pf.num_results_all(), [3000, 3000, 3000, 1000]
@@ -471,7 +471,7 @@ class TestPagingData(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test where id in (1,2)", fetch_size=3000, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         assert pf.pagecount() == 4
         assert pf.num_results_all(), [3000, 3000, 3000, 1000]
@@ -506,7 +506,7 @@ class TestPagingData(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test where mybool = true", fetch_size=400, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         # the query only searched for True rows, so let's pare down the expectations for comparison
         expected_data = [x for x in all_data if x.get('mybool') is True]
@@ -1684,7 +1684,7 @@ class TestPagingData(BasePagingTester, PageAssertionMixin):
             SimpleStatement("select * from paging_test where mybool = true", fetch_size=400, consistency_level=CL.ALL)
         )
 
-        pf = PageFetcher(future).request_all()
+        pf = PrefetchingPageFetcher(future).request_all()
 
         # the query only searched for True rows, so let's pare down the expectations for comparison
         expected_data = [x for x in all_data if x.get('mybool') is True]
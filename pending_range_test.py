@@ -8,6 +8,7 @@ import threading
 from cassandra.query import SimpleStatement
 
 from dtest import Tester, create_ks, mk_bman_path
+from tools.byteman import byteman_submit
 
 from ccmlib.version import LooseVersion
 
@@ -53,7 +54,7 @@ class TestPendingRangeMovements(Tester):
 
         # delay progress of the move operation to give a chance to kill the moving node
         if self.cluster.version() >= LooseVersion('5.1'):
-            node1.byteman_submit([mk_bman_path('post5.1/delay_streaming_for_move.btm')])
+            byteman_submit(node1, [mk_bman_path('post5.1/delay_streaming_for_move.btm')])
 
         mark = node1.mark_log()
         # Move a node without waiting for the response of nodetool, so we don't have to wait for ring_delay
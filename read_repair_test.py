@@ -19,6 +19,7 @@ from tools.assertions import assert_one
 from tools.data import rows_to_list
 from tools.jmxutils import JolokiaAgent, make_mbean
 from tools.misc import retry_till_success
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 ported_to_in_jvm = pytest.mark.ported_to_in_jvm
@@ -535,16 +536,16 @@ class TestSpeculativeReadRepair(Tester):
         session = self.get_cql_connection(node1, timeout=2)
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
-        node3.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node3, [mk_bman_path('read_repair/stop_writes.btm')])
         script_version = '_5_1' if self.cluster.version() >= LooseVersion('5.1') else ''
-        node2.byteman_submit([mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
-        node3.byteman_submit([mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
+        byteman_submit(node3, [mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
 
         with raises(WriteTimeout):
             session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)"))
 
-        node2.byteman_submit([mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
+        byteman_submit(node2, [mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
         session = self.get_cql_connection(node2)
         with StorageProxy(node2) as storage_proxy:
             assert storage_proxy.blocking_read_repair == 0
@@ -569,16 +570,16 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
-        node3.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node3, [mk_bman_path('read_repair/stop_writes.btm')])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes
-        node2.byteman_submit(['-u', mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, ['-u', mk_bman_path('read_repair/stop_writes.btm')])
 
         script_version = '_5_1' if self.cluster.version() >= LooseVersion('5.1') else ''
-        node2.byteman_submit([mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
+        byteman_submit(node2, [mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
         coordinator = node2
         # Stop reads on coordinator in order to make sure we do not go through
         # the messaging service for the local reads
@@ -607,22 +608,22 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
-        node3.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node3, [mk_bman_path('read_repair/stop_writes.btm')])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes
-        node2.byteman_submit(['-u', mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, ['-u', mk_bman_path('read_repair/stop_writes.btm')])
 
         script_version = '_5_1' if self.cluster.version() >= LooseVersion('5.1') else ''
-        node1.byteman_submit([mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
+        byteman_submit(node1, [mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
 
         version = self.cluster.cassandra_version()
         if version < '4.1':
-            node1.byteman_submit([mk_bman_path('request_verb_timing.btm')])
+            byteman_submit(node1, [mk_bman_path('request_verb_timing.btm')])
         else:
-            node1.byteman_submit([mk_bman_path('post4.0/request_verb_timing.btm')])
+            byteman_submit(node1, [mk_bman_path('post4.0/request_verb_timing.btm')])
 
         with StorageProxy(node1) as storage_proxy:
             assert storage_proxy.blocking_read_repair == 0
@@ -630,7 +631,7 @@ class TestSpeculativeReadRepair(Tester):
             assert storage_proxy.speculated_rr_write == 0
 
             session = self.get_cql_connection(node1)
-            node2.byteman_submit([mk_bman_path('read_repair/stop_data_reads.btm')])
+            byteman_submit(node2, [mk_bman_path('read_repair/stop_data_reads.btm')])
             results = session.execute(quorum("SELECT * FROM ks.tbl WHERE k=1"))
 
             timing = request_verb_timing(node1)
@@ -658,16 +659,16 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
-        node3.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node3, [mk_bman_path('read_repair/stop_writes.btm')])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes on node 3, leave them off on node2
         script_version = '_5_1' if self.cluster.version() >= LooseVersion('5.1') else ''
-        node2.byteman_submit([mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
 
-        node1.byteman_submit([mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
+        byteman_submit(node1, [mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
         with StorageProxy(node1) as storage_proxy:
             assert storage_proxy.blocking_read_repair == 0
             assert storage_proxy.speculated_rr_read == 0
@@ -695,21 +696,21 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
-        node3.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node3, [mk_bman_path('read_repair/stop_writes.btm')])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes
-        node2.byteman_submit(['-u', mk_bman_path('read_repair/stop_writes.btm')])
-        node3.byteman_submit(['-u', mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, ['-u', mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node3, ['-u', mk_bman_path('read_repair/stop_writes.btm')])
 
         script_version = '_5_1' if self.cluster.version() >= LooseVersion('5.1') else ''
         # force endpoint order
-        node1.byteman_submit([mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
+        byteman_submit(node1, [mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
 
-        node2.byteman_submit([mk_bman_path('read_repair/stop_data_reads.btm')])
-        node3.byteman_submit([mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_data_reads.btm')])
+        byteman_submit(node3, [mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
 
         with StorageProxy(node1) as storage_proxy:
             assert storage_proxy.get_table_metric("ks", "tbl", "SpeculativeRetries") == 0
@@ -740,22 +741,22 @@ class TestSpeculativeReadRepair(Tester):
 
         session.execute(quorum("INSERT INTO ks.tbl (k, c, v) VALUES (1, 0, 1)"))
 
-        node2.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
-        node3.byteman_submit([mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node3, [mk_bman_path('read_repair/stop_writes.btm')])
 
         session.execute("INSERT INTO ks.tbl (k, c, v) VALUES (1, 1, 2)")
 
         # re-enable writes
-        node2.byteman_submit(['-u', mk_bman_path('read_repair/stop_writes.btm')])
-        node3.byteman_submit(['-u', mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node2, ['-u', mk_bman_path('read_repair/stop_writes.btm')])
+        byteman_submit(node3, ['-u', mk_bman_path('read_repair/stop_writes.btm')])
 
         script_version = '_5_1' if self.cluster.version() >= LooseVersion('5.1') else ''
         # force endpoint order
-        node1.byteman_submit([mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
+        byteman_submit(node1, [mk_bman_path('read_repair/sorted_live_endpoints{}.btm'.format(script_version))])
 
-        node2.byteman_submit([mk_bman_path('read_repair/stop_digest_reads.btm')])
-        node3.byteman_submit([mk_bman_path('read_repair/stop_data_reads.btm')])
-        node2.byteman_submit([mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_digest_reads.btm')])
+        byteman_submit(node3, [mk_bman_path('read_repair/stop_data_reads.btm')])
+        byteman_submit(node2, [mk_bman_path('read_repair/stop_rr_writes{}.btm'.format(script_version))])
 
         with StorageProxy(node1) as storage_proxy:
             assert storage_proxy.get_table_metric("ks", "tbl", "SpeculativeRetries") == 0
@@ -786,13 +787,13 @@ def _byteman_cycle(nodes, scripts):
         for name in scripts:
 
             print(node.name)
-            node.byteman_submit([script_path(name)])
+            byteman_submit(node, [script_path(name)])
     yield
 
     for node in nodes:
         for name in scripts:
             print(node.name)
-            node.byteman_submit(['-u', script_path(name)])
+            byteman_submit(node, ['-u', script_path(name)])
 
 
 @contextmanager
@@ -11,6 +11,7 @@ from ccmlib.node import ToolError
 
 from dtest import Tester, create_ks, create_cf, mk_bman_path
 from tools.data import insert_c1c2, query_c1c2
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -219,7 +220,7 @@ class TestRebuild(Tester):
             script = [mk_bman_path('pre4.0/inject_failure_streaming_to_node2.btm')]
         else:
             script = [mk_bman_path('4.0/inject_failure_streaming_to_node2.btm')]
-        node3.byteman_submit(script)
+        byteman_submit(node3, script)
 
         # First rebuild must fail and data must be incomplete
         with pytest.raises(ToolError):
@@ -7,8 +7,8 @@ import logging
 
 from datetime import datetime
 from collections import Counter, namedtuple
-from re import findall, compile
-from uuid import UUID, uuid1
+from re import findall
+from uuid import uuid1
 
 from cassandra import ConsistencyLevel
 from cassandra.query import SimpleStatement
@@ -20,7 +20,9 @@ from dtest import Tester, create_ks, create_cf
 from tools.assertions import assert_almost_equal, assert_one
 from tools.data import create_c1c2_table, insert_c1c2
 from tools.misc import new_node, ImmutableMapping
+from tools.token_ranges import assert_replicas_consistent
 from tools.jmxutils import make_mbean, JolokiaAgent
+from tools.sstable_metadata import sstables_metadata
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -55,26 +57,11 @@ class TestIncRepair(Tester):
 
     @classmethod
     def _get_repaired_data(cls, node, keyspace):
-        _sstable_name = compile('SSTable: (.+)')
-        _repaired_at = compile('Repaired at: (\d+)')
-        _pending_repair = compile('Pending repair: (\-\-|null|[a-f0-9\-]+)')
         _sstable_data = namedtuple('_sstabledata', ('name', 'repaired', 'pending_id'))
 
-        out = node.run_sstablemetadata(keyspace=keyspace).stdout
-
-        def matches(pattern):
-            return filter(None, [pattern.match(l) for l in out.split('\n')])
-        names = [m.group(1) for m in matches(_sstable_name)]
-        repaired_times = [int(m.group(1)) for m in matches(_repaired_at)]
-
-        def uuid_or_none(s):
-            return None if s == 'null' or s == '--' else UUID(s)
-        pending_repairs = [uuid_or_none(m.group(1)) for m in matches(_pending_repair)]
-        assert names
-        assert repaired_times
-        assert pending_repairs
-        assert len(names) == len(repaired_times) == len(pending_repairs)
-        return [_sstable_data(*a) for a in zip(names, repaired_times, pending_repairs)]
+        data = [_sstable_data(m.name, m.repaired_at, m.pending_repair) for m in sstables_metadata(node, keyspace)]
+        assert data
+        return data
 
     def assertNoRepairedSSTables(self, node, keyspace):
         """ Checks that no sstables are marked repaired, and none are marked pending repair """
@@ -108,8 +95,11 @@ class TestIncRepair(Tester):
     def test_consistent_repair(self):
         self.fixture_dtest_setup.setup_overrides.cluster_options = ImmutableMapping({'hinted_handoff_enabled': 'false',
                                                                                      'num_tokens': 1,
-                                                                                     'commitlog_sync_period_in_ms': 500})
-        self.cluster.populate(3).start()
+                                                                                     'commitlog_sync_period_in_ms': 500,
+                                                                                     # so that the replicas can be read in place
+                                                                                     'dynamic_snitch': 'false'})
+        # a single dc, with PropertyFileSnitch, which sorts the coordinator first
+        self.cluster.populate([3]).start()
         node1, node2, node3 = self.cluster.nodelist()
 
         # make data inconsistent between nodes
@@ -161,6 +151,9 @@ class TestIncRepair(Tester):
             assert result.state == ConsistentState.FINALIZED, str(result.state)
             self.assertAllRepairedSSTables(node, 'ks')
 
+        # and that the repair left every replica with the same data
+        assert_replicas_consistent(self.cluster, self.patient_exclusive_cql_connection, 'ks', 'tbl')
+
     def test_sstable_marking(self):
         """
         * Launch a three node cluster
@@ -3,7 +3,6 @@ import os.path
 import threading
 import tempfile
 import time
-import re
 import pytest
 import logging
 
@@ -17,6 +16,8 @@ from ccmlib.node import ToolError
 from dtest import FlakyRetryPolicy, Tester, create_ks, create_cf, mk_bman_path
 from tools.data import insert_c1c2, query_c1c2
 from tools.jmxutils import JolokiaAgent, make_mbean
+from tools.byteman import byteman_submit
+from tools.sstable_metadata import sstables_metadata
 from repair_tests.incremental_repair_test import assert_parent_repair_session_count
 
 since = pytest.mark.since
@@ -289,21 +290,11 @@ class TestRepair(BaseRepairTest):
         """
         Based on incremental_repair_test.py:TestIncRepair implementation.
         """
-        _sstable_name = re.compile('SSTable: (.+)')
-        _repaired_at = re.compile(r'Repaired at: (\d+)')
         _sstable_data = namedtuple('_sstabledata', ('name', 'repaired'))
 
-        out = node.run_sstablemetadata(keyspace=keyspace).stdout
-
-        def matches(pattern):
-            return [_f for _f in [pattern.match(l) for l in out.split('\n')] if _f]
-
-        names = [m.group(1) for m in matches(_sstable_name)]
-        repaired_times = [int(m.group(1)) for m in matches(_repaired_at)]
-
-        assert names
-        assert repaired_times
-        return [_sstable_data(*a) for a in zip(names, repaired_times)]
+        data = [_sstable_data(m.name, m.repaired_at) for m in sstables_metadata(node, keyspace)]
+        assert data
+        return data
 
     @since('2.2.10', max_version='4')
     def test_no_anticompaction_of_already_repaired(self):
@@ -1367,7 +1358,7 @@ class TestRepair(BaseRepairTest):
 
         logger.debug("Submitting byteman script to {}".format(node_to_kill.name))
         # Sleep on anticompaction/stream so there will be time for node to be killed
-        node_to_kill.byteman_submit([mk_bman_path(script)])
+        byteman_submit(node_to_kill, [mk_bman_path(script)])
 
         def node1_repair():
             global nodetool_error
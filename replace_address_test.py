@@ -20,6 +20,7 @@ from bootstrap_test import BootstrapTester
 from dtest import Tester, mk_bman_path
 from tools.assertions import assert_bootstrap_state, assert_all, assert_not_running
 from tools.data import rows_to_list
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -550,13 +551,13 @@ class TestReplaceAddress(BaseReplaceAddressTest):
         btmmark = self.query_node.mark_log()
 
         if self.cluster.version() < '4.0':
-            self.query_node.byteman_submit([mk_bman_path('pre4.0/stream_failure.btm')])
+            byteman_submit(self.query_node, [mk_bman_path('pre4.0/stream_failure.btm')])
             self._do_replace(jvm_option='replace_address_first_boot',
                              opts={'streaming_socket_timeout_in_ms': 1000},
                              wait_for_binary_proto=False,
                              wait_other_notice=True)
         else:
-            self.query_node.byteman_submit([mk_bman_path('4.0/stream_failure.btm')])
+            byteman_submit(self.query_node, [mk_bman_path('4.0/stream_failure.btm')])
             self._do_replace(jvm_option='replace_address_first_boot', wait_for_binary_proto=False, wait_other_notice=True)
 
         # Make sure bootstrap did not complete successfully
@@ -6,6 +6,7 @@ from cassandra.query import SimpleStatement
 
 from dtest import Tester, create_ks, mk_bman_path
 from tools.assertions import (assert_all, assert_none, assert_one)
+from tools.byteman import byteman_submit
 from transient_replication_test import TRANSIENT_REPLICATION_TEST_ENABLED_JVM_ARG
 
 since = pytest.mark.since
@@ -546,7 +547,7 @@ class TestAllowFiltering(ReplicaSideFiltering):
 
         # update the previous value with CL=ONE only in one replica
         node = cluster.nodelist()[1 if missed_by_transient else 0]
-        node.byteman_submit([mk_bman_path('stop_writes.btm')])
+        byteman_submit(node, [mk_bman_path('stop_writes.btm')])
         self.session.execute(SimpleStatement("UPDATE t SET v = 'new' WHERE k = 0", consistency_level=CL.ONE))
 
         # query with CL=ALL to verify that no old values are resurrected
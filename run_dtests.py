@@ -4,7 +4,8 @@ usage: run_dtests.py [-h] [--sstable-format=FORMAT] [--use-vnodes] [--use-off-he
                      [--force-resource-intensive-tests] [--skip-resource-intensive-tests] [--cassandra-dir=CASSANDRA_DIR] [--cassandra-version=CASSANDRA_VERSION]
                      [--delete-logs] [--execute-upgrade-tests] [--execute-upgrade-tests-only] [--disable-active-log-watching] [--keep-test-dir]
                      [--enable-jacoco-code-coverage] [--dtest-enable-debug-logging] [--dtest-print-tests-only] [--dtest-print-tests-output=DTEST_PRINT_TESTS_OUTPUT]
-                     [--pytest-options=PYTEST_OPTIONS] [--dtest-tests=DTEST_TESTS]
+                     [--pytest-options=PYTEST_OPTIONS] [--dtest-tests=DTEST_TESTS] [--collection-cache]
+                     [--ignore-unsupported-modules]
 
 optional arguments:
   -h, --help                                                 show this help message and exit
@@ -30,6 +31,10 @@ optional arguments:
   --pytest-options=PYTEST_OPTIONS                            Additional command line arguments to proxy directly thru when invoking pytest. (default: None)
   --dtest-tests=DTEST_TESTS                                  Comma separated list of test files, test classes, or test methods to execute. (default: None)
   --configuration-yaml=CONFIG_FILE                           The name of the cassandra configuration YAML (e.g. cassandra_latest.yaml) (default: None)
+  --ignore-unsupported-modules                               Do not collect the test modules whose tests all have a since max_version older than the version under
+                                                             test (e.g. the thrift tests on 4.0+), rather than importing them to skip every test (default: False)
+  --collection-cache                                         Cache the tests selected with the given options, and only collect the modules holding them when they are
+                                                             cached (see tools/collection_cache.py) (default: False)
 """
 import subprocess
 import sys
@@ -43,7 +48,9 @@ from tempfile import NamedTemporaryFile
 from _pytest.config.argparsing import Parser
 import argparse
 
-from conftest import pytest_addoption
+from conftest import pytest_addoption, sufficient_system_resources_for_resource_intensive_tests
+from tools import collection_cache
+from upgrade_tests.upgrade_manifest import CURRENT_JAVA_VERSION
 
 logger = logging.getLogger(__name__)
 
@@ -120,6 +127,13 @@ class RunDTests():
 
         args_to_invoke_pytest.append("'--ignore=meta_tests'")
 
+        if args.dtest_print_tests_only and args.collection_cache:
+            cached_tests = cached_test_modules(args)
+            if cached_tests is not None:
+                print("Listing the tests of the collection cache")
+                print_test_modules(cached_tests, args.dtest_print_tests_output)
+                exit(0)
+
         original_raw_cmd_args = ", ".join(args_to_invoke_pytest)
 
         logger.debug("args to call with: [%s]" % original_raw_cmd_args)
@@ -158,14 +172,7 @@ class RunDTests():
                 result = sp.returncode
                 exit(result)
 
-            all_collected_test_modules = collect_test_modules(stdout)
-            joined_test_modules = "\n".join(all_collected_test_modules)
-            print("Collected %d Test Modules" % len(all_collected_test_modules))
-            if args.dtest_print_tests_output is not None:
-                collected_tests_output_file = open(args.dtest_print_tests_output, "w")
-                collected_tests_output_file.write(joined_test_modules)
-                collected_tests_output_file.close()
-            print(joined_test_modules)
+            print_test_modules(collect_test_modules(stdout), args.dtest_print_tests_output)
 
         else:
             print("Printing stdout/stderr from subprocess")
@@ -188,6 +195,33 @@ class RunDTests():
         exit(sp.returncode)
 
 
+def cached_test_modules(args):
+    """
+    @return the tests the collection cache has for the given arguments, or None if it
+            has not cached them yet
+    """
+    cache = collection_cache.CollectionCache()
+    test_args = args.dtest_tests.split(",") if args.dtest_tests else [getcwd()]
+    key = collection_cache.collection_key(cache, test_args,
+                                          lambda option: getattr(args, collection_cache.option_dest(option)),
+                                          sufficient_system_resources_for_resource_intensive_tests(),
+                                          java_version=CURRENT_JAVA_VERSION,
+                                          ignore=['meta_tests'],
+                                          pytest_options=args.pytest_options)
+    tests = cache.get(key)
+    return None if tests is None else collection_cache.class_test_nodeids(tests)
+
+
+def print_test_modules(all_collected_test_modules, output_path):
+    joined_test_modules = "\n".join(all_collected_test_modules)
+    print("Collected %d Test Modules" % len(all_collected_test_modules))
+    if output_path is not None:
+        collected_tests_output_file = open(output_path, "w")
+        collected_tests_output_file.write(joined_test_modules)
+        collected_tests_output_file.close()
+    print(joined_test_modules)
+
+
 def collect_test_modules(stdout):
     test_regex_pattern = re.compile(r".+::.+::.+")
     all_collected_test_modules = []
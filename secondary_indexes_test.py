@@ -24,6 +24,7 @@ from tools.assertions import assert_bootstrap_state, assert_invalid, assert_none
     assert_length_equal, assert_all
 from tools.data import block_until_index_is_built, rows_to_list
 from tools.misc import new_node
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -377,7 +378,7 @@ class TestSecondaryIndexes(Tester):
         # Simulate a failing index rebuild
         before_files = self._index_sstables_files(node, 'k', 't', 'idx')
         mark = node.mark_log()
-        node.byteman_submit([mk_bman_path('index_build_failure.btm')])
+        byteman_submit(node, [mk_bman_path('index_build_failure.btm')])
         with pytest.raises(Exception):
             node.nodetool("rebuild_index k t idx")
         after_files = self._index_sstables_files(node, 'k', 't', 'idx')
@@ -420,7 +421,7 @@ class TestSecondaryIndexes(Tester):
         # Simulate another failing index rebuild
         before_files = after_files
         mark = node.mark_log()
-        node.byteman_submit([mk_bman_path('index_build_failure.btm')])
+        byteman_submit(node, [mk_bman_path('index_build_failure.btm')])
         with pytest.raises(Exception):
             node.nodetool("rebuild_index k t idx")
         after_files = self._index_sstables_files(node, 'k', 't', 'idx')
@@ -1259,9 +1260,9 @@ class TestPreJoinCallback(Tester):
             node1.start(wait_for_binary_proto=True)
 
             if cluster.version() < '4.0':
-                node1.byteman_submit([mk_bman_path('pre4.0/inject_failure_streaming_to_node2.btm')])
+                byteman_submit(node1, [mk_bman_path('pre4.0/inject_failure_streaming_to_node2.btm')])
             else:
-                node1.byteman_submit([mk_bman_path('4.0/inject_failure_streaming_to_node2.btm')])
+                byteman_submit(node1, [mk_bman_path('4.0/inject_failure_streaming_to_node2.btm')])
 
             node2 = new_node(cluster)
 
@@ -14,6 +14,7 @@ from tools.misc import ImmutableMapping
 from dtest_setup_overrides import DTestSetupOverrides
 from dtest import Tester, create_ks, create_cf, mk_bman_path, MAJOR_VERSION_4, MAJOR_VERSION_5
 from tools.assertions import assert_all, assert_none, assert_one, assert_unavailable
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -455,7 +456,7 @@ class TestSSTableGenerationAndLoadingLegacyIndex(BaseSStableLoaderTester):
         assert_one(session, "SELECT * FROM k.t WHERE v = 8", [0, 2, 8])
 
         # Load SSTables with a failure during index creation
-        node.byteman_submit([mk_bman_path('index_build_failure.btm')])
+        byteman_submit(node, [mk_bman_path('index_build_failure.btm')])
         with pytest.raises(Exception):
             self.load_sstables(cluster, node, 'k')
 
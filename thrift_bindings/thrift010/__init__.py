@@ -1 +1,25 @@
+import importlib.util
+import sys
+
 __all__ = ['ttypes', 'constants', 'Cassandra']
+
+
+def __getattr__(name):
+    """
+    Imports the bindings lazily: `from thrift_bindings.thrift010 import Cassandra` gives a
+    module which is only executed once one of its attributes is used, so that importing
+    a test module which only uses thrift in a few tests does not load the 11k lines of
+    Cassandra.py.
+    """
+    if name not in __all__:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    fullname = '{}.{}'.format(__name__, name)
+    module = sys.modules.get(fullname)
+    if module is None:
+        spec = importlib.util.find_spec(fullname)
+        spec.loader = importlib.util.LazyLoader(spec.loader)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[fullname] = module
+        spec.loader.exec_module(module)
+    globals()[name] = module
+    return module
@@ -8,7 +8,7 @@ import pytest
 import logging
 
 from dtest import DEFAULT_DIR, Tester, create_ks
-from thrift_test import get_thrift_client
+from tools.thrift_client import get_thrift_client
 from tools.jmxutils import JolokiaAgent, make_mbean
 
 since = pytest.mark.since
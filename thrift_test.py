@@ -6,28 +6,27 @@ import pytest
 import logging
 import codecs
 
-from thrift.protocol import TBinaryProtocol
 from thrift.Thrift import TApplicationException
-from thrift.transport import TSocket, TTransport
 
 from tools.assertions import assert_length_equal
 from tools.misc import ImmutableMapping
+from tools.thrift_client import fastbinary_available, get_thrift_client
 
 from dtest_setup_overrides import DTestSetupOverrides
 from dtest import Tester
 
 from thrift_bindings.thrift010 import Cassandra
-from thrift_bindings.thrift010.Cassandra import (CfDef, Column, ColumnDef,
-                                           ColumnOrSuperColumn, ColumnParent,
-                                           ColumnPath, ColumnSlice,
-                                           ConsistencyLevel, CounterColumn,
-                                           Deletion, IndexExpression,
-                                           IndexOperator, IndexType,
-                                           InvalidRequestException, KeyRange,
-                                           KeySlice, KsDef, MultiSliceRequest,
-                                           Mutation, NotFoundException,
-                                           SlicePredicate, SliceRange,
-                                           SuperColumn)
+from thrift_bindings.thrift010.ttypes import (CfDef, Column, ColumnDef,
+                                              ColumnOrSuperColumn, ColumnParent,
+                                              ColumnPath, ColumnSlice,
+                                              ConsistencyLevel, CounterColumn,
+                                              Deletion, IndexExpression,
+                                              IndexOperator, IndexType,
+                                              InvalidRequestException, KeyRange,
+                                              KeySlice, KsDef, MultiSliceRequest,
+                                              Mutation, NotFoundException,
+                                              SlicePredicate, SliceRange,
+                                              SuperColumn)
 from tools.assertions import (assert_all, assert_none, assert_one)
 
 MAX_TTL = 20 * 365 * 24 * 60 * 60  # 20 years in seconds
@@ -38,14 +37,6 @@ utf8encoder = codecs.getencoder('utf-8')
 def utf8encode(str):
     return utf8encoder(str)[0]
 
-def get_thrift_client(host='127.0.0.1', port=9160):
-    socket = TSocket.TSocket(host, port)
-    transport = TTransport.TFramedTransport(socket)
-    protocol = TBinaryProtocol.TBinaryProtocol(transport)
-    client = Cassandra.Client(protocol)
-    client.transport = transport
-    return client
-
 
 client = None
 
@@ -83,10 +74,9 @@ class TestThrift(Tester):
             node1.set_configuration_options(values={'initial_token': 'abcd'})
 
         # CASSANDRA-14092 - prevent max ttl tests from failing
-        fixture_dtest_setup.cluster.start(jvm_args=['-Dcassandra.expiration_date_overflow_policy=CAP',
+        fixture_dtest_setup.start_cluster(ready=('cql', 'thrift'),
+                                          jvm_args=['-Dcassandra.expiration_date_overflow_policy=CAP',
                                                     '-Dcassandra.expiration_overflow_warning_interval_minutes=0'])
-        fixture_dtest_setup.cluster.nodelist()[0].watch_log_for("Listening for thrift clients")  # Wait for the thrift port to open
-        time.sleep(0.1)
         # this is ugly, but the whole test module is written against a global client
         global client
         client = get_thrift_client()
@@ -2717,3 +2707,57 @@ class TestMutations(TestThrift):
         assert 2 == len(ret)
 
         node1.nodetool('flush Keyspace1 test')
+
+
+class TestThriftProtocolBenchmark(TestThrift):
+
+    def _read_all_rows(self, bench_client, column_family, page_size=500):
+        parent = ColumnParent(column_family)
+        predicate = SlicePredicate(slice_range=SliceRange(utf8encode(''), utf8encode(''), False, 1000))
+        rows = []
+        start = utf8encode('')
+        while True:
+            page = get_range_slice(bench_client, parent, predicate, start, utf8encode(''), page_size,
+                                   ConsistencyLevel.ONE)
+            # every page after the first starts with the last row of the previous one
+            page = page[1:] if rows else page
+            if not page:
+                return rows
+            rows.extend((key_slice.key, [c.column for c in key_slice.columns]) for key_slice in page)
+            start = page[-1].key
+
+    def test_accelerated_protocol(self):
+        """
+        Times batch_mutate and get_range_slices through the accelerated binary protocol and
+        through the pure Python one, and checks both read back the same rows.
+        """
+        node1, = self.cluster.nodelist()
+        host, port = node1.network_interfaces['thrift']
+        num_batches, keys_per_batch, columns_per_key = 50, 50, 20
+        batches = [[utf8encode('key_{:06d}'.format(b * keys_per_batch + k)) for k in range(keys_per_batch)]
+                   for b in range(num_batches)]
+        columns = [Column(utf8encode('c{:03d}'.format(c)), utf8encode('value{}'.format(c)) * 10, 0)
+                   for c in range(columns_per_key)]
+
+        rows = {}
+        for accelerated, column_family in ((False, 'Standard1'), (True, 'Standard2')):
+            bench_client = get_thrift_client(host, port, accelerated=accelerated)
+            bench_client.transport.open()
+            bench_client.set_keyspace('Keyspace1')
+            mutations = {column_family: [Mutation(ColumnOrSuperColumn(c)) for c in columns]}
+
+            start = time.time()
+            for batch in batches:
+                bench_client.batch_mutate({key: mutations for key in batch}, ConsistencyLevel.ONE)
+            write_time = time.time() - start
+
+            start = time.time()
+            rows[accelerated] = self._read_all_rows(bench_client, column_family)
+            read_time = time.time() - start
+            bench_client.transport.close()
+
+            logger.info("{} protocol: batch_mutate {:.2f}s, get_range_slices {:.2f}s".format(
+                'accelerated' if accelerated and fastbinary_available() else 'pure Python', write_time, read_time))
+
+        assert len(rows[False]) == num_batches * keys_per_batch
+        assert rows[False] == rows[True]
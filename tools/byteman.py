@@ -0,0 +1,185 @@
+"""
+A Python client for the Byteman agent the nodes run with `install_byteman=True`.
+
+node.byteman_submit starts a `bmsubmit` JVM for every call, which takes a couple
+of seconds. The agent listens on a TCP socket (the node's byteman_port) for
+plain text requests, which is all bmsubmit does, so rules can be loaded and
+unloaded without a JVM:
+
+    LOAD / DELETE       followed by a `SCRIPT <name>`, script text, `ENDSCRIPT`
+                        block per rule file, and ENDLOAD / ENDDELETE
+    DELETEALL, LIST     on their own
+
+The agent answers every request with lines of text followed by a line holding
+`OK`, and closes the connection.
+
+Rule files are read and parsed once per session (see rule_file). Rule files
+specific to some versions live in version directories of byteman/, see
+versioned_rule_path. preload_byteman_rules has the agent load rule files as
+the node starts, through its `script:` option.
+"""
+import logging
+import os
+import re
+import socket
+
+from ccmlib.version import LooseVersion
+
+from dtest import BYTEMAN_DIR
+
+logger = logging.getLogger(__name__)
+
+# version directories of byteman/, most specific first, with the (min, max) Cassandra
+# versions they apply to
+VERSION_DIRS = (
+    ('post5.1', '5.1', None),
+    ('post4.0', '4.1', None),
+    ('4.0', '4.0', None),
+    ('pre4.0', None, '4.0'),
+)
+
+
+class BytemanError(Exception):
+    pass
+
+
+class RuleFile(object):
+    """
+    The text of a .btm file and the names of the rules it defines.
+    """
+
+    def __init__(self, path, text):
+        self.path = path
+        self.text = text if text.endswith('\n') else text + '\n'
+        self.rule_names = re.findall(r'^\s*RULE\s+(.+?)\s*$', text, re.MULTILINE)
+
+    def script_block(self):
+        return 'SCRIPT {}\n{}ENDSCRIPT\n'.format(self.path, self.text)
+
+
+_rule_files = {}
+
+
+def rule_file(path):
+    """
+    @return the RuleFile for the given path, read at most once per session unless it changes
+    """
+    mtime = os.path.getmtime(path)
+    cached = _rule_files.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f:
+            cached = (mtime, RuleFile(path, f.read()))
+        _rule_files[path] = cached
+    return cached[1]
+
+
+def versioned_rule_path(name, version):
+    """
+    @return the path of the rule file `name` for the given Cassandra version: the one in
+            the most specific version directory applying to the version, or else the one
+            at the top of byteman/
+    """
+    version = LooseVersion(str(version))
+    for directory, min_version, max_version in VERSION_DIRS:
+        if min_version is not None and version < min_version:
+            continue
+        if max_version is not None and version >= max_version:
+            continue
+        path = os.path.join(BYTEMAN_DIR, directory, name)
+        if os.path.exists(path):
+            return path
+    path = os.path.join(BYTEMAN_DIR, name)
+    if not os.path.exists(path):
+        raise BytemanError("There is no byteman rule file {} for version {}".format(name, version))
+    return path
+
+
+class BytemanClient(object):
+    """
+    Talks to the Byteman agent listening on the given port.
+    """
+
+    def __init__(self, port, host='localhost', timeout=30):
+        self.host = host
+        self.port = int(port)
+        self.timeout = timeout
+
+    def _request(self, request):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(request.encode('utf-8'))
+            lines = []
+            with sock.makefile('r', encoding='utf-8') as response:
+                for line in response:
+                    if line.strip() == 'OK':
+                        return '\n'.join(lines)
+                    lines.append(line.rstrip('\n'))
+        raise BytemanError("The byteman agent on port {} closed the connection before answering {}: {}".format(
+            self.port, request.split('\n', 1)[0], '\n'.join(lines)))
+
+    def _scripts_request(self, command, paths):
+        blocks = ''.join(rule_file(path).script_block() for path in paths)
+        response = self._request('{}\n{}END{}\n'.format(command, blocks, command))
+        errors = [line for line in response.splitlines() if line.startswith(('ERROR', 'EXCEPTION'))]
+        if errors:
+            raise BytemanError("Could not {} {}:\n{}".format(command.lower(), paths, response))
+        return response
+
+    def load(self, paths):
+        """
+        Loads (or reloads) every rule of the given rule files.
+        """
+        return self._scripts_request('LOAD', paths)
+
+    def unload(self, paths):
+        """
+        Unloads every rule of the given rule files.
+        """
+        return self._scripts_request('DELETE', paths)
+
+    def unload_all(self):
+        return self._request('DELETEALL\n')
+
+    def list_rules(self):
+        """
+        @return the agent's listing of the loaded rules, and of where they were injected
+        """
+        return self._request('LIST\n')
+
+    def loaded_rule_names(self):
+        return set(re.findall(r'^\s*RULE\s+(.+?)\s*$', self.list_rules(), re.MULTILINE))
+
+    def is_loaded(self, path):
+        """
+        @return whether every rule of the given rule file is loaded
+        """
+        return set(rule_file(path).rule_names) <= self.loaded_rule_names()
+
+
+def byteman_submit(node, opts):
+    """
+    Same as node.byteman_submit, without starting a bmsubmit JVM: loads the rule files
+    given in opts, or unloads them if opts starts with '-u' (all of them if no file is
+    given). Any other bmsubmit option goes through node.byteman_submit.
+    """
+    client = BytemanClient(node.byteman_port)
+    if opts and opts[0] == '-u':
+        return client.unload(opts[1:]) if opts[1:] else client.unload_all()
+    if opts and opts[0] == '-l':
+        return client.list_rules()
+    if any(opt.startswith('-') for opt in opts):
+        return node.byteman_submit(opts)
+    return client.load(opts)
+
+
+def preload_byteman_rules(node, paths):
+    """
+    Makes the node's byteman agent load the given rule files as soon as it starts,
+    before any class they inject into is loaded. Only takes effect on the next start.
+
+    The agent takes one `script:` option per rule file, and ccm appends the node's startup
+    script to the agent options as `,script:<value>`, so every file after the first one
+    goes in as another option.
+    """
+    paths = [rule_file(os.path.abspath(path)).path for path in paths]
+    logger.debug("Preloading byteman rules {} on {}".format(paths, node.name))
+    node.update_startup_byteman_script(',script:'.join(paths))
@@ -0,0 +1,208 @@
+"""
+Starting the nodes of a cluster concurrently and waiting for all of them to be ready at
+once, see DTestSetup.start_cluster.
+
+ccm's cluster.start launches the nodes one after the other, then watches their logs one
+after the other, with a timeout for each watch, and tests then add their own
+watch_log_for, wait_for_binary_interface and sleep calls for what it does not wait for.
+start_nodes launches the nodes from a thread each, the seeds first when some of the nodes
+started are not seeds, then polls the logs of all of the nodes in a single loop until every
+node logged every readiness event asked for, with a single deadline:
+
+    gossip  every node started sees the other nodes started UP, and every node already
+            running sees the nodes started UP (what wait_other_notice waits for)
+    cql     the node logged that it listens for CQL clients, and its binary interface
+            accepts connections
+    thrift  the same for thrift, on the nodes running a version with thrift (< 4.0) and
+            start_rpc enabled
+
+A cluster of n nodes is then ready in the time of its slowest node rather than in the sum
+of the time of its nodes.
+"""
+import logging
+import os
+import re
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from ccmlib import common, extension
+from ccmlib.node import NodeError, TimeoutError
+
+logger = logging.getLogger(__name__)
+
+READY_EVENTS = ('gossip', 'cql', 'thrift')
+
+MESSAGING_STARTED = "Starting Messaging Service"
+CQL_LISTENING = "Starting listening for CQL clients"
+THRIFT_LISTENING = "Listening for thrift clients"
+
+POLL_INTERVAL = 0.1
+
+
+def alive_pattern(node):
+    return "{}.* now UP".format(re.escape(node.address()))
+
+
+def thrift_enabled(node):
+    if node.cluster.cassandra_version() >= '4':
+        return False
+    return str(node.get_conf_option('start_rpc')).lower() == 'true'
+
+
+def is_seed(cluster, node):
+    return any(seed is node or seed == node.address() for seed in cluster.seeds)
+
+
+class LogWatch(object):
+    """
+    The patterns a node is expected to log, looked for in its log from a mark on.
+    """
+
+    def __init__(self, node, mark=0, process=None):
+        self.node = node
+        self.process = process
+        self.position = mark
+        # the patterns not found yet, by pattern
+        self.pending = OrderedDict()
+        self._partial_line = b''
+
+    def expect(self, patterns):
+        for pattern in patterns:
+            self.pending[pattern] = re.compile(pattern)
+
+    def poll(self):
+        """
+        Reads the lines logged since the previous poll, raising a NodeError if the start
+        of the node failed.
+        @return whether any of the pending patterns was found
+        """
+        if self.process is not None and self.process.poll() not in (None, 0):
+            raise NodeError("Error starting {}".format(self.node.name), self.process)
+        path = self.node.logfilename()
+        if not self.pending or not os.path.exists(path):
+            return False
+        with open(path, 'rb') as f:
+            f.seek(self.position)
+            data = f.read()
+            self.position = f.tell()
+        lines = (self._partial_line + data).split(b'\n')
+        # the last line is incomplete, or empty if the data ends with a new line
+        self._partial_line = lines.pop()
+        found = False
+        for line in lines:
+            text = line.decode('utf-8', errors='replace')
+            for pattern, regex in list(self.pending.items()):
+                if regex.search(text):
+                    del self.pending[pattern]
+                    found = True
+        return found
+
+
+def wait_for_logs(watches, deadline, pattern=None):
+    """
+    Polls the logs of the nodes until each of them logged every pattern it expects, or
+    only the given pattern if one is given.
+    @param deadline the time.monotonic() past which a TimeoutError is raised
+    """
+    def waiting(watch):
+        return pattern in watch.pending if pattern is not None else bool(watch.pending)
+
+    while True:
+        found = False
+        for watch in watches:
+            if watch.poll():
+                found = True
+        pending = [watch for watch in watches if waiting(watch)]
+        if not pending:
+            return
+        if time.monotonic() > deadline:
+            missing = ["{}: {}".format(watch.node.name, [pattern] if pattern is not None else list(watch.pending))
+                       for watch in pending]
+            raise TimeoutError(time.strftime("%d %b %Y %H:%M:%S", time.gmtime()) +
+                               " Missing from the node logs: " + "; ".join(missing))
+        if not found:
+            time.sleep(POLL_INTERVAL)
+
+
+def wait_for_interfaces(nodes, ready, deadline):
+    for node in nodes:
+        for event, interface in (('cql', 'binary'), ('thrift', 'thrift')):
+            if event not in ready or (event == 'thrift' and not thrift_enabled(node)):
+                continue
+            itf = node.network_interfaces[interface]
+            if not common.check_socket_listening(itf, timeout=max(deadline - time.monotonic(), 1)):
+                raise TimeoutError("{} interface {}:{} of {} is not listening".format(event, itf[0], itf[1],
+                                                                                      node.name))
+
+
+def launch(nodes, parallel=True, jvm_args=None, **kwargs):
+    """
+    Starts the nodes without waiting for them to be ready.
+    @return the launch processes of the nodes
+    """
+    def start(node):
+        return node.start(wait_other_notice=False, wait_for_binary_proto=False, jvm_args=list(jvm_args or []),
+                          **kwargs)
+
+    if not parallel or len(nodes) < 2:
+        return [start(node) for node in nodes]
+    with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+        return list(executor.map(start, nodes))
+
+
+def start_nodes(cluster, nodes=None, parallel=True, ready=READY_EVENTS, timeout=120, **kwargs):
+    """
+    Starts the nodes of the cluster which are not running and waits for all of them to be
+    ready (see the module documentation).
+    @param nodes the nodes to start, all the nodes of the cluster by default
+    @param parallel whether to start the nodes concurrently
+    @param ready the events to wait for, among READY_EVENTS
+    @param timeout the seconds all of the nodes have to be ready in
+    @param kwargs the arguments of node.start, e.g. jvm_args
+    @return the nodes started
+    """
+    unknown = set(ready) - set(READY_EVENTS)
+    if unknown:
+        raise ValueError("Unknown readiness events {}, expected some of {}".format(sorted(unknown), READY_EVENTS))
+    deadline = time.monotonic() + timeout
+    nodes = [node for node in (nodes if nodes is not None else cluster.nodelist()) if not node.is_running()]
+    if not nodes:
+        return []
+    running = [node for node in cluster.nodelist() if node.is_running()]
+
+    watches = OrderedDict((node.name, LogWatch(node, node.mark_log())) for node in running + nodes)
+    for node in nodes:
+        patterns = []
+        if 'gossip' in ready:
+            patterns.extend(alive_pattern(other) for other in nodes if other is not node)
+            for other in running:
+                watches[other.name].expect([alive_pattern(node)])
+        if 'cql' in ready:
+            patterns.append(CQL_LISTENING)
+        if 'thrift' in ready and thrift_enabled(node):
+            patterns.append(THRIFT_LISTENING)
+        watches[node.name].expect(patterns)
+
+    extension.pre_cluster_start(cluster)
+    seeds = [node for node in nodes if is_seed(cluster, node)]
+    others = [node for node in nodes if not is_seed(cluster, node)]
+    if seeds and others:
+        # the nodes which are not seeds are started once the seeds listen for them
+        for node in seeds:
+            watches[node.name].expect([MESSAGING_STARTED])
+        groups = [seeds, others]
+    else:
+        groups = [nodes]
+    for i, group in enumerate(groups):
+        logger.debug("Starting {}".format(", ".join(node.name for node in group)))
+        for node, process in zip(group, launch(group, parallel=parallel, **kwargs)):
+            watches[node.name].process = process
+        if i < len(groups) - 1:
+            wait_for_logs([watches[node.name] for node in group], deadline, pattern=MESSAGING_STARTED)
+
+    wait_for_logs(list(watches.values()), deadline)
+    wait_for_interfaces(nodes, ready, deadline)
+    extension.post_cluster_start(cluster)
+    return nodes
@@ -0,0 +1,357 @@
+"""
+A cache of the tests pytest collects and selects, so that repeat runs and shard
+planning do not have to import every test module.
+
+Collecting imports every test module, the thrift bindings and the generated
+upgrade tests included, even when most of them end up deselected (e.g. every
+upgrade test without --execute-upgrade-tests). With `--collection-cache`, the
+node ids of the selected tests are stored along with their marks and `since`
+metadata, keyed by:
+
+    - the path and content hash of every .py file of the dtest tree, pytest.ini
+      and the build.xml of the Cassandra directory; the hashes are only computed
+      again for files whose mtime or size changed
+    - the test paths given on the command line, -k, -m and the options deciding
+      which tests are generated and selected (SELECTION_OPTIONS)
+    - whether the machine has the resources for the resource intensive tests
+    - the environment deciding which upgrade tests are generated (see
+      upgrade_manifest): RUN_STATIC_UPGRADE_MATRIX, JAVA_HOME, the JAVA<n>_HOME
+      variables and the version of the JDK the tests run with
+
+When the key is found, pytest only collects the modules holding selected tests,
+and run_dtests.py --dtest-print-tests-only prints the cached tests without
+starting pytest at all.
+
+The cache is DTEST_COLLECTION_CACHE_FILE, by default .pytest_cache/dtest_collection.json
+in the dtest directory.
+
+module_max_versions reads the `since` marks of a test module from its source, so
+that modules whose tests would all be skipped against the version under test
+(e.g. the thrift tests against 4.0+) need not be imported at all, see
+`--ignore-unsupported-modules`.
+"""
+import ast
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+
+from configparser import ConfigParser
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+# the number of keys kept, the least recently stored being dropped first
+MAX_KEYS = 16
+
+# the options changing which tests are generated or deselected in pytest_collection_modifyitems
+SELECTION_OPTIONS = (
+    '--use-vnodes',
+    '--use-off-heap-memtables',
+    '--force-resource-intensive-tests',
+    '--only-resource-intensive-tests',
+    '--skip-resource-intensive-tests',
+    '--execute-upgrade-tests',
+    '--execute-upgrade-tests-only',
+    '--upgrade-version-selection',
+    '--upgrade-source-filter',
+    '--upgrade-target-filter',
+    '--upgrade-target-version-only',
+    '--cassandra-dir',
+    '--cassandra-version',
+    '--metatests',
+    '--ignore-unsupported-modules',
+)
+
+# the environment variables changing which upgrade tests are generated, see upgrade_manifest.jdk_compatible_steps
+_ENVIRONMENT_VARIABLES = re.compile(r"^(RUN_STATIC_UPGRADE_MATRIX|JAVA\d*_HOME)$")
+
+DTEST_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the node ids run_dtests.py prints, those of test methods of test classes
+_CLASS_TEST_NODEID = re.compile(r".+::.+::.+")
+
+
+def default_cache_path(root=DTEST_DIR):
+    return os.environ.get('DTEST_COLLECTION_CACHE_FILE', os.path.join(root, '.pytest_cache', 'dtest_collection.json'))
+
+
+def option_dest(option):
+    """
+    @return the attribute argparse stores an option in, e.g. use_vnodes for --use-vnodes
+    """
+    return option.lstrip('-').replace('-', '_')
+
+
+def selection_options(getoption):
+    """
+    @param getoption a function returning the value of a command line option, e.g. config.getoption
+    @return the values of the SELECTION_OPTIONS
+    """
+    return {option: getoption(option) for option in SELECTION_OPTIONS}
+
+
+def normalize_test_args(args, root=DTEST_DIR):
+    """
+    @return the test paths or node ids given on the command line, relative to the dtest
+            directory, without those selecting the whole directory
+    """
+    normalized = []
+    for arg in args:
+        path, sep, rest = str(arg).partition('::')
+        path = os.path.relpath(os.path.abspath(path), root).replace(os.sep, '/')
+        if path != '.' or sep:
+            normalized.append(path + sep + rest)
+    return sorted(normalized)
+
+
+def cassandra_build_file(cassandra_dir, root=DTEST_DIR):
+    """
+    @param cassandra_dir the --cassandra-dir option, if given
+    @return the build.xml of the Cassandra directory, from the option or else from pytest.ini
+    """
+    if not cassandra_dir:
+        ini = ConfigParser(interpolation=None)
+        ini.read(os.path.join(root, 'pytest.ini'))
+        cassandra_dir = ini.get('pytest', 'cassandra_dir', fallback=None)
+    if not cassandra_dir or not cassandra_dir.strip():
+        return None
+    return os.path.join(os.path.expanduser(cassandra_dir.strip()), 'build.xml')
+
+
+def _source_files(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.') and d != '__pycache__')
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                yield os.path.join(dirpath, filename)
+    yield os.path.join(root, 'pytest.ini')
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CollectionCache(object):
+    """
+    The cached collections of a dtest directory, read from and stored to a json file.
+    """
+
+    def __init__(self, path=None, root=DTEST_DIR):
+        self.root = root
+        self.path = path or default_cache_path(root)
+        self._data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring the unreadable collection cache {}: {}".format(self.path, e))
+            data = None
+        if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+            data = {'version': CACHE_VERSION, 'files': {}, 'collections': {}}
+        return data
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        # written to a temporary file first, as several pytest processes may store at once
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.dtest_collection')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._data, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _hash(self, path):
+        """
+        @return the content hash of the file, only computed again if its mtime or size changed
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        relpath = os.path.relpath(path, self.root)
+        cached = self._data['files'].get(relpath)
+        if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        file_hash = _file_hash(path)
+        self._data['files'][relpath] = [stat.st_mtime_ns, stat.st_size, file_hash]
+        return file_hash
+
+    def fingerprint(self, extra_files=()):
+        """
+        @return a digest of the paths and contents of the files collection depends on
+        """
+        digest = hashlib.sha256()
+        for path in list(_source_files(self.root)) + [path for path in extra_files if path]:
+            digest.update('{}\0{}\0'.format(os.path.relpath(path, self.root), self._hash(path)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def key(self, test_args, options, sufficient_resources, extra_files=()):
+        """
+        @param test_args the test paths or node ids, as returned by normalize_test_args
+        @param options the values of the options selecting the tests, -k and -m included
+        @param sufficient_resources whether resource intensive tests may run on this machine
+        """
+        description = json.dumps({'fingerprint': self.fingerprint(extra_files),
+                                  'args': list(test_args),
+                                  'options': options,
+                                  'sufficient_resources': bool(sufficient_resources)},
+                                 sort_keys=True, default=str)
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        @return the cached tests of the key, a list of dicts with the nodeid, marks and
+                since of every test, or None if the key is not cached
+        """
+        collection = self._data['collections'].get(key)
+        return None if collection is None else collection['tests']
+
+    def put(self, key, tests):
+        collections = self._data['collections']
+        collections[key] = {'stored': time.time(), 'tests': tests}
+        for old_key in sorted(collections, key=lambda k: collections[k]['stored'])[:-MAX_KEYS]:
+            del collections[old_key]
+
+
+def environment_options(environ, java_version):
+    """
+    @param java_version the version of the JDK the tests run with, upgrade_manifest.CURRENT_JAVA_VERSION
+    @return the environment the generated upgrade tests depend on
+    """
+    options = {name: value for name, value in environ.items() if _ENVIRONMENT_VARIABLES.match(name)}
+    options['CURRENT_JAVA_VERSION'] = java_version
+    return options
+
+
+def collection_key(cache, test_args, getoption, sufficient_resources, java_version=None, keyword=None,
+                   markexpr=None, ignore=None, environ=None, pytest_options=None):
+    """
+    @param test_args the test paths or node ids given on the command line
+    @param getoption a function returning the value of a command line option
+    @param java_version the version of the JDK the tests run with, see environment_options
+    @param ignore the paths given with --ignore
+    @param environ the environment variables, os.environ by default
+    @param pytest_options the whole --pytest-options string of run_dtests.py, if any
+    @return the key of the tests collected and selected with the given arguments
+    """
+    options = selection_options(getoption)
+    options.update({'-k': keyword or '', '-m': markexpr or '',
+                    '--ignore': normalize_test_args(ignore or [], cache.root),
+                    '--pytest-options': pytest_options or ''})
+    options.update(environment_options(os.environ if environ is None else environ, java_version))
+    return cache.key(normalize_test_args(test_args, cache.root), options, sufficient_resources,
+                     extra_files=[cassandra_build_file(options['--cassandra-dir'], cache.root)])
+
+
+def item_entry(item):
+    """
+    @return the cached entry of a pytest item
+    """
+    since = item.get_closest_marker('since')
+    return {'nodeid': item.nodeid,
+            'marks': sorted({mark.name for mark in item.iter_markers()}),
+            'since': None if since is None else {'args': list(since.args), 'kwargs': dict(since.kwargs)}}
+
+
+def cached_modules(tests):
+    """
+    @return the sorted paths of the modules of the cached tests
+    """
+    return sorted({test['nodeid'].split('::', 1)[0] for test in tests})
+
+
+def class_test_nodeids(tests):
+    """
+    @return the node ids of the cached test methods of test classes, as run_dtests.py lists them
+    """
+    return [test['nodeid'] for test in tests if _CLASS_TEST_NODEID.match(test['nodeid'])]
+
+
+def _decorator_name(node):
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+def _since(decorators):
+    """
+    @return whether the decorators hold a `since` mark, and its max_version
+    """
+    for decorator in decorators:
+        if isinstance(decorator, ast.Call) and _decorator_name(decorator) == 'since':
+            for keyword in decorator.keywords:
+                if keyword.arg == 'max_version' and isinstance(keyword.value, ast.Constant):
+                    return True, keyword.value.value
+            return True, None
+    return False, None
+
+
+def _is_test_function(node):
+    return isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith('test')
+
+
+def module_max_versions(path):
+    """
+    Reads the `since` max_version of every test of a test module from its source, without
+    importing it. A test without a since mark of its own gets the one of its class, which
+    may be inherited from a class of the same module.
+
+    @return the max_versions, or None if any test may run against any later version: it has
+            no max_version, or its class inherits from a class of another module than Tester
+    """
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=path)
+    max_versions = []
+    # the max_version of the classes of the module, and whether they have tests without a since mark
+    classes = {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            marked, class_max_version = _since(node.decorator_list)
+            unmarked_tests = False
+            for base in (_decorator_name(base) for base in node.bases):
+                if base in ('Tester', 'object'):
+                    continue
+                if base not in classes:
+                    return None
+                base_max_version, base_unmarked_tests = classes[base]
+                unmarked_tests = unmarked_tests or base_unmarked_tests
+                if not marked and class_max_version is None:
+                    class_max_version = base_max_version
+            for test in (n for n in node.body if _is_test_function(n)):
+                test_marked, max_version = _since(test.decorator_list)
+                if not test_marked:
+                    unmarked_tests = True
+                elif max_version is None:
+                    return None
+                else:
+                    max_versions.append(max_version)
+            classes[node.name] = (class_max_version, unmarked_tests)
+            if node.name.startswith('Test') and unmarked_tests:
+                if class_max_version is None:
+                    return None
+                max_versions.append(class_max_version)
+        elif _is_test_function(node):
+            marked, max_version = _since(node.decorator_list)
+            if max_version is None:
+                return None
+            max_versions.append(max_version)
+    return max_versions
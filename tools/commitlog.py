@@ -0,0 +1,196 @@
+"""
+A read-only inspector of commitlog segments, the CommitLog-<version>-<id>.log
+files of the commitlogs and cdc_raw directories.
+
+A segment starts with a header (version, segment id, and from 2.2 on the json
+parameters of its compression or encryption) followed by a crc32. The rest of
+the segment is made of sections, each starting with a sync marker: the file
+position the section ends at, and a crc32 of the segment id and of the position
+of the marker. The first marker that is zeroed or does not check out ends the
+segment, the rest of the file being preallocated space. Sections of segments
+which are neither compressed nor encrypted hold mutations, each written as its
+size, the crc32 of its size, the serialized mutation and the crc32 of both.
+
+Segments are memory mapped and read lazily, so the segments being written by
+a running node can be inspected without copying them. For example, whether any
+segment of cdc_raw holds mutations of a table:
+
+    any(table_id in segment_table_ids(path) for path in segment_files(cdc_raw_dir))
+"""
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import uuid
+import zlib
+from collections import namedtuple
+
+from tools.sstable_metadata import unsigned_vint
+
+logger = logging.getLogger(__name__)
+
+# the commitlog version of 3.0, the first one whose mutations start with the table id
+VERSION_30 = 6
+# the first version with parameters in the header
+VERSION_22 = 5
+
+SYNC_MARKER_SIZE = 8
+ENTRY_OVERHEAD_SIZE = 12
+
+_SEGMENT_NAME = re.compile(r'^CommitLog-(?P<version>\d+)-(?P<id>\d+)\.log$')
+
+SegmentHeader = namedtuple('SegmentHeader', ('version', 'id', 'parameters', 'size'))
+# a section of a segment, from the position following its sync marker to the next marker
+SyncSection = namedtuple('SyncSection', ('start', 'end'))
+MutationHeader = namedtuple('MutationHeader', (
+    'position',       # the position of the mutation in the segment
+    'size',           # the size of the serialized mutation
+    'table_id',       # the UUID of the table of the first partition update of the mutation
+    'partition_key',  # the serialized partition key of that partition update
+    'updates',        # the number of partition updates (of different tables) in the mutation
+))
+
+
+class CommitLogError(Exception):
+    pass
+
+
+def _crc_of_ints(*values, crc=0):
+    return zlib.crc32(struct.pack('>{}i'.format(len(values)), *values), crc)
+
+
+def _id_ints(segment_id):
+    """
+    The segment id as the two ints checksums are computed over, its low half first
+    """
+    return struct.unpack('>ii', struct.pack('>II', segment_id & 0xffffffff, segment_id >> 32))
+
+
+def segment_files(directory):
+    """
+    @return the paths of the commitlog segments in the directory, oldest first
+    """
+    segments = [(int(m.group('id')), name) for m, name in
+                ((_SEGMENT_NAME.match(name), name) for name in os.listdir(directory)) if m]
+    return [os.path.join(directory, name) for _, name in sorted(segments)]
+
+
+class CommitLogSegment(object):
+    """
+    A memory mapped commitlog segment, to use as a context manager.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise CommitLogError("{} is empty".format(path))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.header = self._read_header()
+        except (struct.error, ValueError) as e:
+            self.close()
+            raise CommitLogError("Could not read the header of {}: {}".format(path, e))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+
+    def _read_header(self):
+        version, segment_id = struct.unpack_from('>iq', self._map, 0)
+        crc = _crc_of_ints(version, *_id_ints(segment_id))
+        position = 12
+        parameters = {}
+        if version >= VERSION_22:
+            length = struct.unpack_from('>H', self._map, position)[0]
+            position += 2
+            raw_parameters = self._map[position:position + length]
+            crc = zlib.crc32(raw_parameters, _crc_of_ints(length, crc=crc))
+            parameters = json.loads(raw_parameters.decode('utf-8')) if length else {}
+            position += length
+        if struct.unpack_from('>I', self._map, position)[0] != crc:
+            raise CommitLogError("Checksum mismatch in the header of {}".format(self.path))
+        return SegmentHeader(version=version, id=segment_id, parameters=parameters, size=position + 4)
+
+    @property
+    def compressed_or_encrypted(self):
+        return bool(self.header.parameters.get('compressionClass') or self.header.parameters.get('encCipher'))
+
+    def sync_sections(self):
+        """
+        Yields the SyncSection of every section of the segment whose sync marker checks out.
+        """
+        id_ints = _id_ints(self.header.id)
+        position = self.header.size
+        while position + SYNC_MARKER_SIZE <= len(self._map):
+            end, crc = struct.unpack_from('>iI', self._map, position)
+            if crc != _crc_of_ints(id_ints[0], id_ints[1], position):
+                if end != 0 or crc != 0:
+                    logger.debug("Invalid sync marker at {} of {}".format(position, self.path))
+                return
+            if end < position + SYNC_MARKER_SIZE or end > len(self._map):
+                logger.debug("Sync marker at {} of {} points out of the segment".format(position, self.path))
+                return
+            yield SyncSection(start=position + SYNC_MARKER_SIZE, end=end)
+            position = end
+
+    def _mutations_in(self, section):
+        position = section.start
+        while position + ENTRY_OVERHEAD_SIZE <= section.end:
+            size, size_crc = struct.unpack_from('>iI', self._map, position)
+            # a zero size ends the section, before its end if it was not filled
+            if size <= 0:
+                return
+            if size_crc != _crc_of_ints(size):
+                raise CommitLogError("Checksum mismatch of the size of the mutation at {} of {}".format(position, self.path))
+            start = position + 8
+            if start + size + 4 > section.end:
+                raise CommitLogError("The mutation at {} of {} overruns its section".format(position, self.path))
+            data = self._map[start:start + size]
+            if struct.unpack_from('>I', self._map, start + size)[0] != zlib.crc32(data, _crc_of_ints(size)):
+                raise CommitLogError("Checksum mismatch of the mutation at {} of {}".format(position, self.path))
+            yield self._mutation_header(position, data)
+            position = start + size + 4
+
+    def _mutation_header(self, position, data):
+        updates, offset = unsigned_vint(data, 0)
+        table_id = uuid.UUID(bytes=data[offset:offset + 16])
+        key_length, offset = unsigned_vint(data, offset + 16)
+        return MutationHeader(position=position, size=len(data), table_id=table_id,
+                              partition_key=data[offset:offset + key_length], updates=updates)
+
+    def mutations(self):
+        """
+        Yields the MutationHeader of every mutation of the segment, checking their checksums.
+        """
+        if self.header.version < VERSION_30:
+            raise CommitLogError("Reading the mutations of version {} segments is not supported".format(self.header.version))
+        if self.compressed_or_encrypted:
+            raise CommitLogError("Reading the mutations of compressed or encrypted segments is not supported")
+        for section in self.sync_sections():
+            for mutation in self._mutations_in(section):
+                yield mutation
+
+    def synced_size(self):
+        """
+        @return the position the last valid section of the segment ends at
+        """
+        end = self.header.size
+        for section in self.sync_sections():
+            end = section.end
+        return end
+
+
+def segment_table_ids(path):
+    """
+    @return the set of the ids of the tables with mutations in the segment
+    """
+    with CommitLogSegment(path) as segment:
+        return {mutation.table_id for mutation in segment.mutations()}
@@ -22,9 +22,12 @@ It's meant to be used in tests when comparing expected to actual data, for valid
 For more examples reference paging_test.py
 """
 import re
+from itertools import islice
 
 from cassandra.concurrent import execute_concurrent_with_args
 
+_ROW_MULTIPLIER = re.compile(r'\*(\d+)$')
+
 
 def strip(val):
     # remove spaces and pipes from beginning/end
@@ -45,50 +48,6 @@ def parse_headers_into_list(data):
     return headers
 
 
-def get_row_multiplier(row):
-    # find prefix like *1234 meaning create 1,234 rows
-    row_cells = [l.strip() for l in row.split('|')]
-    m = re.findall(r'\*(\d+)$', row_cells[0])
-
-    if m:
-        return int(m[0])
-
-    return None
-
-
-def row_has_multiplier(row):
-    if get_row_multiplier(row) is not None:
-        return True
-
-    return False
-
-
-def parse_row_into_dict(row, headers, format_funcs=None):
-    row_cells = [l.strip() for l in row.split('|')]
-
-    if row_has_multiplier(row):
-        row_multiplier = get_row_multiplier(row)
-        row = '|'.join(row_cells[1:])  # cram remainder of row back into foo|bar format
-        multirows = []
-
-        for i in range(row_multiplier):
-            multirows.append(
-                parse_row_into_dict(row, headers, format_funcs=format_funcs)
-            )
-        return multirows
-
-    row_map = dict(list(zip(headers, row_cells)))
-
-    if format_funcs:
-        for colname, value in list(row_map.items()):
-            func = format_funcs.get(colname)
-
-            if func is not None:
-                row_map[colname] = func(value)
-
-    return row_map
-
-
 def row_describes_data(row):
     """
     Returns True if this appears to be a row describing data, otherwise False.
@@ -106,30 +65,59 @@ def row_describes_data(row):
     return False
 
 
-def parse_data_into_dicts(data, format_funcs=None):
-    # throw out leading/trailing space and pipes
-    # so we can split on the data without getting
-    # extra empty fields
-    rows = list(map(strip, data.split('\n')))
-
-    # remove any remaining empty/decoration lines (i.e. '') from data
-    rows = list(filter(row_describes_data, rows))
+class DataTableParser(object):
+    """
+    Parses the data rows of a markdown-style table, as described in this module's docstring.
 
-    # remove headers
-    headers = parse_headers_into_list(rows.pop(0))
+    The header and the format_funcs are resolved once, then rows are produced lazily by
+    iter_dicts, so a large table (or one using big row multipliers) never needs to be
+    held in memory as a list of dicts.
+    """
 
-    values = []
+    def __init__(self, data, format_funcs=None):
+        # throw out leading/trailing space and pipes so we can split
+        # on the data without getting extra empty fields, and drop
+        # empty and decoration lines (i.e. '+----|----|-----+')
+        lines = (strip(line) for line in data.split('\n'))
+        self._rows = filter(row_describes_data, lines)
+
+        self.headers = parse_headers_into_list(next(self._rows))
+        format_funcs = format_funcs or {}
+        self._formatters = [format_funcs.get(header) for header in self.headers]
+
+    def _format(self, cells):
+        return {header: (value if func is None else func(value))
+                for header, func, value in zip(self.headers, self._formatters, cells)}
+
+    def iter_dicts(self):
+        """
+        Yields one dict per row of data. Rows with a multiplier are formatted once per
+        repetition, so format_funcs producing random values yield distinct rows.
+        """
+        for row in self._rows:
+            cells = [cell.strip() for cell in row.split('|')]
+            multiplier = _ROW_MULTIPLIER.search(cells[0])
+            if multiplier:
+                cells = cells[1:]
+                for _ in range(int(multiplier.group(1))):
+                    yield self._format(cells)
+            else:
+                yield self._format(cells)
+
+
+def iter_data_dicts(data, format_funcs=None):
+    """
+    Lazy version of parse_data_into_dicts.
+    """
+    return DataTableParser(data, format_funcs=format_funcs).iter_dicts()
 
-    for row in rows:
-        if row_has_multiplier(row):
-            values.extend(parse_row_into_dict(row, headers, format_funcs=format_funcs))
-        else:
-            values.append(parse_row_into_dict(row, headers, format_funcs=format_funcs))
 
-    return values
+def parse_data_into_dicts(data, format_funcs=None):
+    return list(iter_data_dicts(data, format_funcs=format_funcs))
 
 
-def create_rows(data, session, table_name, cl=None, format_funcs=None, prefix='', postfix=''):
+def create_rows(data, session, table_name, cl=None, format_funcs=None, prefix='', postfix='',
+                batch_size=1000, concurrency=100):
     """
     Creates db rows using given session, with table name provided,
     using data formatted like:
@@ -141,25 +129,42 @@ def create_rows(data, session, table_name, cl=None, format_funcs=None, prefix=''
     format_funcs should be a dictionary of {columnname: function} if data needs to be formatted
     before being included in CQL.
 
+    Rows are parsed and inserted batch_size at a time, with at most concurrency inserts in
+    flight. Raises ValueError if a row has fewer cells than there are headers, and
+    RuntimeError if any insert fails.
+
     Returns a list of maps describing the data created.
     """
-    values = []
-    dicts = parse_data_into_dicts(data, format_funcs=format_funcs)
+    parser = DataTableParser(data, format_funcs=format_funcs)
+    headers = parser.headers
+    rows = parser.iter_dicts()
 
-    # use the first dictionary to build a prepared statement for all
     prepared = session.prepare(
         "{prefix} INSERT INTO {table} ({cols}) values ({vals}) {postfix}".format(
-            prefix=prefix, table=table_name, cols=', '.join(list(dicts[0].keys())),
-            vals=', '.join('?' for k in list(dicts[0].keys())), postfix=postfix)
+            prefix=prefix, table=table_name, cols=', '.join(headers),
+            vals=', '.join('?' for _ in headers), postfix=postfix)
     )
     if cl is not None:
         prepared.consistency_level = cl
 
-    query_results = execute_concurrent_with_args(session, prepared, [list(d.values()) for d in dicts])
-
-    for i, (status, result_or_exc) in enumerate(query_results):
-        # should maybe check status here before appening to expected values
-        values.append(dicts[i])
+    values = []
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        short_rows = [d for d in batch if len(d) < len(headers)]
+        if short_rows:
+            raise ValueError("Row {} for {} has no value for {}".format(
+                short_rows[0], table_name, [h for h in headers if h not in short_rows[0]]))
+
+        query_results = execute_concurrent_with_args(session, prepared, [[d[h] for h in headers] for d in batch],
+                                                     concurrency=concurrency, raise_on_first_error=False)
+        failures = [(d, result_or_exc) for d, (success, result_or_exc) in zip(batch, query_results) if not success]
+        if failures:
+            raise RuntimeError("Failed to insert {} of {} rows into {}, first failure was {} for {}".format(
+                len(failures), len(batch), table_name, failures[0][1], failures[0][0]))
+
+        values.extend(batch)
 
     return values
 
@@ -2,16 +2,25 @@
 This one's called hacks because it provides shared utilities to hack around
 weirdnesses in Cassandra.
 """
+import ctypes
+import ctypes.util
 import os
+import select
+import sys
 import time
 import logging
 
 from cassandra.concurrent import execute_concurrent
 
+from tools.commitlog import CommitLogError, CommitLogSegment, segment_files
 from tools.funcutils import get_rate_limited_function
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_SEGMENT_SIZE = 32 * 1024 * 1024
+# the largest blob written at once, well under the max mutation size of half a segment
+MAX_BLOB_SIZE = 1024 * 1024
+
 
 def _files_in(directory):
     return {
@@ -19,6 +28,70 @@ def _files_in(directory):
     }
 
 
+class _DirectoryWatch(object):
+    """
+    Waits for files to appear in a directory: with inotify on linux, by sleeping
+    a little elsewhere or if inotify is not available.
+    """
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+
+    def __init__(self, directory):
+        self.fd = None
+        if not sys.platform.startswith('linux'):
+            return
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK)
+        except (OSError, AttributeError):
+            return
+        if fd < 0:
+            return
+        if libc.inotify_add_watch(fd, directory.encode('utf-8'), self.IN_CREATE | self.IN_MOVED_TO) < 0:
+            os.close(fd)
+            return
+        self.fd = fd
+
+    def wait(self, timeout):
+        if self.fd is None:
+            time.sleep(min(timeout, 0.1))
+            return
+        if select.select([self.fd], [], [], timeout)[0]:
+            try:
+                os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def _active_segment_usage(commitlog_dir):
+    """
+    Estimates how full the segment being written to is from its last sync marker, as
+    segments are preallocated.
+
+    @return (segment size, bytes written to the active segment)
+    """
+    segment_size, written = DEFAULT_SEGMENT_SIZE, 0
+    for path in segment_files(commitlog_dir):
+        try:
+            with CommitLogSegment(path) as segment:
+                if segment.compressed_or_encrypted:
+                    continue
+                segment_size = os.path.getsize(path)
+                synced_size = segment.synced_size()
+        except (CommitLogError, OSError, ValueError):
+            # just created, or removed since listed
+            continue
+        # the node keeps an empty segment ready ahead of the one it writes to
+        if synced_size > segment.header.size:
+            written = synced_size
+    return segment_size, written
+
+
 def advance_to_next_cl_segment(session, commitlog_dir,
                                keyspace_name='ks', table_name='junk_table',
                                timeout=180):
@@ -29,20 +102,15 @@ def advance_to_next_cl_segment(session, commitlog_dir,
     tests. If we replay the first commitlog that's created, we wind up
     replaying some mutations that initialize system tables, so this function
     advances the node to the next CL by filling up the first one.
+
+    The space left in the active segment is estimated from its last sync marker
+    and filled with blobs, after which we wait for the new segment to show up.
     """
     session.execute(
-        'CREATE TABLE {ks}.{tab} ('
-        'a uuid PRIMARY KEY, b uuid, c uuid, d uuid, '
-        'e uuid, f uuid, g uuid, h uuid'
-        ')'.format(ks=keyspace_name, tab=table_name)
+        'CREATE TABLE {ks}.{tab} (a uuid PRIMARY KEY, b blob)'.format(ks=keyspace_name, tab=table_name)
     )
     prepared_insert = session.prepare(
-        'INSERT INTO {ks}.{tab} '
-        '(a, b, c, d, e, f, g, h) '
-        'VALUES ('
-        'uuid(), uuid(), uuid(), uuid(), '
-        'uuid(), uuid(), uuid(), uuid()'
-        ')'.format(ks=keyspace_name, tab=table_name)
+        'INSERT INTO {ks}.{tab} (a, b) VALUES (uuid(), ?)'.format(ks=keyspace_name, tab=table_name)
     )
 
     # record segments that we want to advance past
@@ -53,17 +121,27 @@ def advance_to_next_cl_segment(session, commitlog_dir,
     rate_limited_debug_logger = get_rate_limited_function(logger.debug, 5)
     logger.debug('attempting to write until we start writing to new CL segments: {}'.format(initial_cl_files))
 
-    while _files_in(commitlog_dir) <= initial_cl_files:
-        elapsed = time.time() - start
-        rate_limited_debug_logger('  commitlog-advancing load step has lasted {s:.2f}s'.format(s=elapsed))
-        assert (
-            time.time() <= stop_time), ("It's been over {s}s and we haven't written a new " +
-                                        "commitlog segment. Something is wrong.").format(s=timeout)
-        execute_concurrent(
-            session,
-            ((prepared_insert, ()) for _ in range(1000)),
-            concurrency=500,
-            raise_on_first_error=True,
-        )
+    watch = _DirectoryWatch(commitlog_dir)
+    try:
+        while _files_in(commitlog_dir) <= initial_cl_files:
+            elapsed = time.time() - start
+            rate_limited_debug_logger('  commitlog-advancing load step has lasted {s:.2f}s'.format(s=elapsed))
+            assert (
+                time.time() <= stop_time), ("It's been over {s}s and we haven't written a new " +
+                                            "commitlog segment. Something is wrong.").format(s=timeout)
+            segment_size, written = _active_segment_usage(commitlog_dir)
+            blob_size = min(MAX_BLOB_SIZE, segment_size // 8)
+            # the remainder of the segment, and one more blob as the last sync marker lags behind
+            blobs = (segment_size - written) // blob_size + 1
+            blob = os.urandom(blob_size)
+            execute_concurrent(
+                session,
+                ((prepared_insert, (blob,)) for _ in range(blobs)),
+                concurrency=8,
+                raise_on_first_error=True,
+            )
+            watch.wait(timeout=1)
+    finally:
+        watch.close()
 
     logger.debug('present commitlog segments: {}'.format(_files_in(commitlog_dir)))
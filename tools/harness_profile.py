@@ -0,0 +1,121 @@
+"""
+Profiles of the Python side of the dtests, for `--profile-harness`.
+
+The setup, call and teardown of every test are profiled with cProfile. Each test
+gets its own profile in the profile directory (<nodeid>.prof, which can be read
+with pstats or snakeviz), and a report of the top functions of the session is
+written there when the session ends (harness_profile.txt).
+
+Time spent waiting on the nodes shows up as the time of the blocking builtins
+the harness calls: sleeping, socket reads, lock acquisitions the driver's
+futures wait on, process waits. The report sums these apart from the rest, so
+that Python-side overhead (log filtering, result comparison, parsing) can be
+told from waiting on the JVMs.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+
+logger = logging.getLogger(__name__)
+
+REPORT_NAME = 'harness_profile.txt'
+
+# the builtins the harness blocks in while it waits on something else
+_WAIT_CALLS = re.compile(r"time\.sleep|'acquire' of|select\.|'poll' of|'recv|'accept' of|'connect' of|"
+                         r"posix\.waitpid|posix\.read|'wait' of|'readline' of")
+
+
+def profile_file_name(nodeid):
+    return re.sub(r'[^\w.-]+', '_', nodeid).strip('_') + '.prof'
+
+
+def is_wait_call(function):
+    """
+    @param function a pstats function key, (file name, line number, function name)
+    """
+    file_name, _, function_name = function
+    return file_name == '~' and bool(_WAIT_CALLS.search(function_name))
+
+
+class HarnessProfiler(object):
+    """
+    Profiles the tests of a session one at a time.
+    """
+
+    def __init__(self, directory, top=30):
+        self.directory = directory
+        self.top = top
+        self.profile_paths = []
+        self._profile = None
+        self._nodeid = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start_test(self, nodeid):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # another profiler (e.g. a debugger's or coverage's) is active
+            logger.warning("Not profiling {}: {}".format(nodeid, e))
+            return
+        self._profile = profile
+        self._nodeid = nodeid
+
+    def finish_test(self):
+        """
+        @return the path of the profile of the test, if it was profiled
+        """
+        profile, self._profile = self._profile, None
+        if profile is None:
+            return None
+        profile.disable()
+        path = os.path.join(self.directory, profile_file_name(self._nodeid))
+        profile.dump_stats(path)
+        self.profile_paths.append(path)
+        return path
+
+    def session_stats(self):
+        """
+        @return the pstats.Stats of every test profiled, or None if none was
+        """
+        if not self.profile_paths:
+            return None
+        stats = pstats.Stats(self.profile_paths[0], stream=io.StringIO())
+        for path in self.profile_paths[1:]:
+            stats.add(path)
+        return stats
+
+    def report(self):
+        """
+        @return the top functions of the session by own and by cumulative time, after the
+                split of the total time between waiting and the rest
+        """
+        stats = self.session_stats()
+        if stats is None:
+            return "No test was profiled\n"
+        waiting = sum(tottime for function, (_, _, tottime, _, _) in stats.stats.items() if is_wait_call(function))
+        out = io.StringIO()
+        out.write("{} tests profiled, {:.3f}s in total: {:.3f}s waiting (sleep, socket, lock, process waits), "
+                  "{:.3f}s elsewhere\n\n".format(len(self.profile_paths), stats.total_tt, waiting,
+                                                 stats.total_tt - waiting))
+        stats.stream = out
+        for sort_key, title in (('tottime', 'own'), ('cumulative', 'cumulative')):
+            out.write("Top {} functions by {} time\n".format(self.top, title))
+            stats.sort_stats(sort_key).print_stats(self.top)
+        return out.getvalue()
+
+    def write_report(self, name=REPORT_NAME):
+        """
+        @return the path of the report written, or None if no test was profiled (e.g. by
+                the controller of an xdist session)
+        """
+        if not self.profile_paths:
+            return None
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(self.report())
+        logger.info("Wrote the harness profile of {} tests to {}".format(len(self.profile_paths), path))
+        return path
@@ -13,6 +13,8 @@ except ImportError:
 
 from ccmlib.node import Node
 
+from tools import sslkeygen
+
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +52,10 @@ def retry_till_success(fun, *args, **kwargs):
                 time.sleep(0.25)
 
 
+# the files generate_ssl_stores places in the directory it is given
+SSL_STORE_FILES = ('keystore.jks', 'truststore.jks', 'ccm_node.cer')
+
+
 def _ssl_store_san_extension():
     """
     Builds the keytool subjectAltName extension used by generated test certificates.
@@ -91,6 +97,9 @@ def generate_ssl_stores(base_dir, passphrase='cassandra'):
     Util for generating ssl stores using java keytool -- nondestructive method if stores already exist this method is
     a no-op.
 
+    The stores are generated once per session for a given passphrase and set of SAN entries, and hard linked into
+    base_dir.
+
     @param base_dir (str) directory where keystore.jks, truststore.jks and ccm_node.cer will be placed
     @param passphrase (Optional[str]) currently ccm expects a passphrase of 'cassandra' so it's the default but it can be
             overridden for failure testing
@@ -102,11 +111,20 @@ def generate_ssl_stores(base_dir, passphrase='cassandra'):
         logger.debug("keystores already exists - skipping generation of ssl keystores")
         return
 
+    san_extension = _ssl_store_san_extension()
+    stores_dir = sslkeygen.cached_material(('ssl_stores', passphrase, san_extension),
+                                           lambda directory: _generate_ssl_stores(directory, passphrase, san_extension))
+    logger.debug("linking ssl stores generated in [{0}] into [{1}]".format(stores_dir, base_dir))
+    for filename in SSL_STORE_FILES:
+        sslkeygen.link_or_copy(os.path.join(stores_dir, filename), os.path.join(base_dir, filename))
+
+
+def _generate_ssl_stores(base_dir, passphrase, san_extension):
     logger.debug("generating keystore.jks in [{0}]".format(base_dir))
     subprocess.check_call(['keytool', '-genkeypair', '-alias', 'ccm_node', '-keyalg', 'RSA', '-validity', '365',
                            '-keystore', os.path.join(base_dir, 'keystore.jks'), '-storepass', passphrase,
                            '-dname', 'cn=Cassandra Node,ou=CCMnode,o=DataStax,c=US', '-keypass', passphrase,
-                           '-ext', _ssl_store_san_extension()])
+                           '-ext', san_extension])
     logger.debug("exporting cert from keystore.jks in [{0}]".format(base_dir))
     subprocess.check_call(['keytool', '-export', '-rfc', '-alias', 'ccm_node',
                            '-keystore', os.path.join(base_dir, 'keystore.jks'),
@@ -1,16 +1,39 @@
+import threading
 import time
 
 from tools.datahelp import flatten_into_set
 from tools.misc import list_to_hashed_dict
 
+
+def _approx_size(value):
+    """
+    Rough size in bytes of a value returned by the driver, used to report paging throughput.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(_approx_size(v) for v in value)
+    return 8
+
+
 class Page(object):
     data = None
+    latency = None  # seconds between requesting the page and receiving it, if known
 
-    def __init__(self):
+    def __init__(self, keep_data=True):
         self.data = []
+        self.row_count = 0
+        self.approx_bytes = 0
+        self.keep_data = keep_data
 
     def add_row(self, row):
-        self.data.append(row)
+        self.row_count += 1
+        if self.keep_data:
+            self.data.append(row)
 
 
 class PageFetcher(object):
@@ -38,6 +61,9 @@ class PageFetcher(object):
         self.retrieved_pages = 0
         self.retrieved_empty_pages = 0
 
+        # signalled by the driver callbacks whenever a page (or an error) arrives
+        self._condition = threading.Condition()
+
         self.future = future
         self.future.add_callbacks(
             callback=self.handle_page,
@@ -50,21 +76,24 @@ class PageFetcher(object):
         self.wait(seconds=30)
 
     def handle_page(self, rows):
-        # occasionally get a final blank page that is useless
-        if rows == []:
-            self.retrieved_empty_pages += 1
-            return
+        with self._condition:
+            # occasionally get a final blank page that is useless
+            if rows == []:
+                self.retrieved_empty_pages += 1
+            else:
+                page = Page()
+                self.pages.append(page)
 
-        page = Page()
-        self.pages.append(page)
+                for row in rows:
+                    page.add_row(row)
 
-        for row in rows:
-            page.add_row(row)
-
-        self.retrieved_pages += 1
+                self.retrieved_pages += 1
+            self._condition.notify_all()
 
     def handle_error(self, exc):
-        self.error = exc
+        with self._condition:
+            self.error = exc
+            self._condition.notify_all()
         raise exc
 
     def request_one(self, timeout=None):
@@ -101,20 +130,22 @@ class PageFetcher(object):
 
         Requests are made by calling request_one and/or request_all.
 
-        Raises RuntimeError if seconds is exceeded.
+        Raises RuntimeError if seconds is exceeded, or as soon as the query fails.
         """
         seconds = 5 if seconds is None else seconds
-        expiry = time.time() + seconds
 
-        while time.time() < expiry:
-            if self.requested_pages == (self.retrieved_pages + self.retrieved_empty_pages):
+        with self._condition:
+            delivered = self._condition.wait_for(
+                lambda: self.error is not None or
+                self.requested_pages == (self.retrieved_pages + self.retrieved_empty_pages),
+                timeout=seconds)
+            if delivered and self.error is None:
                 return self
-            # small wait so we don't need excess cpu to keep checking
-            time.sleep(0.1)
 
         raise RuntimeError(
             "Requested pages were not delivered before timeout. " +
-            "Requested: {}; retrieved: {}; empty retrieved: {}".format(self.requested_pages, self.retrieved_pages, self.retrieved_empty_pages))
+            "Requested: {}; retrieved: {}; empty retrieved: {}".format(self.requested_pages, self.retrieved_pages, self.retrieved_empty_pages) +
+            ("" if self.error is None else "; query failed with: {!r}".format(self.error))) from self.error
 
     def pagecount(self):
         """
@@ -128,10 +159,10 @@ class PageFetcher(object):
         """
         Returns the number of results found at page_num
         """
-        return len(self.pages[page_num - 1].data)
+        return self.pages[page_num - 1].row_count
 
     def num_results_all(self):
-        return [len(page.data) for page in self.pages]
+        return [page.row_count for page in self.pages]
 
     def page_data(self, page_num):
         """
@@ -161,6 +192,144 @@ class PageFetcher(object):
         return self.future.has_more_pages
 
 
+class PrefetchingPageFetcher(PageFetcher):
+    """
+    Fetches every page of a query as fast as the server returns them, and records
+    the latency and approximate size of each page.
+
+    The next page is requested from the driver callback as soon as the previous one
+    has been recorded, without waiting for the test to call request_one. The native
+    protocol's paging state makes the pages of a query strictly sequential, so this is
+    one page in flight at a time with no round trip through the test thread in between.
+
+    If keep_data is False only the row counts and timings of each page are kept, which
+    allows benchmarking large paged queries without holding their results in memory.
+    """
+
+    def __init__(self, future, keep_data=True, wait_for_first_page=True):
+        self.pages = []
+        self.keep_data = keep_data
+        self.requested_pages = 1
+        self.retrieved_pages = 0
+        self.retrieved_empty_pages = 0
+        self.done = False
+
+        self._condition = threading.Condition()
+        self.started_at = getattr(future, '_start_time', None) or time.time()
+        self.finished_at = None
+        self._page_requested_at = self.started_at
+
+        self.future = future
+        self.future.add_callbacks(
+            callback=self.handle_page,
+            errback=self.handle_error
+        )
+
+        if wait_for_first_page:
+            self.wait_for_pages(1, seconds=30)
+
+    def handle_page(self, rows):
+        received_at = time.time()
+
+        page = Page(keep_data=self.keep_data)
+        page.latency = received_at - self._page_requested_at
+        for row in rows:
+            page.add_row(row)
+            page.approx_bytes += _approx_size(row)
+
+        has_more_pages = self.future.has_more_pages
+        with self._condition:
+            # occasionally get a final blank page that is useless
+            if page.row_count == 0:
+                self.retrieved_empty_pages += 1
+            else:
+                self.pages.append(page)
+                self.retrieved_pages += 1
+
+            if has_more_pages:
+                self.requested_pages += 1
+            else:
+                self.done = True
+                self.finished_at = received_at
+            self._condition.notify_all()
+
+        if has_more_pages:
+            self._page_requested_at = time.time()
+            self.future.start_fetching_next_page()
+
+    def handle_error(self, exc):
+        with self._condition:
+            self.error = exc
+            self.done = True
+            self._condition.notify_all()
+
+    def _received_pages(self):
+        return self.retrieved_pages + self.retrieved_empty_pages
+
+    def wait_for_pages(self, count, seconds=None):
+        """
+        Blocks until at least count pages (empty ones included) have been received, or
+        all pages have been received if there are fewer.
+
+        Raises RuntimeError if no page arrives for seconds (5 by default), and re-raises
+        any error the query failed with.
+        """
+        seconds = 5 if seconds is None else seconds
+        with self._condition:
+            while not self.done and self._received_pages() < count:
+                received = self._received_pages()
+                self._condition.wait_for(lambda: self.done or self._received_pages() > received, timeout=seconds)
+                if not self.done and self._received_pages() == received:
+                    raise RuntimeError(
+                        "No page was delivered for {}s. Requested: {}; retrieved: {}; empty retrieved: {}".format(
+                            seconds, self.requested_pages, self.retrieved_pages, self.retrieved_empty_pages))
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def wait(self, seconds=None):
+        """
+        Blocks until every page has been received.
+
+        @param seconds Time, in seconds, to wait for each page.
+        """
+        return self.wait_for_pages(float('inf'), seconds=seconds)
+
+    def request_one(self, timeout=None):
+        return self.wait_for_pages(self._received_pages() + 1, seconds=timeout)
+
+    def request_all(self, timeout=None):
+        return self.wait(seconds=timeout)
+
+    @property
+    def has_more_pages(self):
+        return not self.done
+
+    def stats(self):
+        """
+        Returns a dict summarizing the pages received so far: page and row counts,
+        approximate bytes, per-page latencies and overall throughput.
+        """
+        with self._condition:
+            pages = list(self.pages)
+            finished_at = self.finished_at or time.time()
+        latencies = [page.latency for page in pages]
+        rows = sum(page.row_count for page in pages)
+        approx_bytes = sum(page.approx_bytes for page in pages)
+        elapsed = finished_at - self.started_at
+        return {
+            'pages': len(pages),
+            'rows': rows,
+            'approx_bytes': approx_bytes,
+            'elapsed_s': elapsed,
+            'rows_per_s': rows / elapsed if elapsed > 0 else None,
+            'bytes_per_s': approx_bytes / elapsed if elapsed > 0 else None,
+            'page_latency_min_s': min(latencies) if latencies else None,
+            'page_latency_mean_s': sum(latencies) / len(latencies) if latencies else None,
+            'page_latency_max_s': max(latencies) if latencies else None,
+        }
+
+
 class PageAssertionMixin(object):
     """Can be added to subclasses of unittest.Tester"""
 
@@ -0,0 +1,238 @@
+"""
+Wall time spent by every dtest in each of its phases.
+
+Each test gets a PhaseTimer (see start_test) which conftest.py opens the setup,
+test_body and teardown phases of, and which the harness opens the phases below
+within them, by wrapping the ccm clusters and nodes and the driver sessions it
+creates (see instrument_cluster and instrument_session):
+
+    cluster_create   creating and configuring the ccm cluster
+    populate         cluster.populate
+    node_start       cluster.start and node.start, up to the nodes listening
+    wait_for_binary  node.wait_for_binary_interface
+    connect          connecting driver sessions
+    schema           CREATE, ALTER and DROP statements run through session.execute
+    data_load        INSERT, UPDATE and batch statements run through session.execute
+    node_stop        cluster.stop and node.stop
+    log_scan         checking the node logs for errors
+    log_copy         copying the node logs
+    cluster_remove   cluster.remove
+
+Time is attributed to the innermost phase only, so that the time spent starting
+nodes within a test is not counted in its test_body too: test_body, setup and
+teardown are what is left once the other phases are taken out, and the phases
+of a test add up to its duration. Only the phases opened by the thread which
+started the test are timed, the time other threads take being spent waiting on
+them in one of its phases.
+
+The phases of every test are reported as junit properties (phase_<name>) and,
+with --phase-timings-file, written to a json summary at the end of the session,
+see PhaseTimingReport.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+from collections import OrderedDict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('setup', 'cluster_create', 'populate', 'node_start', 'wait_for_binary', 'connect', 'schema',
+          'data_load', 'test_body', 'node_stop', 'log_scan', 'log_copy', 'cluster_remove', 'teardown')
+
+_SCHEMA_STATEMENTS = ('CREATE', 'ALTER', 'DROP')
+_DATA_LOAD_STATEMENTS = ('INSERT', 'UPDATE', 'BEGIN')
+
+
+class PhaseTimer(object):
+    """
+    The wall time of the phases of a test, each phase excluding the phases nested in it.
+    """
+
+    def __init__(self):
+        self.durations = OrderedDict()
+        self._thread = threading.get_ident()
+        # [phase name, time spent in nested phases] of the open phases
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name):
+        if threading.get_ident() != self._thread:
+            yield
+            return
+        start = time.monotonic()
+        self._stack.append([name, 0.0])
+        try:
+            yield
+        finally:
+            _, nested = self._stack.pop()
+            elapsed = time.monotonic() - start
+            self.durations[name] = self.durations.get(name, 0.0) + elapsed - nested
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def total(self):
+        return sum(self.durations.values())
+
+
+_current = None
+
+
+def start_test():
+    """
+    @return the PhaseTimer of the test starting, which the phases are timed in until finish_test
+    """
+    global _current
+    _current = PhaseTimer()
+    return _current
+
+
+def finish_test():
+    """
+    @return the durations of the phases of the test, by phase name
+    """
+    global _current
+    timer, _current = _current, None
+    return timer.durations if timer is not None else OrderedDict()
+
+
+@contextmanager
+def phase(name):
+    """
+    Times the enclosed block as the given phase of the current test, if any.
+    """
+    timer = _current
+    if timer is None:
+        yield
+        return
+    with timer.phase(name):
+        yield
+
+
+def timed(name, function):
+    """
+    @return the function, timed as the given phase whenever it is called
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with phase(name):
+            return function(*args, **kwargs)
+    wrapper.phase_timed = True
+    return wrapper
+
+
+def _time_methods(obj, phases):
+    for method_name, phase_name in phases:
+        method = getattr(obj, method_name, None)
+        if method is not None and not getattr(method, 'phase_timed', False):
+            setattr(obj, method_name, timed(phase_name, method))
+
+
+def instrument_node(node):
+    _time_methods(node, (('start', 'node_start'),
+                         ('wait_for_binary_interface', 'wait_for_binary'),
+                         ('stop', 'node_stop')))
+    return node
+
+
+def instrument_cluster(cluster):
+    """
+    Times the phases of the cluster, and of every node added to it.
+    """
+    _time_methods(cluster, (('populate', 'populate'),
+                            ('start', 'node_start'),
+                            ('stop', 'node_stop'),
+                            ('remove', 'cluster_remove')))
+    add = getattr(cluster, 'add', None)
+    if add is not None and not getattr(add, 'phase_timed', False):
+        @functools.wraps(add)
+        def add_node(node, *args, **kwargs):
+            instrument_node(node)
+            return add(node, *args, **kwargs)
+        add_node.phase_timed = True
+        cluster.add = add_node
+    for node in cluster.nodelist():
+        instrument_node(node)
+    return cluster
+
+
+def statement_phase(query):
+    """
+    @return the phase a statement run by session.execute belongs to, or None if it is part
+            of the body of the test
+    """
+    if type(query).__name__ == 'BatchStatement':
+        return 'data_load'
+    prepared = getattr(query, 'prepared_statement', None)
+    text = getattr(prepared if prepared is not None else query, 'query_string', query)
+    if not isinstance(text, str):
+        return None
+    words = text.lstrip().split(None, 1)
+    verb = words[0].upper() if words else ''
+    if verb in _SCHEMA_STATEMENTS:
+        return 'schema'
+    if verb in _DATA_LOAD_STATEMENTS:
+        return 'data_load'
+    return None
+
+
+def instrument_session(session):
+    """
+    Times the schema changes and writes run through session.execute.
+    """
+    execute = session.execute
+    if getattr(execute, 'phase_timed', False):
+        return session
+
+    @functools.wraps(execute)
+    def timed_execute(query, *args, **kwargs):
+        phase_name = statement_phase(query)
+        if phase_name is None:
+            return execute(query, *args, **kwargs)
+        with phase(phase_name):
+            return execute(query, *args, **kwargs)
+    timed_execute.phase_timed = True
+    session.execute = timed_execute
+    return session
+
+
+def junit_properties(durations):
+    """
+    @return the (name, value) junit properties of the durations of the phases of a test
+    """
+    return [('phase_' + name, '{:.3f}'.format(duration)) for name, duration in durations.items()]
+
+
+class PhaseTimingReport(object):
+    """
+    The phases of the tests of a session, written to a json file of the form:
+
+        {"tests": {nodeid: {phase: seconds}},
+         "totals": {phase: seconds},
+         "test_count": n}
+    """
+
+    def __init__(self):
+        self.tests = OrderedDict()
+
+    def record(self, nodeid, durations):
+        self.tests[nodeid] = OrderedDict((name, round(duration, 3)) for name, duration in durations.items())
+
+    def totals(self):
+        totals = OrderedDict((name, 0.0) for name in PHASES)
+        for durations in self.tests.values():
+            for name, duration in durations.items():
+                totals[name] = totals.get(name, 0.0) + duration
+        return OrderedDict((name, round(total, 3)) for name, total in totals.items() if total)
+
+    def write(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'tests': self.tests, 'totals': self.totals(), 'test_count': len(self.tests)}, f, indent=2)
+        logger.info("Wrote the phase timings of {} tests to {}".format(len(self.tests), path))
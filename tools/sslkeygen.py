@@ -1,31 +1,204 @@
+"""
+Generation of the keystores, truststores and certificates of the ssl tests.
+
+Generating keys takes a few keytool JVMs, so the material is generated once per
+session and key (see cached_material) and copied into the directories of the
+tests. The keys and certificates of generate_credentials are made in Python
+with the cryptography package when it is installed, and with keytool otherwise.
+"""
+import atexit
+import datetime
+import hashlib
+import ipaddress
+import logging
 import os
 import os.path
+import shutil
 import tempfile
 import subprocess
 
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.hazmat.primitives.serialization import pkcs12
+    from cryptography.x509.oid import NameOID
+except ImportError:
+    x509 = None
+
+logger = logging.getLogger(__name__)
+
+PASSWORD = 'cassandra'
+VALIDITY_DAYS = 365
+
+_cache_dir = None
+_cached = {}
+
+
+def _session_cache_dir():
+    global _cache_dir
+    if _cache_dir is None:
+        _cache_dir = tempfile.mkdtemp(prefix='dtest-ssl-')
+        atexit.register(shutil.rmtree, _cache_dir, True)
+    return _cache_dir
+
+
+def cached_material(key, generate):
+    """
+    @param generate a function writing the material into the directory it is given
+    @return the directory holding the material generated for the key, which is only
+            generated the first time the key is asked for in the session. Its files
+            must not be modified: copy or link them instead.
+    """
+    if key not in _cached:
+        directory = tempfile.mkdtemp(dir=_session_cache_dir())
+        generate(directory)
+        _cached[key] = directory
+    return _cached[key]
+
+
+def link_or_copy(source, dest):
+    """
+    Hard links source to dest, or copies it where it cannot be linked.
+    """
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+    return dest
+
+
+def _file_digest(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _copy_into(directory, path):
+    # copied rather than linked, as tests add certificates to these stores
+    return shutil.copy(path, directory)
+
 
 def generate_credentials(ip, cakeystore=None, cacert=None):
 
     tmpdir = tempfile.mkdtemp()
 
     if not cakeystore:
-        cakeystore = generate_cakeypair(tmpdir, 'ca')
+        # every ip gets a CA of its own, so that credentials generated without a CA
+        # keep on mismatching
+        ca_dir = cached_material(('ca', ip), _generate_ca)
+        cakeystore = _copy_into(tmpdir, os.path.join(ca_dir, 'ca.keystore'))
+        cacert = _copy_into(tmpdir, os.path.join(ca_dir, 'ca.pem'))
     if not cacert:
         cacert = generate_cert(tmpdir, "ca", cakeystore)
 
-    # create keystore with new private key
     name = "ip" + ip
-    jkeystore = generate_ipkeypair(tmpdir, name, ip)
+    node_dir = cached_material(('node', ip, _file_digest(cakeystore, cacert)),
+                               lambda directory: _generate_node(directory, name, ip, cakeystore, cacert))
+    jkeystore = _copy_into(tmpdir, os.path.join(node_dir, name + '.keystore'))
+    cert = _copy_into(tmpdir, os.path.join(node_dir, name + '.pem'))
+
+    return SecurityCredentials(jkeystore, cert, cakeystore, cacert)
+
+
+def _generate_ca(dir):
+    if _can_generate_in_python():
+        key = _generate_key()
+        subject = _name('ca')
+        cert = _build_cert(subject, key.public_key(), subject, key,
+                           [(x509.BasicConstraints(ca=True, path_length=None), True)])
+        _write_pkcs12(os.path.join(dir, 'ca.keystore'), 'ca', key, cert)
+        _write_pem(os.path.join(dir, 'ca.pem'), cert)
+        return
+    cakeystore = generate_cakeypair(dir, 'ca')
+    generate_cert(dir, "ca", cakeystore)
+
+
+def _generate_node(dir, name, ip, cakeystore, cacert):
+    ca_key, ca_cert = _load_ca(cakeystore)
+    if ca_key is not None:
+        key = _generate_key()
+        cert = _build_cert(_name(ip), key.public_key(), ca_cert.subject, ca_key,
+                           [(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address(ip))]), False)])
+        _write_pkcs12(os.path.join(dir, name + '.keystore'), name, key, cert, [ca_cert])
+        _write_pem(os.path.join(dir, name + '.pem'), cert)
+        return
+
+    # create keystore with new private key
+    jkeystore = generate_ipkeypair(dir, name, ip)
 
     # create signed cert
-    csr = generate_sign_request(tmpdir, name, jkeystore, ['-ext', 'san=ip:' + ip])
-    cert = sign_request(tmpdir, "ca", cakeystore, csr, ['-ext', 'san=ip:' + ip])
+    csr = generate_sign_request(dir, name, jkeystore, ['-ext', 'san=ip:' + ip])
+    sign_request(dir, "ca", cakeystore, csr, ['-ext', 'san=ip:' + ip])
 
     # import cert chain into keystore
-    import_cert(tmpdir, "ca", cacert, jkeystore)
-    import_cert(tmpdir, name, cert, jkeystore)
+    import_cert(dir, "ca", cacert, jkeystore)
+    import_cert(dir, name, os.path.join(dir, name + '.pem'), jkeystore)
 
-    return SecurityCredentials(jkeystore, cert, cakeystore, cacert)
+
+def _can_generate_in_python():
+    # the legacy encryption java reads from pkcs12 stores came with cryptography 38
+    return x509 is not None and hasattr(serialization.PrivateFormat, 'PKCS12')
+
+
+def _load_ca(cakeystore):
+    """
+    @return the private key and certificate of a CA keystore, or (None, None) if they
+            cannot be read in Python
+    """
+    if not _can_generate_in_python():
+        return None, None
+    with open(cakeystore, 'rb') as f:
+        data = f.read()
+    try:
+        key, cert, _ = pkcs12.load_key_and_certificates(data, PASSWORD.encode('utf-8'))
+    except ValueError:
+        logger.debug("Could not load {} in python, generating with keytool".format(cakeystore), exc_info=True)
+        return None, None
+    return key, cert
+
+
+def _generate_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _name(cn):
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, cn),
+                      x509.NameAttribute(NameOID.ORGANIZATIONAL_UNIT_NAME, 'cassandra'),
+                      x509.NameAttribute(NameOID.ORGANIZATION_NAME, 'apache.org'),
+                      x509.NameAttribute(NameOID.COUNTRY_NAME, 'US')])
+
+
+def _build_cert(subject, public_key, issuer, issuer_key, extensions):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    builder = (x509.CertificateBuilder()
+               .subject_name(subject)
+               .issuer_name(issuer)
+               .public_key(public_key)
+               .serial_number(x509.random_serial_number())
+               .not_valid_before(now - datetime.timedelta(days=1))
+               .not_valid_after(now + datetime.timedelta(days=VALIDITY_DAYS))
+               .add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False))
+    for extension, critical in extensions:
+        builder = builder.add_extension(extension, critical=critical)
+    return builder.sign(issuer_key, hashes.SHA256())
+
+
+def _write_pkcs12(path, alias, key, cert, cas=None):
+    encryption = (serialization.PrivateFormat.PKCS12.encryption_builder()
+                  .kdf_rounds(50000)
+                  .key_cert_algorithm(pkcs12.PBES.PBESv1SHA1And3KeyTripleDESCBC)
+                  .hmac_hash(hashes.SHA1())
+                  .build(PASSWORD.encode('utf-8')))
+    with open(path, 'wb') as f:
+        f.write(pkcs12.serialize_key_and_certificates(alias.encode('utf-8'), key, cert, cas, encryption))
+
+
+def _write_pem(path, cert):
+    with open(path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
 
 
 def generate_cakeypair(dir, name):
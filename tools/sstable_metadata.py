@@ -0,0 +1,353 @@
+"""
+A read-only parser of the TOC.txt and Statistics.db components of sstables.
+
+sstablemetadata starts a JVM for every call, which takes seconds, while most
+tests only want a handful of values out of its output (the level, repairedAt,
+pendingRepair...). These all live in the stats component of Statistics.db,
+which this module reads directly, for the big format versions from ka (2.1)
+to oa (5.0) and for the bti format.
+
+Statistics.db starts with a table of contents of (component type, offset)
+ints; the stats component is a fixed sequence of fields, some of them only
+present from some format version on, hence the Version class below. From na
+on every section is followed by a crc32, which is checked.
+
+For example, the levels of the sstables of a table:
+
+    [m.sstable_level for m in sstables_metadata(node, 'keyspace1', 'standard1')]
+"""
+import logging
+import os
+import re
+import struct
+import time
+import uuid
+import zlib
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+STATS_TYPE = 2
+
+# Data.db of the current naming scheme (<version>-<generation>-<format>-Data.db),
+# and of the 2.x one (<keyspace>-<table>-<version>-<generation>-Data.db)
+_SSTABLE_NAME = re.compile(r'^(?P<version>[a-z]{2})-(?P<generation>[^-]+)-(?P<format>big|bti)-(?P<component>.+)$')
+_LEGACY_SSTABLE_NAME = re.compile(r'^.+-.+-(?P<version>[a-z]{2})-(?P<generation>\d+)-(?P<component>.+)$')
+
+# clustering types whose values are serialized without a length, and their length
+_FIXED_LENGTH_TYPES = {
+    'BooleanType': 1, 'ByteType': 1, 'ShortType': 2, 'Int32Type': 4, 'FloatType': 4,
+    'LongType': 8, 'DoubleType': 8, 'TimestampType': 8, 'DateType': 8, 'TimeType': 8,
+    'SimpleDateType': 4, 'UUIDType': 16, 'TimeUUIDType': 16, 'LexicalUUIDType': 16,
+}
+
+SSTableMetadata = namedtuple('SSTableMetadata', (
+    'name',                  # the sstable path without its component, as printed by sstablemetadata
+    'version',
+    'min_timestamp',
+    'max_timestamp',
+    'min_local_deletion_time',
+    'max_local_deletion_time',
+    'min_ttl',
+    'max_ttl',
+    'compression_ratio',
+    'sstable_level',
+    'repaired_at',
+    'pending_repair',        # a UUID, or None
+    'is_transient',
+    'total_rows',
+    'partition_sizes',       # the estimated partition size histogram, as (offset, count) pairs
+    'cell_counts',           # the estimated cells per partition histogram, as (offset, count) pairs
+    'tombstone_drop_times',  # the tombstone drop time histogram, as (local deletion time, count) pairs
+))
+
+
+class SSTableMetadataError(Exception):
+    pass
+
+
+class Version(object):
+    """
+    The features of an sstable format version the stats component depends on.
+    """
+
+    def __init__(self, version, sstable_format='big'):
+        self.version = version
+        if sstable_format == 'bti':
+            # bti came with 5.0 and has every feature of its big counterpart, oa
+            version = 'oa'
+        self.store_rows = version >= 'ma'
+        self.has_commitlog_lower_bound = version >= 'mb'
+        self.has_commitlog_intervals = version >= 'mc'
+        self.has_pending_repair = version >= 'na'
+        self.has_is_transient = version >= 'na'
+        self.has_metadata_checksum = version >= 'na'
+        self.has_improved_min_max = version >= 'oa'
+        self.has_uint_deletion_time = version >= 'oa'
+
+
+def unsigned_vint(data, offset):
+    """
+    @return an unsigned vint, read as VIntCoding does, and the offset following it
+    """
+    first = data[offset]
+    # the number of leading set bits is the number of bytes that follow
+    extra_bytes = 8 - (first ^ 0xff).bit_length()
+    value = first & (0xff >> extra_bytes)
+    for b in data[offset + 1:offset + 1 + extra_bytes]:
+        value = (value << 8) | b
+    return value, offset + 1 + extra_bytes
+
+
+class _Reader(object):
+    """
+    Reads big endian values the way DataInput does.
+    """
+
+    def __init__(self, data, position=0):
+        self.data = data
+        self.position = position
+
+    def _unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.data, self.position)
+        self.position += struct.calcsize(fmt)
+        return values[0] if len(values) == 1 else values
+
+    def byte(self):
+        return self._unpack('>b')
+
+    def boolean(self):
+        return self._unpack('>?')
+
+    def short(self):
+        return self._unpack('>H')
+
+    def int(self):
+        return self._unpack('>i')
+
+    def uint(self):
+        return self._unpack('>I')
+
+    def long(self):
+        return self._unpack('>q')
+
+    def double(self):
+        return self._unpack('>d')
+
+    def bytes(self, length):
+        value = self.data[self.position:self.position + length]
+        self.position += length
+        return value
+
+    def unsigned_vint(self):
+        value, self.position = unsigned_vint(self.data, self.position)
+        return value
+
+    def uuid(self):
+        return uuid.UUID(bytes=self.bytes(16))
+
+    def histogram(self):
+        """
+        An EstimatedHistogram, as (offset, count) pairs
+        """
+        return [self._unpack('>qq') for _ in range(self.int())]
+
+    def tombstone_histogram(self):
+        self.int()  # the max number of bins
+        return [(point, count) for point, count in (self._unpack('>dq') for _ in range(self.int()))]
+
+    def commitlog_position(self):
+        return self._unpack('>qi')
+
+
+def sstable_version(path):
+    """
+    @return the (version, format) of the sstable the given component belongs to
+    """
+    name = os.path.basename(path)
+    match = _SSTABLE_NAME.match(name)
+    if match:
+        return match.group('version'), match.group('format')
+    match = _LEGACY_SSTABLE_NAME.match(name)
+    if match:
+        return match.group('version'), 'big'
+    raise SSTableMetadataError("{} is not an sstable component".format(path))
+
+
+def component_path(path, component):
+    """
+    @return the path of the given component of the sstable the path is a component of
+    """
+    return path[:path.rindex('-') + 1] + component
+
+
+def read_toc(path):
+    """
+    @return the names of the components listed in the TOC.txt of the sstable the path is a component of
+    """
+    with open(component_path(path, 'TOC.txt')) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _check_crc(data, crc, position):
+    """
+    Checks the crc32 written at the given position, and returns the position following it
+    """
+    if crc != struct.unpack_from('>I', data, position)[0]:
+        raise SSTableMetadataError("Checksum mismatch at {}".format(position))
+    return position + 4
+
+
+def _unreversed_type_name(type_name):
+    match = re.match(r'^(?:[\w.]+\.)?ReversedType\((.*)\)$', type_name)
+    if match:
+        return _unreversed_type_name(match.group(1))
+    return type_name.rsplit('.', 1)[-1]
+
+
+def _skip_clustering_bound(reader, types):
+    """
+    Skips a ClusteringBound of the improved min/max covered slice
+    """
+    reader.byte()  # kind
+    size = reader.short()
+    for block in range(0, size, 32):
+        header = reader.unsigned_vint()
+        for i in range(block, min(size, block + 32)):
+            empty_or_null = header & (0b11 << (2 * (i - block)))
+            if empty_or_null:
+                continue
+            length = _FIXED_LENGTH_TYPES.get(_unreversed_type_name(types[i]))
+            reader.bytes(length if length is not None else reader.unsigned_vint())
+
+
+def _read_stats(data, position, version):
+    reader = _Reader(data, position)
+    partition_sizes = reader.histogram()
+    cell_counts = reader.histogram()
+    reader.commitlog_position()
+    min_timestamp = reader.long()
+    max_timestamp = reader.long()
+    read_deletion_time = reader.uint if version.has_uint_deletion_time else reader.int
+    min_local_deletion_time = read_deletion_time() if version.store_rows else None
+    max_local_deletion_time = read_deletion_time()
+    min_ttl, max_ttl = (reader.int(), reader.int()) if version.store_rows else (None, None)
+    compression_ratio = reader.double()
+    tombstone_drop_times = reader.tombstone_histogram()
+    sstable_level = reader.int()
+    repaired_at = reader.long()
+
+    if version.has_improved_min_max:
+        types = [reader.bytes(reader.unsigned_vint()).decode('utf-8') for _ in range(reader.unsigned_vint())]
+        _skip_clustering_bound(reader, types)
+        _skip_clustering_bound(reader, types)
+    else:
+        for _ in range(2):
+            for _ in range(reader.int()):
+                reader.bytes(reader.short())
+    reader.boolean()  # has legacy counter shards
+    total_rows = None
+    if version.store_rows:
+        reader.long()  # total columns set
+        total_rows = reader.long()
+    if version.has_commitlog_lower_bound:
+        reader.commitlog_position()
+    if version.has_commitlog_intervals:
+        for _ in range(reader.int()):
+            reader.commitlog_position()
+            reader.commitlog_position()
+    pending_repair = None
+    if version.has_pending_repair and reader.byte() != 0:
+        pending_repair = reader.uuid()
+    is_transient = reader.boolean() if version.has_is_transient else False
+
+    return dict(min_timestamp=min_timestamp, max_timestamp=max_timestamp,
+                min_local_deletion_time=min_local_deletion_time, max_local_deletion_time=max_local_deletion_time,
+                min_ttl=min_ttl, max_ttl=max_ttl, compression_ratio=compression_ratio,
+                sstable_level=sstable_level, repaired_at=repaired_at, pending_repair=pending_repair,
+                is_transient=is_transient, total_rows=total_rows, partition_sizes=partition_sizes,
+                cell_counts=cell_counts, tombstone_drop_times=tombstone_drop_times)
+
+
+def read_sstable_metadata(path):
+    """
+    Reads the stats component of the Statistics.db of an sstable.
+
+    @param path the path of any component of the sstable, usually its Data.db
+    @return a SSTableMetadata
+    """
+    version_name, sstable_format = sstable_version(path)
+    version = Version(version_name, sstable_format)
+    if sstable_format == 'big' and version_name < 'ka':
+        raise SSTableMetadataError("Reading the metadata of {} sstables is not supported".format(version_name))
+    statistics = component_path(path, 'Statistics.db')
+    with open(statistics, 'rb') as f:
+        data = f.read()
+
+    try:
+        reader = _Reader(data)
+        count = reader.int()
+        if version.has_metadata_checksum:
+            crc = zlib.crc32(data[:4])
+            reader.position = _check_crc(data, crc, 4)
+        toc_start = reader.position
+        offsets = dict(reader._unpack('>ii') for _ in range(count))
+        if STATS_TYPE not in offsets:
+            raise SSTableMetadataError("{} has no stats component".format(statistics))
+        stats_start = offsets[STATS_TYPE]
+        if version.has_metadata_checksum:
+            # the checksum of the table of contents also covers the count, while the one
+            # following every component only covers the component
+            _check_crc(data, zlib.crc32(data[toc_start:reader.position], crc), reader.position)
+            stats_end = min([o for o in offsets.values() if o > stats_start] + [len(data)]) - 4
+            _check_crc(data, zlib.crc32(data[stats_start:stats_end]), stats_end)
+        stats = _read_stats(data, stats_start, version)
+    except (struct.error, IndexError) as e:
+        raise SSTableMetadataError("Could not read {}: {}".format(statistics, e))
+    return SSTableMetadata(name=component_path(path, '')[:-1], version=version_name, **stats)
+
+
+def sstables_metadata(node, keyspace, table=''):
+    """
+    @return the SSTableMetadata of every sstable of the table (of every table if none is given)
+            of the keyspace on the node, like running sstablemetadata on them
+    """
+    return [read_sstable_metadata(path) for path in node.get_sstables(keyspace, table)]
+
+
+def estimated_droppable_tombstones(metadata, gc_before=None):
+    """
+    The ratio of the cells of the sstable which are tombstones droppable before gc_before,
+    computed as sstablemetadata computes its "Estimated droppable tombstones".
+
+    @param gc_before a local deletion time in seconds, now by default
+    """
+    if gc_before is None:
+        gc_before = int(time.time())
+    buckets = [count for _, count in metadata.cell_counts]
+    if not buckets or buckets[-1] > 0:
+        return 0.0
+    # the count of the n-th bucket is paired with the offset of the n-1-th, the upper bound of its values
+    offsets = [offset for offset, _ in metadata.cell_counts[1:]]
+    elements = sum(buckets[:-1])
+    if elements == 0:
+        return 0.0
+    mean = -(-sum(count * offset for count, offset in zip(buckets, offsets)) // elements)
+    cells = mean * sum(buckets)
+    return _histogram_sum(metadata.tombstone_drop_times, gc_before) / cells if cells > 0 else 0.0
+
+
+def _histogram_sum(bins, b):
+    """
+    The estimated number of points of a streaming histogram up to b
+    """
+    below = [(point, count) for point, count in bins if point <= b]
+    above = [(point, count) for point, count in bins if point > b]
+    if not above:
+        return float(sum(count for _, count in bins))
+    if not below:
+        return 0.0
+    (p_i, m_i), (p_next, m_next) = below[-1], above[0]
+    weight = (b - p_i) / (p_next - p_i)
+    m_b = m_i + (m_next - m_i) * weight
+    return (m_i + m_b) * weight / 2 + m_i / 2.0 + sum(count for _, count in below[:-1])
@@ -0,0 +1,44 @@
+"""
+Thrift clients of the thrift tests, usable without importing thrift_test.
+
+The thrift library and the bindings are only imported when a client is created:
+most modules using thrift do so in a couple of tests which are skipped against
+4.0+ clusters, and importing the bindings costs more than the rest of these
+modules put together.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def fastbinary_available():
+    """
+    @return whether thrift was built with its fastbinary C extension, without which
+            the accelerated protocol falls back to the pure Python encoding
+    """
+    try:
+        from thrift.protocol import fastbinary  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_thrift_client(host='127.0.0.1', port=9160, accelerated=True):
+    """
+    @param accelerated whether to encode and decode through fastbinary when it is
+           available (see fastbinary_available), rather than the generated
+           field by field read and write methods of the thrift bindings
+    """
+    from thrift.protocol import TBinaryProtocol
+    from thrift.transport import TSocket, TTransport
+    from thrift_bindings.thrift010 import Cassandra
+
+    socket = TSocket.TSocket(host, port)
+    transport = TTransport.TFramedTransport(socket)
+    if accelerated:
+        protocol = TBinaryProtocol.TBinaryProtocolAccelerated(transport)
+    else:
+        protocol = TBinaryProtocol.TBinaryProtocol(transport)
+    client = Cassandra.Client(protocol)
+    client.transport = transport
+    return client
@@ -0,0 +1,388 @@
+"""
+Utilities for checking table contents by token range instead of with one big
+scan or one point read per key.
+
+The ring is split into subranges using the driver's token metadata, and each
+subrange is scanned concurrently with a `token(pk) > ? AND token(pk) <= ?`
+query. Expected rows are bucketed into the same subranges on the client side,
+so a mismatch can be reported per range.
+
+The same digests are used to compare replicas with each other: every node
+digests the ranges it replicates in place, as the coordinator of its own reads
+at CL.ONE, all of the nodes at once and with concurrent range queries, and only
+the ranges whose digests disagree are read row by row.
+
+The replicas of the ranges also tell which nodes a rolling upgrade can restart
+together without losing QUORUM, see plan_rolling_batches.
+
+For example, to check that every row written by a test is readable at CL.ALL:
+
+    verifier = TokenRangeVerifier(session, 'ks', 'cf', columns=('k', 'v'))
+    verifier.verify([(k, str(k)) for k in written_keys])
+"""
+import hashlib
+import logging
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+from cassandra import ConsistencyLevel
+from cassandra.query import SimpleStatement
+
+from dtest import get_ip_from_node
+
+logger = logging.getLogger(__name__)
+
+# (min, max) token values for the partitioners whose tokens are plain integers
+_TOKEN_BOUNDS = {
+    'Murmur3Token': (-2 ** 63, 2 ** 63 - 1),
+    'MD5Token': (-1, 2 ** 127),
+}
+
+_DIGEST_MODULUS = 2 ** 128
+
+
+def row_digest(row):
+    """
+    Returns a 128-bit integer hash of a single row.
+
+    Row digests are combined by addition modulo 2**128 (see combine_digests),
+    so the digest of a set of rows does not depend on the order they were read in.
+    """
+    return int.from_bytes(hashlib.md5(repr(tuple(row)).encode('utf-8')).digest(), 'big')
+
+
+def combine_digests(*digests):
+    return sum(digests) % _DIGEST_MODULUS
+
+
+def rows_digest(rows):
+    """
+    @return a (row count, digest) tuple for the given rows
+    """
+    count = 0
+    digest = 0
+    for row in rows:
+        count += 1
+        digest += row_digest(row)
+    return count, digest % _DIGEST_MODULUS
+
+
+def split_token_ranges(ring_tokens, token_class_name, splits_per_range=1):
+    """
+    Turns a sorted list of ring token values into a list of (start, end] ranges
+    covering the whole ring, splitting each range between two ring tokens into
+    splits_per_range pieces.
+
+    The range wrapping around the end of the ring is returned as two ranges, one
+    ending on the maximum token and one starting on the minimum token, so that
+    every range can be queried with `token(pk) > start AND token(pk) <= end`.
+    """
+    if token_class_name not in _TOKEN_BOUNDS:
+        raise ValueError("Token range splitting is not supported for {}".format(token_class_name))
+    min_token, max_token = _TOKEN_BOUNDS[token_class_name]
+
+    bounds = [min_token] + [t for t in sorted(ring_tokens) if t != min_token] + [max_token]
+    ranges = []
+    for start, end in zip(bounds, bounds[1:]):
+        if start == end:
+            continue
+        width = end - start
+        pieces = max(1, min(splits_per_range, width))
+        previous = start
+        for i in range(1, pieces + 1):
+            current = end if i == pieces else start + (width * i) // pieces
+            ranges.append((previous, current))
+            previous = current
+    return ranges
+
+
+class TokenRangeVerifier(object):
+    """
+    Scans or verifies a table by token range, running up to `concurrency`
+    range queries at a time.
+
+    @param session the session to query through
+    @param keyspace the keyspace of the table
+    @param table the table to check
+    @param columns the columns to select; defaults to every column of the table
+           in metadata order. Expected rows must be given in the same order.
+    @param consistency_level the consistency level of every range query
+    @param splits_per_range how many subranges to split each range between two
+           ring tokens into, to get more parallelism out of small clusters
+    @param concurrency the number of range queries in flight at once
+    @param fetch_size the page size of every range query
+    """
+
+    def __init__(self, session, keyspace, table, columns=None, consistency_level=ConsistencyLevel.ALL,
+                 splits_per_range=4, concurrency=16, fetch_size=5000):
+        self.session = session
+        self.keyspace = keyspace
+        self.table = table
+        self.consistency_level = consistency_level
+        self.splits_per_range = splits_per_range
+        self.concurrency = concurrency
+        self.fetch_size = fetch_size
+
+        table_meta = session.cluster.metadata.keyspaces[keyspace].tables[table]
+        self.partition_key = [c.name for c in table_meta.partition_key]
+        self.columns = list(columns) if columns is not None else list(table_meta.columns.keys())
+        missing = [c for c in self.partition_key if c not in self.columns]
+        if missing:
+            raise ValueError("Partition key columns {} must be selected to verify by token range".format(missing))
+        self._pk_indexes = [self.columns.index(c) for c in self.partition_key]
+
+        pk = ', '.join(self.partition_key)
+        self._range_query = 'SELECT {cols} FROM {ks}.{tab} WHERE token({pk}) > %s AND token({pk}) <= %s'.format(
+            cols=', '.join(self.columns), ks=keyspace, tab=table, pk=pk)
+        # only used to compute the routing key, and so the token, of expected rows
+        self._routing_statement = session.prepare('SELECT {pk} FROM {ks}.{tab} WHERE {where}'.format(
+            pk=pk, ks=keyspace, tab=table, where=' AND '.join('{} = ?'.format(c) for c in self.partition_key)))
+
+        self.ranges = self._compute_ranges()
+        self._range_ends = [end for _, end in self.ranges]
+
+    def _compute_ranges(self):
+        token_map = self.session.cluster.metadata.token_map
+        ring_tokens = [t.value for t in token_map.ring]
+        return split_token_ranges(ring_tokens, token_map.token_class.__name__, self.splits_per_range)
+
+    def token_of(self, row):
+        """
+        @return the token of the partition a row of `columns` values belongs to
+        """
+        bound = self._routing_statement.bind([row[i] for i in self._pk_indexes])
+        return self.session.cluster.metadata.token_map.token_class.from_key(bound.routing_key).value
+
+    def range_index_of(self, row):
+        return bisect_left(self._range_ends, self.token_of(row))
+
+    def replicated_ranges(self, address):
+        """
+        @return the subset of `ranges` which the host at the given address is a replica for
+        """
+        token_map = self.session.cluster.metadata.token_map
+        owned = []
+        for token_range in self.ranges:
+            replicas = token_map.get_replicas(self.keyspace, token_map.token_class(token_range[1]))
+            if any(host.address == address for host in replicas):
+                owned.append(token_range)
+        return owned
+
+    def _iter_range(self, token_range):
+        start, end = token_range
+        statement = SimpleStatement(self._range_query, consistency_level=self.consistency_level,
+                                    fetch_size=self.fetch_size)
+        for row in self.session.execute(statement, (start, end)):
+            yield tuple(row)
+
+    def scan_range(self, token_range):
+        """
+        @return the list of rows in the given (start, end] range
+        """
+        return list(self._iter_range(token_range))
+
+    def _map_ranges(self, func, ranges=None):
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return list(executor.map(func, self.ranges if ranges is None else ranges))
+
+    def scan(self):
+        """
+        @return every row of the table, read range by range
+        """
+        rows = []
+        for range_rows in self._map_ranges(self.scan_range):
+            rows.extend(range_rows)
+        return rows
+
+    def count(self):
+        return sum(count for count, _ in self.range_digests())
+
+    def range_digests(self, ranges=None):
+        """
+        @param ranges the ranges to digest, all of `ranges` by default
+        @return a list of (row count, digest) tuples, one per range
+        """
+        return self._map_ranges(lambda r: rows_digest(self._iter_range(r)), ranges)
+
+    def expected_range_digests(self, expected_rows):
+        """
+        Buckets the expected rows into `ranges` and digests each bucket.
+
+        @return a list of (row count, digest) tuples, one per range in `ranges`
+        """
+        counts = [0] * len(self.ranges)
+        digests = [0] * len(self.ranges)
+        for row in expected_rows:
+            index = self.range_index_of(row)
+            counts[index] += 1
+            digests[index] += row_digest(row)
+        return [(c, d % _DIGEST_MODULUS) for c, d in zip(counts, digests)]
+
+    def verify(self, expected_rows, max_reported=10):
+        """
+        Asserts the table contains exactly expected_rows, an iterable (or generator)
+        of tuples of `columns` values.
+
+        Ranges are compared by row count and digest, so neither side is kept in
+        memory; the ranges that do not match are reported with their row counts.
+        """
+        expected = self.expected_range_digests(expected_rows)
+        actual = self.range_digests()
+        mismatched = [i for i, (e, a) in enumerate(zip(expected, actual)) if e != a]
+        logger.debug("Verified {} rows of {}.{} over {} token ranges, {} mismatched".format(
+            sum(c for c, _ in expected), self.keyspace, self.table, len(self.ranges), len(mismatched)))
+        if mismatched:
+            message = "{} of {} token ranges of {}.{} do not match the expected data:".format(
+                len(mismatched), len(self.ranges), self.keyspace, self.table)
+            for i in mismatched[:max_reported]:
+                message += "\n  range {}: expected {} rows, found {}".format(self.ranges[i], expected[i][0], actual[i][0])
+            assert False, message
+
+
+def plan_rolling_batches(nodes, replica_sets, max_batch_size):
+    """
+    Greedily groups nodes into batches which can be down at the same time without losing
+    QUORUM on any token range.
+
+    @param nodes a list of (node, address, rack) tuples; nodes sharing a rack are batched
+           together before nodes of other racks are considered
+    @param replica_sets a list of sets of replica addresses, one per token range
+    @param max_batch_size the max number of nodes per batch
+    @return a list of lists of nodes, covering every node once
+    """
+    remaining = sorted(nodes, key=lambda n: str(n[2]))
+    batches = []
+    while remaining:
+        batch = []
+        for candidate in list(remaining):
+            if len(batch) >= max_batch_size:
+                break
+            down = {address for _, address, _ in batch} | {candidate[1]}
+            if all(len(replicas & down) <= len(replicas) - (len(replicas) // 2 + 1)
+                   for replicas in replica_sets if candidate[1] in replicas):
+                batch.append(candidate)
+                remaining.remove(candidate)
+        if not batch:
+            # a single node can't be taken down without losing QUORUM, e.g. RF=1 or 2, so just go one by one
+            batch.append(remaining.pop(0))
+        batches.append([node for node, _, _ in batch])
+    return batches
+
+
+def check_reads_in_place(node):
+    """
+    Raises a ValueError unless the reads at CL.ONE a node coordinates are served by the node
+    itself when it is a replica: the dynamic snitch must be disabled, and the snitch must sort
+    the coordinator first, which SimpleSnitch does not (PropertyFileSnitch, which
+    `cluster.populate([n])` configures, does).
+    """
+    if str(node.get_conf_option('dynamic_snitch')).lower() != 'false':
+        raise ValueError("{} must run with dynamic_snitch: false to be read in place".format(node.name))
+    snitch = str(node.get_conf_option('endpoint_snitch'))
+    if snitch.endswith('SimpleSnitch'):
+        raise ValueError("{} must run with a snitch sorting the coordinator first to be read in place, not {}"
+                         .format(node.name, snitch))
+
+
+def _table_options(session, keyspace, table, options):
+    session.execute("ALTER TABLE {}.{} WITH {}".format(
+        keyspace, table, ' AND '.join('{} = {}'.format(name, value) for name, value in sorted(options.items()))))
+
+
+def _in_place_read_options(session, keyspace, table):
+    """
+    @return the table options which keep reads at CL.ONE on the first replica (no speculative
+            retry, no read repair chance before 4.0), and the current values of these options
+    """
+    current = session.cluster.metadata.keyspaces[keyspace].tables[table].options
+    options = {'speculative_retry': "'NONE'"}
+    previous = {'speculative_retry': "'{}'".format(current['speculative_retry'])}
+    for name in ('read_repair_chance', 'dclocal_read_repair_chance'):
+        if name in current:
+            options[name] = 0
+            previous[name] = current[name]
+    return options, previous
+
+
+def compare_replicas(cluster, connect, keyspace, table, columns=None, splits_per_range=4, concurrency=16):
+    """
+    Compares the content of a table across replicas.
+
+    Every running node reads the token ranges it replicates in place, through a session
+    whose only coordinator is the node, at CL.ONE. The nodes must be configured so that
+    these reads are not sent to another replica (see check_reads_in_place), and speculative
+    retry (and read repair chance before 4.0) is disabled on the table for the duration of
+    the check. The nodes digest their ranges all at once, each of them with the ranges
+    queried concurrently, and only the ranges whose digests differ between replicas are
+    then read in full.
+
+    @param connect a function returning an exclusive session to a node, e.g.
+           DTestSetup.patient_exclusive_cql_connection
+    @return a dict of {(start, end] range: {node name: set of rows}} holding, for
+            every range the replicas disagree on, the rows of each replica that are
+            not on all of the others. Empty if all replicas match.
+    """
+    nodes = [node for node in cluster.nodelist() if node.is_running()]
+    for node in nodes:
+        check_reads_in_place(node)
+    sessions = {}
+    try:
+        for node in nodes:
+            sessions[node] = connect(node)
+        options, previous = _in_place_read_options(sessions[nodes[0]], keyspace, table)
+        _table_options(sessions[nodes[0]], keyspace, table, options)
+        try:
+            verifiers = {node: TokenRangeVerifier(sessions[node], keyspace, table, columns=columns,
+                                                  consistency_level=ConsistencyLevel.ONE,
+                                                  splits_per_range=splits_per_range, concurrency=concurrency)
+                         for node in nodes}
+
+            def digest(node):
+                ranges = verifiers[node].replicated_ranges(get_ip_from_node(node))
+                return zip(ranges, verifiers[node].range_digests(ranges))
+
+            with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+                digests = list(executor.map(digest, nodes))
+            digests_by_range = {}
+            for node, node_digests in zip(nodes, digests):
+                for token_range, range_digest in node_digests:
+                    digests_by_range.setdefault(token_range, {})[node] = range_digest
+            mismatched = [(token_range, list(by_node)) for token_range, by_node in digests_by_range.items()
+                          if len(set(by_node.values())) > 1]
+            logger.debug("Compared {} token ranges of {}.{} across {} replicas, {} mismatched".format(
+                len(digests_by_range), keyspace, table, len(nodes), len(mismatched)))
+
+            def scan(node):
+                ranges = [token_range for token_range, replicas in mismatched if node in replicas]
+                return zip(ranges, verifiers[node]._map_ranges(lambda r: set(verifiers[node].scan_range(r)), ranges))
+
+            with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+                scans = list(executor.map(scan, nodes))
+        finally:
+            _table_options(sessions[nodes[0]], keyspace, table, previous)
+    finally:
+        for session in sessions.values():
+            session.cluster.shutdown()
+
+    rows_by_range = {}
+    for node, node_scans in zip(nodes, scans):
+        for token_range, rows in node_scans:
+            rows_by_range.setdefault(token_range, {})[node] = rows
+    differences = {}
+    for token_range, rows_by_node in rows_by_range.items():
+        common = set.intersection(*rows_by_node.values())
+        differences[token_range] = {node.name: rows - common for node, rows in rows_by_node.items()}
+    return differences
+
+
+def assert_replicas_consistent(cluster, connect, keyspace, table, columns=None, max_reported=10, **kwargs):
+    """
+    Asserts all replicas hold the same content for a table, see compare_replicas.
+    """
+    differences = compare_replicas(cluster, connect, keyspace, table, columns=columns, **kwargs)
+    if differences:
+        message = "Replicas of {}.{} differ on {} token ranges:".format(keyspace, table, len(differences))
+        for token_range, by_node in list(differences.items())[:max_reported]:
+            rows = {name: sorted(rows, key=repr)[:max_reported] for name, rows in by_node.items()}
+            message += "\n  range {}: {}".format(token_range, rows)
+        assert False, message
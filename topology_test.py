@@ -13,6 +13,7 @@ from ccmlib.node import TimeoutError, ToolError
 from dtest import Tester, create_ks, create_cf, mk_bman_path
 from tools.assertions import assert_almost_equal, assert_all, assert_none
 from tools.data import insert_c1c2, query_c1c2
+from tools.byteman import byteman_submit
 
 since = pytest.mark.since
 logger = logging.getLogger(__name__)
@@ -243,7 +244,7 @@ class TestTopology(Tester):
                 script = [mk_bman_path('4.0/decommission_failure_inject.btm')]
             else:
                 script = [mk_bman_path('pre4.0/decommission_failure_inject.btm')]
-            node2.byteman_submit(script)
+            byteman_submit(node2, script)
             node2.nodetool('decommission')
 
         # Make sure previous ToolError is due to decommission
@@ -1,8 +1,6 @@
-import re
 import logging
 import types
 from struct import pack
-from uuid import UUID
 
 from cassandra import ConsistencyLevel, InvalidRequest
 from cassandra.query import SimpleStatement
@@ -13,6 +11,8 @@ from dtest import Tester, mk_bman_path
 from tools.jmxutils import JolokiaAgent, make_mbean
 from tools.data import rows_to_list
 from tools.assertions import (assert_all)
+from tools.byteman import byteman_submit
+from tools.sstable_metadata import sstables_metadata
 
 from cassandra.metadata import Murmur3Token, OrderedDict
 import pytest
@@ -144,25 +144,9 @@ def patch_start(startable):
     return startable
 
 def get_sstable_data(cls, node, keyspace):
-    _sstable_name = re.compile(r'SSTable: (.+)')
-    _repaired_at = re.compile(r'Repaired at: (\d+)')
-    _pending_repair = re.compile(r'Pending repair: (\-\-|null|[a-f0-9\-]+)')
-
-    out = node.run_sstablemetadata(keyspace=keyspace).stdout
-
-    def matches(pattern):
-        return filter(None, [pattern.match(l) for l in out.decode("utf-8").split('\n')])
-    names = [m.group(1) for m in matches(_sstable_name)]
-    repaired_times = [int(m.group(1)) for m in matches(_repaired_at)]
-
-    def uuid_or_none(s):
-        return None if s == 'null' or s == '--' else UUID(s)
-    pending_repairs = [uuid_or_none(m.group(1)) for m in matches(_pending_repair)]
-    assert names
-    assert repaired_times
-    assert pending_repairs
-    assert len(names) == len(repaired_times) == len(pending_repairs)
-    return [SSTable(*a) for a in zip(names, repaired_times, pending_repairs)]
+    sstables = [SSTable(m.name, m.repaired_at, m.pending_repair) for m in sstables_metadata(node, keyspace)]
+    assert sstables
+    return sstables
 
 @since('4.0')
 class TransientReplicationBase(Tester):
@@ -185,7 +169,7 @@ class TransientReplicationBase(Tester):
         self.node1, self.node2, self.node3 = self.nodes
 
         # Make sure digest is not attempted against the transient node
-        self.node3.byteman_submit([mk_bman_path('throw_on_digest.btm')])
+        byteman_submit(self.node3, [mk_bman_path('throw_on_digest.btm')])
 
     def use_lcs(self):
         session = self.exclusive_cql_connection(self.node1)
@@ -316,7 +300,7 @@ class TestTransientReplication(TransientReplicationBase):
         with tm(self.node1) as tm1, tm(self.node2) as tm2, tm(self.node3) as tm3:
             self.insert_row(1, 1, 1)
             # Stop writes to the other full node
-            self.node2.byteman_submit([mk_bman_path('stop_writes.btm')])
+            byteman_submit(self.node2, [mk_bman_path('stop_writes.btm')])
             self.insert_row(1, 2, 2)
 
         # node1 should contain both rows
@@ -341,7 +325,7 @@ class TestTransientReplication(TransientReplicationBase):
         tm = lambda n: self.table_metrics(n)
         self.insert_row(1, 1, 1)
         # Stop writes to the other full node
-        self.node2.byteman_submit([mk_bman_path('stop_writes.btm')])
+        byteman_submit(self.node2, [mk_bman_path('stop_writes.btm')])
         self.insert_row(1, 2, 2)
 
         # Stop reads from the node that will hold the second row
@@ -366,7 +350,7 @@ class TestTransientReplication(TransientReplicationBase):
         self.insert_row(1, 2, 2)
 
         # Stop writes to the other full node
-        self.node2.byteman_submit([mk_bman_path('stop_writes.btm')])
+        byteman_submit(self.node2, [mk_bman_path('stop_writes.btm')])
         self.delete_row(1, 1, node = self.node1)
 
         # Stop reads from the node that will hold the second row
@@ -396,7 +380,7 @@ class TestTransientReplication(TransientReplicationBase):
         self.insert_row(1, 1, 1)
         self.insert_row(1, 2, 2)
         # Stop writes to the other full node
-        self.node2.byteman_submit([mk_bman_path('stop_writes.btm')])
+        byteman_submit(self.node2, [mk_bman_path('stop_writes.btm')])
         self.delete_row(1, 2)
 
         self.assert_local_rows(self.node3,
@@ -431,7 +415,7 @@ class TestTransientReplication(TransientReplicationBase):
     def test_speculative_write(self):
         """ if a full replica isn't responding, we should send the write to the transient replica """
         session = self.exclusive_cql_connection(self.node1)
-        self.node2.byteman_submit([mk_bman_path('slow_writes.btm')])
+        byteman_submit(self.node2, [mk_bman_path('slow_writes.btm')])
 
         self.insert_row(1, 1, 1, session=session)
         self.assert_local_rows(self.node1, [[1,1,1]])
@@ -465,7 +449,7 @@ class TestTransientReplicationRepairStreamEntireSSTable(TransientReplicationBase
         if use_lcs:
             self.use_lcs()
 
-        self.node2.byteman_submit([mk_bman_path('stop_writes.btm')])
+        byteman_submit(self.node2, [mk_bman_path('stop_writes.btm')])
         # self.insert_row(1)
         tm = lambda n: self.table_metrics(n)
         with tm(self.node1) as tm1, tm(self.node2) as tm2, tm(self.node3) as tm3:
@@ -598,7 +582,7 @@ class TestTransientReplicationSpeculativeQueries(TransientReplicationBase):
         session.execute("ALTER TABLE %s.%s WITH speculative_retry = 'ALWAYS';" % (self.keyspace, self.table))
         self.insert_row(1, 1, 1)
         # Stop writes to the other full node
-        self.node2.byteman_submit([mk_bman_path('stop_writes.btm')])
+        byteman_submit(self.node2, [mk_bman_path('stop_writes.btm')])
         self.insert_row(1, 2, 2)
 
         for node in self.nodes:
@@ -615,7 +599,7 @@ class TestTransientReplicationSpeculativeQueries(TransientReplicationBase):
         session.execute("ALTER TABLE %s.%s WITH speculative_retry = '99.99PERCENTILE';" % (self.keyspace, self.table))
         self.insert_row(1, 1, 1)
         # Stop writes to the other full node
-        self.node2.byteman_submit([mk_bman_path('stop_writes.btm')])
+        byteman_submit(self.node2, [mk_bman_path('stop_writes.btm')])
         self.insert_row(1, 2, 2)
 
         for node in self.nodes:
@@ -649,7 +633,7 @@ class TestMultipleTransientNodes(TransientReplicationBase):
         tm = lambda n: self.table_metrics(n)
         self.insert_row(1, 1, 1)
         # Stop writes to the other full node
-        self.node2.byteman_submit([mk_bman_path('stop_writes.btm')])
+        byteman_submit(self.node2, [mk_bman_path('stop_writes.btm')])
         self.insert_row(1, 2, 2)
 
         self.assert_local_rows(self.node1,
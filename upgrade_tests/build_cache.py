@@ -0,0 +1,340 @@
+"""
+Content-addressed cache of Cassandra install directories for the upgrade tests.
+
+ccm keeps one checkout per branch slug (e.g. `github:apache/cassandra-4.0`) and
+fetches and rebuilds it every time the slug is set up. This cache instead keys
+each built install directory by what it was built from: the commit the branch
+resolves to, the JDK used to build it and the build options. An unchanged branch
+is then only resolved (a single `git ls-remote`) instead of fetched and rebuilt,
+and every pytest worker on the machine reuses the same builds. A version is built
+with the JDK of the tests when it supports it, otherwise with the newest JDK it
+supports whose JAVA<n>_HOME is set (see build_java_version).
+
+Entries are evicted least recently used first once the cache grows past
+DTEST_UPGRADE_BUILD_CACHE_MAX_GB, except entries used recently enough that a
+running test may still have nodes started from them. The cache location is
+DTEST_UPGRADE_BUILD_CACHE_DIR, and setting DTEST_UPGRADE_BUILD_CACHE=false
+goes back to plain `set_install_dir(version=...)`.
+
+`pytest --warm-upgrade-build-cache --upgrade-version-selection=both` populates
+the cache with every version the selected upgrade paths need, and exits.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import time
+
+from contextlib import contextmanager
+
+import ccmlib.repository
+from ccmlib.cluster import Cluster
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the cache is not shared between workers
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_ENTRY_META = 'dtest_build_cache.json'
+
+
+def build_cache_enabled():
+    return os.environ.get('DTEST_UPGRADE_BUILD_CACHE', 'true').lower() not in ('no', 'false', '0')
+
+
+@contextmanager
+def _file_lock(path):
+    """
+    Holds an exclusive flock on the given file, shared by every process on the host.
+    """
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@contextmanager
+def _java_home(java_version):
+    """
+    Points JAVA_HOME at JAVA<java_version>_HOME, if it is set, for the duration of a build.
+    """
+    java_home = os.environ.get('JAVA{}_HOME'.format(java_version))
+    previous = os.environ.get('JAVA_HOME')
+    if java_home:
+        os.environ['JAVA_HOME'] = java_home
+    try:
+        yield
+    finally:
+        if java_home:
+            if previous is None:
+                del os.environ['JAVA_HOME']
+            else:
+                os.environ['JAVA_HOME'] = previous
+
+
+def build_java_version(java_versions, current_java_version, environ=None):
+    """
+    @param java_versions the JDK versions a Cassandra version supports
+    @param current_java_version the version of the JDK the tests run with
+    @return the version of the JDK a Cassandra version is built with
+    """
+    if current_java_version in java_versions:
+        return current_java_version
+    environ = os.environ if environ is None else environ
+    available = [v for v in java_versions if 'JAVA{}_HOME'.format(v) in environ]
+    return max(available) if available else current_java_version
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _git_url(version):
+    """
+    @return the (repository url, ref) a ccm git version slug is built from, or None
+            if the slug does not refer to a remote git branch
+    """
+    if version.startswith('github:'):
+        user_name, branch = ccmlib.repository.github_username_and_branch_name(version)
+        if user_name == 'apache':
+            return ccmlib.repository.GITHUB_REPO, branch
+        return ccmlib.repository.github_repo_for_user(user_name), branch
+    if version.startswith('git:'):
+        return ccmlib.repository.GIT_REPO, version.split(':', 1)[1]
+    return None
+
+
+_resolved_versions = {}
+
+
+def resolve_version(version):
+    """
+    Resolves a ccm version slug to something which identifies its content.
+
+    Released versions (e.g. '4.0.19' or 'binary:4.0.19') never change and identify
+    themselves. Git branches resolve to the commit they point at the first time
+    they are resolved, so that every node of a test session gets the same build
+    even if the branch moves on in the meantime.
+
+    @return the resolved identifier, or None if the version can not be cached
+            (local clones, aliases, and anything else whose content can't be pinned)
+    """
+    git_url = _git_url(version)
+    if git_url is None:
+        if version.split(':')[0] in ('clone', 'local', 'alias', 'source'):
+            return None
+        return version
+    if version in _resolved_versions:
+        return _resolved_versions[version]
+    url, ref = git_url
+    try:
+        out = subprocess.check_output(['git', 'ls-remote', url, ref], stderr=subprocess.PIPE, timeout=120)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning("Could not resolve {} to a commit, not using the build cache: {}".format(version, e))
+        return None
+    lines = out.decode('utf-8').split()
+    if not lines:
+        logger.warning("{} does not exist in {}, not using the build cache".format(ref, url))
+        return None
+    _resolved_versions[version] = lines[0]
+    return lines[0]
+
+
+def _checkout_commit(source_dir):
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=source_dir,
+                                       stderr=subprocess.PIPE).decode('utf-8').strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class BuildCache(object):
+    """
+    A directory of built install directories, one per cache key, each with a metadata
+    file recording what it was built from and when it was last used.
+
+    @param root the cache directory, shared by every worker on the host
+    @param max_bytes total size above which least recently used entries are evicted
+    @param min_idle_s entries used less than this long ago are never evicted, as a
+           running test may still have nodes started from them
+    """
+
+    def __init__(self, root=None, max_bytes=None, min_idle_s=12 * 60 * 60):
+        self.root = root or os.environ.get('DTEST_UPGRADE_BUILD_CACHE_DIR',
+                                           os.path.join(os.path.expanduser('~'), '.ccm', 'dtest_build_cache'))
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('DTEST_UPGRADE_BUILD_CACHE_MAX_GB', 40)) * 1024 ** 3)
+        self.max_bytes = max_bytes
+        self.min_idle_s = min_idle_s
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def cache_key(resolved, java_version, build_flags=()):
+        return hashlib.sha256(repr((resolved, java_version, tuple(build_flags))).encode('utf-8')).hexdigest()[:24]
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def _read_meta(self, key):
+        try:
+            with open(os.path.join(self._entry_dir(key), _ENTRY_META)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _touch(self, key):
+        os.utime(os.path.join(self._entry_dir(key), _ENTRY_META))
+
+    def install_dir(self, version, java_version, build_flags=()):
+        """
+        Returns a built install directory for the given ccm version slug, building it
+        with ccm and copying it into the cache if no matching entry exists yet.
+
+        @param java_version the JDK to build with, through JAVA<java_version>_HOME if it is set
+
+        @return the install directory, or None if the version can not be cached
+        """
+        resolved = resolve_version(version)
+        if resolved is None:
+            return None
+        key = self.cache_key(resolved, java_version, build_flags)
+        entry_dir = self._entry_dir(key)
+
+        # per-entry lock, so that workers wanting the same build wait for the first one
+        with _file_lock(entry_dir + '.lock'):
+            if self._read_meta(key) is not None:
+                logger.debug("Build cache hit for {} ({}): {}".format(version, resolved, entry_dir))
+                self._touch(key)
+                return entry_dir
+
+            logger.info("Build cache miss for {} ({}), setting it up with ccm".format(version, resolved))
+            start = time.time()
+            with _java_home(java_version):
+                source_dir, _ = ccmlib.repository.setup(version)
+            if _git_url(version) is not None and _checkout_commit(source_dir) not in (None, resolved):
+                # the branch moved between resolving it and ccm fetching it, so this isn't the build we keyed
+                logger.warning("{} moved on from {} while setting it up, not caching it".format(version, resolved))
+                return source_dir
+            staging_dir = entry_dir + '.tmp'
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            shutil.copytree(source_dir, staging_dir, symlinks=True, ignore=shutil.ignore_patterns('.git'))
+            meta = {'version': version, 'resolved': resolved, 'java_version': java_version,
+                    'build_flags': list(build_flags), 'size': _dir_size(staging_dir), 'created': time.time()}
+            with open(os.path.join(staging_dir, _ENTRY_META), 'w') as f:
+                json.dump(meta, f)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.rename(staging_dir, entry_dir)
+            logger.info("Cached {} in {} ({:.1f}MB) after {:.0f}s".format(
+                version, entry_dir, meta['size'] / 1024 ** 2, time.time() - start))
+
+        self.evict(keep=(key,))
+        return entry_dir
+
+    def entries(self):
+        """
+        @return a list of (key, metadata, last used time) for every complete entry
+        """
+        entries = []
+        for name in os.listdir(self.root):
+            if '.' in name:  # lock files and entries still being copied in
+                continue
+            meta = self._read_meta(name) if os.path.isdir(self._entry_dir(name)) else None
+            if meta is not None:
+                last_used = os.path.getmtime(os.path.join(self._entry_dir(name), _ENTRY_META))
+                entries.append((name, meta, last_used))
+        return entries
+
+    def evict(self, keep=()):
+        """
+        Removes least recently used entries until the cache fits in max_bytes.
+        """
+        with _file_lock(os.path.join(self.root, '.evict.lock')):
+            entries = sorted(self.entries(), key=lambda e: e[2])
+            total = sum(meta['size'] for _, meta, _ in entries)
+            now = time.time()
+            for key, meta, last_used in entries:
+                if total <= self.max_bytes:
+                    break
+                if key in keep or now - last_used < self.min_idle_s:
+                    continue
+                with _file_lock(self._entry_dir(key) + '.lock'):
+                    logger.info("Evicting {} ({}) from the build cache".format(meta['version'], meta['resolved']))
+                    os.remove(os.path.join(self._entry_dir(key), _ENTRY_META))
+                    shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+                total -= meta['size']
+
+
+_build_cache = None
+
+
+def get_build_cache():
+    global _build_cache
+    if _build_cache is None:
+        _build_cache = BuildCache()
+    return _build_cache
+
+
+def cached_install_dir(version_meta):
+    """
+    @return the cached install directory for the given VersionMeta, or None if the
+            cache is disabled or the version can not be cached
+    """
+    from .upgrade_manifest import CURRENT_JAVA_VERSION, get_cluster_class
+
+    # DSE and HCD versions are set up by their own ccm cluster classes, not ccmlib.repository
+    if not build_cache_enabled() or get_cluster_class(version_meta.family) is not Cluster:
+        return None
+    build_flags = (os.environ.get('ANT_OPTS', ''),)
+    java_version = build_java_version(version_meta.java_versions, CURRENT_JAVA_VERSION)
+    return get_build_cache().install_dir(version_meta.version, java_version, build_flags)
+
+
+def install_dir_for(version_meta):
+    """
+    @return the install directory for the given VersionMeta, from the build cache
+            when possible, otherwise as set up by ccm
+    """
+    install_dir = cached_install_dir(version_meta)
+    if install_dir is None:
+        install_dir, _ = ccmlib.repository.setup(version_meta.version)
+    return install_dir
+
+
+def set_install_dir(target, version_meta):
+    """
+    Points a cluster or node at the install directory for the given VersionMeta,
+    using the build cache when it is enabled and the version can be cached.
+    """
+    install_dir = cached_install_dir(version_meta)
+    if install_dir is None:
+        target.set_install_dir(version=version_meta.version)
+    else:
+        target.set_install_dir(install_dir=install_dir)
+
+
+def warm_up(version_metas):
+    """
+    Populates the build cache with every given VersionMeta that can be cached.
+
+    @return a dict of {version slug: install directory, or None if it was not cached}
+    """
+    install_dirs = {}
+    for version_meta in version_metas:
+        if version_meta.version not in install_dirs:
+            install_dirs[version_meta.version] = cached_install_dir(version_meta)
+    return install_dirs
@@ -1,4 +1,17 @@
+import logging
+
 from .upgrade_manifest import set_config
+from .upgrade_snapshots import upgrade_dag_order
+
+logger = logging.getLogger(__name__)
+
 
 def pytest_configure(config):
     set_config(config)
+
+
+def pytest_collection_modifyitems(items, config):
+    if config.getoption("--share-upgrade-prefixes"):
+        total_steps, distinct_steps = upgrade_dag_order(items)
+        logger.info("Ordered upgrade tests by upgrade path: {} upgrade steps, {} of them distinct".format(
+            total_steps, distinct_steps))
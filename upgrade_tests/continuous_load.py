@@ -0,0 +1,381 @@
+"""
+Continuous write and verify load for rolling upgrade tests.
+
+ContinuousWriteVerifier keeps a bounded number of asynchronous writes in flight
+against the `cf (k uuid PRIMARY KEY, v uuid)` table created by the rolling upgrade
+tests, and reads every written key back to check it. What was written is kept in
+a UUIDLedger, which stores the keys and values as packed 16 byte records instead
+of passing (key, value) tuples between processes.
+
+SharedUUIDQueue is the equivalent for tests which still write and verify from
+separate processes (see data_writer and data_checker): a fixed-capacity ring of
+uuid records in shared memory, with the same put/get/qsize interface as a
+multiprocessing.Queue but no pickling.
+"""
+import logging
+import multiprocessing
+import random
+import struct
+import threading
+import time
+import uuid
+
+from collections import deque
+from multiprocessing import shared_memory
+from queue import Empty, Full
+
+from cassandra import ConsistencyLevel, DriverException, OperationTimedOut
+
+from tools.funcutils import get_rate_limited_function
+
+logger = logging.getLogger(__name__)
+
+_UUID_SIZE = 16
+
+
+class UUIDLedger(object):
+    """
+    Append-only record of (key, value) uuid pairs, stored as two packed bytearrays.
+
+    Records are addressed by the index returned from append; the value of a record
+    can be replaced when its key is rewritten.
+    """
+
+    def __init__(self):
+        self._keys = bytearray()
+        self._values = bytearray()
+
+    def __len__(self):
+        return len(self._keys) // _UUID_SIZE
+
+    def append(self, key, value):
+        index = len(self)
+        self._keys += key.bytes
+        self._values += value.bytes
+        return index
+
+    def set_value(self, index, value):
+        offset = index * _UUID_SIZE
+        self._values[offset:offset + _UUID_SIZE] = value.bytes
+
+    def key(self, index):
+        offset = index * _UUID_SIZE
+        return uuid.UUID(bytes=bytes(self._keys[offset:offset + _UUID_SIZE]))
+
+    def value(self, index):
+        offset = index * _UUID_SIZE
+        return uuid.UUID(bytes=bytes(self._values[offset:offset + _UUID_SIZE]))
+
+
+class SharedUUIDQueue(object):
+    """
+    FIFO of fixed-width uuid records in a multiprocessing.shared_memory ring buffer.
+
+    Items are single uuids if fields is 1, or tuples of `fields` uuids otherwise.
+    The head and tail counters live in the shared memory too, and are only changed
+    while holding a multiprocessing.Condition which is notified on every put and get,
+    so blocked producers and consumers wake up immediately.
+
+    Create it before starting the processes sharing it; the creating process should
+    call release() once they are done to free the shared memory.
+    """
+    _COUNTERS = struct.Struct('QQ')  # total records put, total records got
+
+    def __init__(self, maxsize, fields=1):
+        self.maxsize = maxsize
+        self.fields = fields
+        self._record_size = fields * _UUID_SIZE
+        self._shm = shared_memory.SharedMemory(create=True,
+                                               size=self._COUNTERS.size + maxsize * self._record_size)
+        self._COUNTERS.pack_into(self._shm.buf, 0, 0, 0)
+        self._condition = multiprocessing.Condition()
+
+    def _counters(self):
+        return self._COUNTERS.unpack_from(self._shm.buf, 0)
+
+    def _size(self):
+        put, got = self._counters()
+        return put - got
+
+    def _offset(self, position):
+        return self._COUNTERS.size + (position % self.maxsize) * self._record_size
+
+    def qsize(self):
+        with self._condition:
+            return self._size()
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def full(self):
+        return self.qsize() >= self.maxsize
+
+    def put(self, item, block=True, timeout=None):
+        record = b''.join(u.bytes for u in ((item,) if self.fields == 1 else item))
+        assert len(record) == self._record_size, "Expected {} uuids, got {}".format(self.fields, item)
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._size() < self.maxsize, timeout=timeout if block else 0):
+                raise Full()
+            put, got = self._counters()
+            offset = self._offset(put)
+            self._shm.buf[offset:offset + self._record_size] = record
+            self._COUNTERS.pack_into(self._shm.buf, 0, put + 1, got)
+            self._condition.notify_all()
+
+    def put_nowait(self, item):
+        self.put(item, block=False)
+
+    def get(self, block=True, timeout=None):
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._size() > 0, timeout=timeout if block else 0):
+                raise Empty()
+            put, got = self._counters()
+            offset = self._offset(got)
+            record = bytes(self._shm.buf[offset:offset + self._record_size])
+            self._COUNTERS.pack_into(self._shm.buf, 0, put, got + 1)
+            self._condition.notify_all()
+        item = tuple(uuid.UUID(bytes=record[i:i + _UUID_SIZE]) for i in range(0, self._record_size, _UUID_SIZE))
+        return item[0] if self.fields == 1 else item
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def close(self):
+        """
+        Unmaps the shared memory from the calling process.
+        """
+        self._shm.close()
+
+    def release(self):
+        """
+        Unmaps and frees the shared memory. Only the creating process should call this.
+        """
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _is_retriable(exc, attempt, max_retries):
+    """
+    @param attempt the number of times the failed request was already retried
+    """
+    if isinstance(exc, OperationTimedOut):
+        return attempt < max_retries
+    # Pstmnt id mismatch, retry. See CASSANDRA-15252/17140
+    return isinstance(exc, DriverException) and "ID mismatch while trying to reprepare" in str(exc)
+
+
+class ContinuousWriteVerifier(object):
+    """
+    Writes random rows and verifies them, continuously, from two threads of the test process.
+
+    Each thread keeps up to max_in_flight requests outstanding with execute_async.
+    A written row is queued for verification once its write succeeds; once verified it
+    becomes a candidate for being rewritten with a new value, with rewrite_probability
+    percent chance on every write, like the data_writer/data_checker processes.
+
+    Failures other than the retriable ones (timeouts, up to max_retries times for each
+    request, and prepared statement id mismatches) stop the load and are re-raised by
+    check().
+    """
+
+    def __init__(self, session, rewrite_probability=25, max_in_flight=128,
+                 consistency_level=ConsistencyLevel.QUORUM, max_retries=3, max_rewritable=500):
+        self.session = session
+        self.rewrite_probability = rewrite_probability
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+
+        self.write_statement = session.prepare("UPDATE cf SET v=? WHERE k=?")
+        self.write_statement.consistency_level = consistency_level
+        self.read_statement = session.prepare("SELECT v FROM cf WHERE k=?")
+        self.read_statement.consistency_level = consistency_level
+
+        self.ledger = UUIDLedger()
+        self.writes = 0
+        self.verifications = 0
+        self.error = None
+
+        self._lock = threading.Condition()
+        self._to_verify = deque()
+        self._rewritable = deque(maxlen=max_rewritable)
+        self._retries = deque()
+        self._writes_in_flight = 0
+        self._reads_in_flight = 0
+        self._writing = False
+        self._running = False
+        self._threads = []
+        self._started_at = None
+        self._stopped_at = None
+
+    def start(self):
+        self._started_at = time.time()
+        self._running = True
+        self._writing = True
+        for name, target in (('continuous_writer', self._write_loop), ('continuous_checker', self._verify_loop)):
+            thread = threading.Thread(name=name, target=target)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _fail(self, exc):
+        with self._lock:
+            if self.error is None:
+                logger.error("Continuous write/verify load failed", exc_info=exc)
+                self.error = exc
+            self._running = False
+            self._lock.notify_all()
+
+    def _handle_failure(self, exc, attempt, retry):
+        retriable = _is_retriable(exc, attempt, self.max_retries)
+        with self._lock:
+            if retriable:
+                # retried from the loop threads after a short pause, never from driver callbacks
+                self._retries.append((time.time() + 1, retry))
+        if not retriable:
+            self._fail(exc)
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: not self._running or not self._writing
+                                    or self._writes_in_flight < self.max_in_flight)
+                if not self._running or not self._writing:
+                    return
+                index = None
+                if self._rewritable and random.randint(0, 100) <= self.rewrite_probability:
+                    index = self._rewritable.popleft()
+                self._writes_in_flight += 1
+            self._write(index, self.ledger.key(index) if index is not None else uuid.uuid4())
+            self._drain_retries()
+
+    def _write(self, index, key, attempt=0):
+        value = uuid.uuid4()
+        future = self.session.execute_async(self.write_statement, (value, key))
+        future.add_callbacks(callback=self._write_done, callback_args=(index, key, value),
+                             errback=self._write_failed, errback_args=(index, key, attempt))
+
+    def _write_done(self, _, index, key, value):
+        with self._lock:
+            if index is None:
+                index = self.ledger.append(key, value)
+            else:
+                self.ledger.set_value(index, value)
+            self._to_verify.append(index)
+            self.writes += 1
+            self._writes_in_flight -= 1
+            self._lock.notify_all()
+
+    def _write_failed(self, exc, index, key, attempt):
+        self._handle_failure(exc, attempt, lambda: self._write(index, key, attempt + 1))
+
+    def _verify_loop(self):
+        while True:
+            with self._lock:
+                self._lock.wait_for(lambda: not self._running
+                                    or (self._retries and self._retries[0][0] <= time.time())
+                                    or (self._to_verify and self._reads_in_flight < self.max_in_flight),
+                                    timeout=0.25)
+                if not self._running:
+                    return
+                index = None
+                if self._to_verify and self._reads_in_flight < self.max_in_flight:
+                    index = self._to_verify.popleft()
+                    self._reads_in_flight += 1
+            if index is not None:
+                self._verify(index)
+            self._drain_retries()
+
+    def _verify(self, index, attempt=0):
+        future = self.session.execute_async(self.read_statement, (self.ledger.key(index),), timeout=30)
+        future.add_callbacks(callback=self._verify_done, callback_args=(index,),
+                             errback=self._verify_failed, errback_args=(index, attempt))
+
+    def _verify_done(self, rows, index):
+        expected = self.ledger.value(index)
+        actual = rows[0][0] if rows else None
+        if actual != expected:
+            self._fail(AssertionError("Data did not match expected value for key {}: expected {}, got {}".format(
+                self.ledger.key(index), expected, actual)))
+            return
+        with self._lock:
+            self._rewritable.append(index)
+            self.verifications += 1
+            self._reads_in_flight -= 1
+            self._lock.notify_all()
+
+    def _verify_failed(self, exc, index, attempt):
+        self._handle_failure(exc, attempt, lambda: self._verify(index, attempt + 1))
+
+    def _drain_retries(self):
+        now = time.time()
+        with self._lock:
+            due = []
+            while self._retries and self._retries[0][0] <= now:
+                due.append(self._retries.popleft()[1])
+        for retry in due:
+            retry()
+
+    def check(self):
+        """
+        Raises the error the load failed with, if any.
+        """
+        if self.error is not None:
+            raise self.error
+        writer, checker = self._threads
+        if self._running and not (checker.is_alive() and (writer.is_alive() or not self._writing)):
+            raise RuntimeError("A continuous load thread has terminated early")
+
+    def wait_for_writes(self, count, max_wait_s=600):
+        """
+        Blocks until at least count writes have succeeded.
+        """
+        self._wait_until(lambda: self.writes >= count, 'at least {} writes'.format(count), max_wait_s)
+
+    def stop_writes(self):
+        with self._lock:
+            self._writing = False
+            self._lock.notify_all()
+
+    def wait_for_verification(self, max_wait_s=1200):
+        """
+        Stops writing, then blocks until every successful write has been verified.
+        """
+        self.stop_writes()
+        self._wait_until(lambda: (self._writes_in_flight == 0 and not self._to_verify and self._reads_in_flight == 0
+                                  and not self._retries),
+                         'all writes to be verified', max_wait_s)
+
+    def _wait_until(self, condition, label, max_wait_s):
+        rate_limited_debug_logger = get_rate_limited_function(logger.debug, 30)
+        deadline = time.time() + max_wait_s
+        with self._lock:
+            while not condition():
+                self.check()
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise RuntimeError("Ran out of time waiting for {}. {}".format(label, self.stats()))
+                rate_limited_debug_logger("Waiting for {}: {}".format(label, self.stats()))
+                self._lock.wait(timeout=min(remaining, 1))
+        self.check()
+        logger.debug("Done waiting for {}: {}".format(label, self.stats()))
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            self._writing = False
+            self._lock.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=30)
+        self._stopped_at = self._stopped_at or time.time()
+
+    def stats(self):
+        elapsed = (self._stopped_at or time.time()) - self._started_at if self._started_at else 0
+        return {
+            'keys': len(self.ledger),
+            'writes': self.writes,
+            'verifications': self.verifications,
+            'pending_verification': len(self._to_verify),
+            'writes_per_s': self.writes / elapsed if elapsed > 0 else None,
+            'verifications_per_s': self.verifications / elapsed if elapsed > 0 else None,
+        }
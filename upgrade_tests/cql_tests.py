@@ -17,13 +17,8 @@ from cassandra.query import SimpleStatement
 from cassandra.util import sortedset
 
 from dtest import MAJOR_VERSION_4
-from thrift_bindings.thrift010.ttypes import \
-    ConsistencyLevel as ThriftConsistencyLevel
-from thrift_bindings.thrift010.ttypes import (CfDef, Column, ColumnDef,
-                                        ColumnOrSuperColumn, ColumnParent,
-                                        Deletion, Mutation, SlicePredicate,
-                                        SliceRange)
-from thrift_test import get_thrift_client
+from thrift_bindings.thrift010 import ttypes
+from tools.thrift_client import get_thrift_client
 from tools.assertions import (assert_all, assert_invalid, assert_length_equal,
                               assert_none, assert_one, assert_row_count)
 from tools.data import rows_to_list
@@ -1540,8 +1535,8 @@ class TestCQL(UpgradeTester):
             column_name = b'\x00\x04' + column_name_component + b'\x00' + b'\x00\x01' + 'v'.encode() + b'\x00'
             value = struct.pack('>i', 8)
             client.batch_mutate(
-                {key: {'test': [Mutation(ColumnOrSuperColumn(column=Column(name=column_name, value=value, timestamp=100)))]}},
-                ThriftConsistencyLevel.ONE)
+                {key: {'test': [ttypes.Mutation(ttypes.ColumnOrSuperColumn(column=ttypes.Column(name=column_name, value=value, timestamp=100)))]}},
+                ttypes.ConsistencyLevel.ONE)
 
             assert_one(cursor, "SELECT * FROM test", [2, 4, 8])
 
@@ -1561,8 +1556,8 @@ class TestCQL(UpgradeTester):
         client.set_keyspace('ks')
 
         # create a CF with mixed static and dynamic cols
-        column_defs = [ColumnDef('static1'.encode(), 'Int32Type', None, None, None)]
-        cfdef = CfDef(
+        column_defs = [ttypes.ColumnDef('static1'.encode(), 'Int32Type', None, None, None)]
+        cfdef = ttypes.CfDef(
             keyspace='ks',
             name='cf',
             column_type='Standard',
@@ -1596,19 +1591,19 @@ class TestCQL(UpgradeTester):
 
                 # insert "static" column
                 client.batch_mutate(
-                    {key: {'cf': [Mutation(ColumnOrSuperColumn(column=Column(name='static1'.encode(), value=struct.pack('>i', 1), timestamp=100)))]}},
-                    ThriftConsistencyLevel.ALL)
+                    {key: {'cf': [ttypes.Mutation(ttypes.ColumnOrSuperColumn(column=ttypes.Column(name='static1'.encode(), value=struct.pack('>i', 1), timestamp=100)))]}},
+                    ttypes.ConsistencyLevel.ALL)
 
                 # insert "dynamic" columns
                 for i, column_name in enumerate(('a', 'b', 'c', 'd', 'e')):
                     column_value = 'val{}'.format(i)
                     client.batch_mutate(
-                        {key: {'cf': [Mutation(ColumnOrSuperColumn(column=Column(name=column_name.encode(), value=column_value.encode(), timestamp=100)))]}},
-                        ThriftConsistencyLevel.ALL)
+                        {key: {'cf': [ttypes.Mutation(ttypes.ColumnOrSuperColumn(column=ttypes.Column(name=column_name.encode(), value=column_value.encode(), timestamp=100)))]}},
+                        ttypes.ConsistencyLevel.ALL)
 
                 # sanity check on the query
-                fetch_slice = SlicePredicate(slice_range=SliceRange(''.encode(), ''.encode(), False, 100))
-                row = client.get_slice(key, ColumnParent(column_family='cf'), fetch_slice, ThriftConsistencyLevel.ALL)
+                fetch_slice = ttypes.SlicePredicate(slice_range=ttypes.SliceRange(''.encode(), ''.encode(), False, 100))
+                row = client.get_slice(key, ttypes.ColumnParent(column_family='cf'), fetch_slice, ttypes.ConsistencyLevel.ALL)
                 assert 6 == len(row), row
                 cols = OrderedDict([(cosc.column.name.decode(), cosc.column.value) for cosc in row])
                 logger.debug(cols)
@@ -1618,13 +1613,13 @@ class TestCQL(UpgradeTester):
                 assert struct.pack('>i', 1) == cols['static1']
 
                 # delete a slice of dynamic columns
-                slice_range = SliceRange('b'.encode(), 'd'.encode(), False, 100)
+                slice_range = ttypes.SliceRange('b'.encode(), 'd'.encode(), False, 100)
                 client.batch_mutate(
-                    {key: {'cf': [Mutation(deletion=Deletion(timestamp=101, predicate=SlicePredicate(slice_range=slice_range)))]}},
-                    ThriftConsistencyLevel.ALL)
+                    {key: {'cf': [ttypes.Mutation(deletion=ttypes.Deletion(timestamp=101, predicate=ttypes.SlicePredicate(slice_range=slice_range)))]}},
+                    ttypes.ConsistencyLevel.ALL)
 
                 # check remaining columns
-                row = client.get_slice(key, ColumnParent(column_family='cf'), fetch_slice, ThriftConsistencyLevel.ALL)
+                row = client.get_slice(key, ttypes.ColumnParent(column_family='cf'), fetch_slice, ttypes.ConsistencyLevel.ALL)
                 assert 3 == len(row), row
                 cols = OrderedDict([(cosc.column.name.decode(), cosc.column.value) for cosc in row])
                 logger.debug(cols)
@@ -3025,7 +3020,7 @@ class TestCQL(UpgradeTester):
         client = get_thrift_client(host, port)
         client.transport.open()
 
-        cfdef = CfDef()
+        cfdef = ttypes.CfDef()
         cfdef.keyspace = 'ks'
         cfdef.name = 'test'
         cfdef.column_type = 'Standard'
@@ -10,13 +10,15 @@ import time
 import uuid
 
 from collections import defaultdict
-from multiprocessing import Process, Queue
+from multiprocessing import Process
 
 from cassandra import ConsistencyLevel, WriteTimeout
 from cassandra.query import SimpleStatement
 
 from dtest import Tester
 from tools.misc import generate_ssl_stores
+from . import build_cache
+from .continuous_load import SharedUUIDQueue
 from .upgrade_manifest import (build_downgrade_pairs,
                                CC4, CC5, HCD_1, HCD_2,
                                get_cluster_class)
@@ -78,7 +80,7 @@ class TestDowngrade(Tester):
             starting_meta.version, starting_meta.java_version))
         cluster = self.cluster
         self.reinit_cluster_for_family(starting_meta)
-        cluster.set_install_dir(version=starting_meta.version)
+        build_cache.set_install_dir(cluster, starting_meta)
         self.install_nodetool_legacy_parsing()
         self.fixture_dtest_setup.reinitialize_cluster_for_different_version()
         logger.debug("Versions to test (%s): %s" % (type(self), str([v.version for v in self.test_version_metas])))
@@ -162,7 +164,7 @@ class TestDowngrade(Tester):
                 logger.debug('Successfully downgraded %d of %d nodes to %s' %
                       (num + 1, len(self.cluster.nodelist()), target_meta.version))
 
-            self.cluster.set_install_dir(version=target_meta.version)
+            build_cache.set_install_dir(self.cluster, target_meta)
             self.install_nodetool_legacy_parsing()
             self.fixture_dtest_setup.reinitialize_cluster_for_different_version()
 
@@ -180,7 +182,7 @@ class TestDowngrade(Tester):
 
             target_meta = self.test_version_metas[1]
             self.downgrade_to_version(target_meta, internode_ssl=internode_ssl)
-            self.cluster.set_install_dir(version=target_meta.version)
+            build_cache.set_install_dir(self.cluster, target_meta)
             self.install_nodetool_legacy_parsing()
             self.fixture_dtest_setup.reinitialize_cluster_for_different_version()
 
@@ -224,7 +226,7 @@ class TestDowngrade(Tester):
                 new_conf = node.get_conf_dir()
                 if old_conf != new_conf and os.path.exists(old_conf) and not os.path.exists(new_conf):
                     shutil.copytree(old_conf, new_conf)
-            node.set_install_dir(version=version_meta.version)
+            build_cache.set_install_dir(node, version_meta)
             self.install_legacy_parsing(node)
             logger.debug("Set new cassandra dir for %s: %s" % (node.name, node.get_install_dir()))
 
@@ -271,6 +273,10 @@ class TestDowngrade(Tester):
                 except Exception:
                     logger.debug("Error terminating subprocess. There could be a lingering process.")
                     pass
+        # the queues are only shared with the subprocesses, so they can be freed once those are gone
+        for q in getattr(self, '_shared_queues', []):
+            q.release()
+        self._shared_queues = []
 
     def _log_current_ver(self, current_version_meta):
         vers = [m.version for m in self.test_version_metas]
@@ -355,8 +361,9 @@ class TestDowngrade(Tester):
             raise RuntimeError("Ran out of time waiting for queue size ({}) to be '{}' to {}. Aborting.".format(qsize, opfunc.__name__, required_len))
 
     def _start_continuous_write_and_verify(self, wait_for_rowcount=0, max_wait_s=600):
-        to_verify_queue = Queue(10000)
-        verification_done_queue = Queue(maxsize=500)
+        to_verify_queue = SharedUUIDQueue(10000, fields=2)
+        verification_done_queue = SharedUUIDQueue(500)
+        self._shared_queues = [to_verify_queue, verification_done_queue]
 
         writer = Process(name="data_writer", target=data_writer, args=(self, to_verify_queue, verification_done_queue, 25))
         writer.daemon = True
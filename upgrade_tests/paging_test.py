@@ -15,7 +15,7 @@ from tools.assertions import (assert_read_timeout_or_failure, assert_lists_equal
 from tools.data import rows_to_list
 from tools.datahelp import create_rows, flatten_into_set, parse_data_into_dicts
 from tools.misc import add_skip
-from tools.paging import PageAssertionMixin, PageFetcher
+from tools.paging import PageAssertionMixin, PageFetcher, PrefetchingPageFetcher
 from .upgrade_base import UpgradeTester
 from .upgrade_manifest import build_upgrade_pairs, RUN_STATIC_UPGRADE_MATRIX
 
@@ -117,7 +117,7 @@ class TestPagingSize(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test", fetch_size=5, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             assert pf.pagecount() == 2
             assert pf.num_results_all() == [5, 4]
@@ -147,7 +147,7 @@ class TestPagingSize(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test", fetch_size=5, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             assert pf.num_results_all() == [5]
             assert pf.pagecount() == 1
@@ -179,7 +179,7 @@ class TestPagingSize(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test", consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             assert pf.num_results_all(), [5000 == 1]
 
@@ -232,7 +232,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test where id = 1 order by value asc", fetch_size=5, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             assert pf.pagecount() == 2
             assert pf.num_results_all() == [5, 5]
@@ -285,7 +285,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test where id = 1 order by value asc", fetch_size=3, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             print("pages:", pf.num_results_all())
             assert pf.pagecount() == 4
@@ -299,7 +299,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test where id = 1", fetch_size=3, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             assert pf.pagecount() == 4
             assert pf.num_results_all(), [3, 3, 3 == 1]
@@ -383,7 +383,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
                     # this should not happen
                     self.fail("Invalid configuration, this should never happen, please go into the code")
 
-                pf = PageFetcher(future).request_all()
+                pf = PrefetchingPageFetcher(future).request_all()
                 assert pf.num_results_all() == scenario['expect_pgsizes']
                 assert pf.pagecount() == scenario['expect_pgcount']
 
@@ -418,7 +418,7 @@ class TestPagingWithModifiers(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test where value = 'and more testing' ALLOW FILTERING", fetch_size=4, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             assert pf.pagecount() == 2
             assert pf.num_results_all() == [4, 3]
@@ -568,7 +568,7 @@ class TestPagingData(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test where id = 1", fetch_size=3000, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             assert pf.pagecount() == 4
             assert pf.num_results_all(), [3000, 3000, 3000 == 1000]
@@ -600,7 +600,7 @@ class TestPagingData(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test where id in (1,2)", fetch_size=3000, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             assert pf.pagecount() == 4
             assert pf.num_results_all(), [3000, 3000, 3000 == 1000]
@@ -638,7 +638,7 @@ class TestPagingData(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test where mybool = true", fetch_size=400, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             # the query only searched for True rows, so let's pare down the expectations for comparison
             expected_data = [x for x in all_data if x.get('mybool') is True]
@@ -905,7 +905,7 @@ class TestPagingData(BasePagingTester, PageAssertionMixin):
                 SimpleStatement("select * from paging_test where mybool = true", fetch_size=400, consistency_level=CL.ALL)
             )
 
-            pf = PageFetcher(future).request_all()
+            pf = PrefetchingPageFetcher(future).request_all()
 
             # the query only searched for True rows, so let's pare down the expectations for comparison
             expected_data = [x for x in all_data if x.get('mybool') is True]
@@ -5,10 +5,11 @@ import logging
 
 from dtest import Tester, MAJOR_VERSION_4, MAJOR_VERSION_5
 from sstable_generation_loading_test import BaseSStableLoaderTester
-from thrift_bindings.thrift010.Cassandra import (ConsistencyLevel, Deletion,
-                                           Mutation, SlicePredicate,
-                                           SliceRange)
-from thrift_test import composite, get_thrift_client, i32
+from thrift_bindings.thrift010.ttypes import (ConsistencyLevel, Deletion,
+                                              Mutation, SlicePredicate,
+                                              SliceRange)
+from thrift_test import composite, i32
+from tools.thrift_client import get_thrift_client
 from tools.assertions import (assert_all, assert_length_equal, assert_none,
                               assert_one)
 from tools.misc import new_node
@@ -6,11 +6,12 @@ from cassandra.query import dict_factory, SimpleStatement
 
 from dtest import Tester
 from thrift_bindings.thrift010 import Cassandra
-from thrift_bindings.thrift010.Cassandra import (Column, ColumnDef,
-                                                 ColumnParent, ConsistencyLevel,
-                                                 IndexType,
-                                                 SlicePredicate, SliceRange)
-from thrift_test import _i64, get_thrift_client
+from thrift_bindings.thrift010.ttypes import (Column, ColumnDef,
+                                              ColumnParent, ConsistencyLevel,
+                                              IndexType,
+                                              SlicePredicate, SliceRange)
+from thrift_test import _i64
+from tools.thrift_client import get_thrift_client
 from tools.assertions import (assert_all, assert_length_equal,
                               assert_lists_of_dicts_equal)
 from tools.misc import wait_for_agreement, add_skip
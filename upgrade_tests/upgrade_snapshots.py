@@ -0,0 +1,160 @@
+"""
+Snapshots of upgrade test clusters, so that upgrade paths sharing a prefix of
+versions only run the shared upgrade steps once.
+
+Upgrade paths form a DAG (a tree, really) of version prefixes: the multi-version
+paths for protocols v3 and v4 go through the same versions, and every upgrade
+pair from a given version starts with the same cluster. With
+`--share-upgrade-prefixes`, the parallel upgrade scenario saves the cluster
+(every node's data, commitlog, hints and saved caches) and the ledger of what it
+wrote each time its nodes are drained and stopped to move to the next version.
+A later test whose path starts with the same versions then restores the longest
+saved prefix and carries on from there, instead of starting at the first version.
+
+Snapshots are keyed by the resolved versions (see build_cache.resolve_version),
+so that a snapshot taken on a branch commit isn't reused once the branch moves on.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from . import build_cache
+
+logger = logging.getLogger(__name__)
+
+_LEDGER = 'ledger.json'
+# node files which describe the node to ccm rather than hold its state
+_IGNORED_NODE_FILES = ('logs', 'node.conf', 'node.log')
+
+
+def upgrade_path_of(item):
+    """
+    @return the tuple of version names a collected test upgrades through, or None
+            if it is not a generated upgrade test
+    """
+    version_metas = getattr(item.cls, 'test_version_metas', None) if item.cls else None
+    if not version_metas:
+        return None
+    return tuple(meta.name for meta in version_metas)
+
+
+def upgrade_dag_order(items):
+    """
+    Orders collected upgrade tests depth first through the DAG of their upgrade paths,
+    so that tests sharing a prefix run one after the other while its snapshot is fresh.
+    Other tests keep their relative order, after the upgrade tests.
+
+    @return the number of upgrade steps of the ordered tests, and how many of those are
+            distinct prefixes, i.e. need to be run when prefixes are shared
+    """
+    paths = {id(item): upgrade_path_of(item) for item in items}
+    upgrade_items = [item for item in items if paths[id(item)]]
+    other_items = [item for item in items if not paths[id(item)]]
+    # sorting the paths lexicographically is a depth first walk of the prefix tree
+    upgrade_items.sort(key=lambda item: (paths[id(item)], item.name))
+    items[:] = upgrade_items + other_items
+
+    total_steps = 0
+    prefixes = set()
+    for item in upgrade_items:
+        path = paths[id(item)]
+        total_steps += len(path) - 1
+        prefixes.update(path[:i + 1] for i in range(1, len(path)))
+    return total_steps, len(prefixes)
+
+
+class UpgradeSnapshotStore(object):
+    """
+    A directory of cluster snapshots, one per scenario and version prefix.
+
+    @param root the snapshot directory, shared by every worker on the host
+    @param max_age_s snapshots older than this are removed when new ones are saved
+    """
+
+    def __init__(self, root=None, max_age_s=7 * 24 * 60 * 60):
+        self.root = root or os.environ.get('DTEST_UPGRADE_SNAPSHOT_DIR',
+                                           os.path.join(os.path.expanduser('~'), '.ccm', 'dtest_upgrade_snapshots'))
+        self.max_age_s = max_age_s
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def key(scenario, extra_config, version_metas):
+        """
+        @return the key of the cluster state reached by running scenario through the
+                given versions, or None if one of them can not be pinned to fixed content
+        """
+        resolved = [build_cache.resolve_version(meta.version) for meta in version_metas]
+        if None in resolved:
+            return None
+        return hashlib.sha256(repr((scenario, tuple(extra_config or ()), tuple(resolved))).encode('utf-8')).hexdigest()[:24]
+
+    def _snapshot_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def has(self, key):
+        return key is not None and os.path.exists(os.path.join(self._snapshot_dir(key), _LEDGER))
+
+    def save(self, key, cluster, row_values, expected_counts):
+        """
+        Saves the state of every (stopped) node of the cluster and the ledger of what was
+        written to it, unless a snapshot with this key already exists.
+        """
+        if key is None:
+            return
+        snapshot_dir = self._snapshot_dir(key)
+        with build_cache._file_lock(snapshot_dir + '.lock'):
+            if self.has(key):
+                return
+            start = time.time()
+            staging_dir = snapshot_dir + '.tmp'
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            for node in cluster.nodelist():
+                shutil.copytree(node.get_path(), os.path.join(staging_dir, node.name), symlinks=True,
+                                ignore=shutil.ignore_patterns(*_IGNORED_NODE_FILES))
+            ledger = {'row_values': sorted(row_values),
+                      'expected_counts': {str(k1): counts for k1, counts in expected_counts.items()},
+                      'nodes': [node.name for node in cluster.nodelist()]}
+            with open(os.path.join(staging_dir, _LEDGER), 'w') as f:
+                json.dump(ledger, f)
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
+            os.rename(staging_dir, snapshot_dir)
+            logger.info("Saved upgrade snapshot {} in {:.0f}s".format(key, time.time() - start))
+        self._remove_expired()
+
+    def restore(self, key, cluster):
+        """
+        Restores a snapshot onto the nodes of a freshly populated (not started) cluster
+        with the same node names.
+
+        @return the (row_values, expected_counts) ledger saved with the snapshot
+        """
+        snapshot_dir = self._snapshot_dir(key)
+        with open(os.path.join(snapshot_dir, _LEDGER)) as f:
+            ledger = json.load(f)
+        node_names = [node.name for node in cluster.nodelist()]
+        assert node_names == ledger['nodes'], \
+            "Snapshot {} is of nodes {}, the cluster has {}".format(key, ledger['nodes'], node_names)
+        for node in cluster.nodelist():
+            shutil.copytree(os.path.join(snapshot_dir, node.name), node.get_path(), symlinks=True, dirs_exist_ok=True)
+        # touched so that snapshots which keep being used don't expire
+        os.utime(os.path.join(snapshot_dir, _LEDGER))
+        logger.info("Restored upgrade snapshot {}".format(key))
+
+        row_values = set(ledger['row_values'])
+        expected_counts = {uuid.UUID(k1): {int(k2): count for k2, count in counts.items()}
+                           for k1, counts in ledger['expected_counts'].items()}
+        return row_values, expected_counts
+
+    def _remove_expired(self):
+        now = time.time()
+        for name in os.listdir(self.root):
+            ledger_path = os.path.join(self.root, name, _LEDGER)
+            if '.' not in name and os.path.exists(ledger_path) and now - os.path.getmtime(ledger_path) > self.max_age_s:
+                with build_cache._file_lock(self._snapshot_dir(name) + '.lock'):
+                    logger.debug("Removing expired upgrade snapshot {}".format(name))
+                    os.remove(ledger_path)
+                    shutil.rmtree(self._snapshot_dir(name), ignore_errors=True)
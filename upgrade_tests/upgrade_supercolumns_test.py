@@ -5,20 +5,20 @@ import pytest
 import logging
 
 from dtest import Tester
-from thrift_test import get_thrift_client
+from tools.thrift_client import get_thrift_client
 from tools.assertions import assert_all
 
-from thrift_bindings.thrift010.Cassandra import (CfDef, Column, ColumnDef,
-                                           ColumnOrSuperColumn, ColumnParent,
-                                           ColumnPath, ColumnSlice,
-                                           ConsistencyLevel, CounterColumn,
-                                           Deletion, IndexExpression,
-                                           IndexOperator, IndexType,
-                                           InvalidRequestException, KeyRange,
-                                           KeySlice, KsDef, MultiSliceRequest,
-                                           Mutation, NotFoundException,
-                                           SlicePredicate, SliceRange,
-                                           SuperColumn)
+from thrift_bindings.thrift010.ttypes import (CfDef, Column, ColumnDef,
+                                              ColumnOrSuperColumn, ColumnParent,
+                                              ColumnPath, ColumnSlice,
+                                              ConsistencyLevel, CounterColumn,
+                                              Deletion, IndexExpression,
+                                              IndexOperator, IndexType,
+                                              InvalidRequestException, KeyRange,
+                                              KeySlice, KsDef, MultiSliceRequest,
+                                              Mutation, NotFoundException,
+                                              SlicePredicate, SliceRange,
+                                              SuperColumn)
 from upgrade_tests.upgrade_manifest import indev_2_2_x, indev_3_0_x, indev_3_11_x, indev_4_0_x, indev_4_1_x, \
     CASSANDRA_4_0
 
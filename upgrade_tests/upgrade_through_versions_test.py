@@ -13,6 +13,7 @@ import time
 import uuid
 
 from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Process, Queue
 from queue import Empty, Full
 
@@ -21,6 +22,10 @@ from cassandra.query import SimpleStatement
 
 from dtest import Tester
 from tools.misc import generate_ssl_stores, new_node
+from tools.token_ranges import TokenRangeVerifier, plan_rolling_batches
+from . import build_cache
+from .continuous_load import ContinuousWriteVerifier
+from .upgrade_snapshots import UpgradeSnapshotStore
 from .upgrade_manifest import (build_upgrade_pairs, jdk_compatible_steps, current_2_2_x,
                                current_3_0_x, current_3_11_x,
                                current_4_0_x, current_4_1_x, current_5_0_x,
@@ -140,13 +145,11 @@ def data_checker(tester, to_verify_queue, verification_done_queue):
     timeout_retries = 0
     while running:
         try:
-            # here we could block, but if the writer process terminates early with an empty queue
-            # we would end up blocking indefinitely
-            (key, expected_val) = to_verify_queue.get_nowait()
+            # don't block indefinitely, the writer process may have terminated early with an empty queue
+            (key, expected_val) = to_verify_queue.get(timeout=1)
 
             actual_val = session.execute(prepared, (key,), timeout=30)[0][0]
         except Empty:
-            time.sleep(1)  # let's not eat CPU if the queue is empty
             logger.info("to_verify_queue is empty: %d" % to_verify_queue.qsize())
             continue
         except DriverException as dex:
@@ -340,6 +343,7 @@ class TestUpgrade(Tester):
     test_version_metas = None  # set on init to know which versions to use
     subprocs = None  # holds any subprocesses, for status checking and cleanup
     extra_config = None  # holds a non-mutable structure that can be cast as dict()
+    rolling_upgrade_batch_size = None  # overrides --rolling-upgrade-batch-size, see _rolling_upgrade_batches
 
     @pytest.fixture(autouse=True)
     def fixture_add_additional_log_patterns(self, fixture_dtest_setup):
@@ -383,7 +387,7 @@ class TestUpgrade(Tester):
               .format(self.test_version_metas[0].version, self.test_version_metas[0].java_version))
         cluster = self.cluster
         self.reinit_cluster_for_family(self.test_version_metas[0])
-        cluster.set_install_dir(version=self.test_version_metas[0].version)
+        build_cache.set_install_dir(cluster, self.test_version_metas[0])
         self.install_nodetool_legacy_parsing()
         self.fixture_dtest_setup.reinitialize_cluster_for_different_version()
         logger.debug("Versions to test (%s): %s" % (type(self), str([v.version for v in self.test_version_metas])))
@@ -427,13 +431,9 @@ class TestUpgrade(Tester):
         """
         self.upgrade_scenario(rolling=True, internode_ssl=True)
 
-    def upgrade_scenario(self, populate=True, create_schema=True, rolling=False, after_upgrade_call=(), internode_ssl=False):
-        # Record the rows we write as we go:
-        if populate:
-            self.prepare()
-        self.row_values = set()
+    def _enable_user_defined_functions(self, version_meta):
         cluster = self.cluster
-        is_cc = self.test_version_metas[0].family in CC_FAMILIES
+        is_cc = version_meta.family in CC_FAMILIES
         if is_cc:
             pass  # CC removed all UDF config options
         elif cluster.version() >= '5.0':
@@ -445,6 +445,17 @@ class TestUpgrade(Tester):
         elif cluster.version() >= '2.2':
             cluster.set_configuration_options({'enable_user_defined_functions': 'true'})
 
+    def upgrade_scenario(self, populate=True, create_schema=True, rolling=False, after_upgrade_call=(), internode_ssl=False):
+        if populate and create_schema and not rolling and not internode_ssl and self.dtest_config.share_upgrade_prefixes:
+            return self._shared_prefix_upgrade_scenario(after_upgrade_call)
+
+        # Record the rows we write as we go:
+        if populate:
+            self.prepare()
+        self.row_values = set()
+        cluster = self.cluster
+        self._enable_user_defined_functions(self.test_version_metas[0])
+
         if internode_ssl:
             logger.debug("***using internode ssl***")
             generate_ssl_stores(self.fixture_dtest_setup.test_path)
@@ -474,63 +485,133 @@ class TestUpgrade(Tester):
         self._log_current_ver(self.test_version_metas[0])
 
         if rolling:
-            # start up processes to write and verify data
-            write_proc, verify_proc, verification_queue = self._start_continuous_write_and_verify(wait_for_rowcount=5000)
-
+            # start up a load to write and verify data
+            load = self._start_continuous_write_and_verify(wait_for_rowcount=5000)
+            try:
+                batches = self._rolling_upgrade_batches()
+                # upgrade through versions
+                for version_meta in self.test_version_metas[1:]:
+
+                    upgraded = 0
+                    for batch in batches:
+                        # sleep (sigh) because driver needs extra time to keep up with topo and make quorum possible
+                        # this is ok, because a real world upgrade would proceed much slower than this programmatic one
+                        # additionally this should provide more time for timeouts and other issues to crop up as well, which we could
+                        # possibly "speed past" in an overly fast upgrade test
+                        time.sleep(60)
+
+                        self.upgrade_to_version(version_meta, partial=True, nodes=batch, internode_ssl=internode_ssl)
+
+                        load.check()
+                        upgraded += len(batch)
+                        logger.debug('Successfully upgraded %d of %d nodes to %s (load: %s)' %
+                                     (upgraded, len(self.cluster.nodelist()), version_meta.version, load.stats()))
+                    self._set_cluster_version(version_meta)
+
+                # stop writing and wait for every write to be verified before continuing
+                load.wait_for_verification(max_wait_s=1200)
+            finally:
+                load.stop()
+            logger.info("Continuous write/verify load: {}".format(load.stats()))
+        # not a rolling upgrade, do everything in parallel:
+        else:
             # upgrade through versions
             for version_meta in self.test_version_metas[1:]:
+                self._parallel_upgrade_step(version_meta, internode_ssl=internode_ssl)
 
-                for num, node in enumerate(self.cluster.nodelist()):
-                    # sleep (sigh) because driver needs extra time to keep up with topo and make quorum possible
-                    # this is ok, because a real world upgrade would proceed much slower than this programmatic one
-                    # additionally this should provide more time for timeouts and other issues to crop up as well, which we could
-                    # possibly "speed past" in an overly fast upgrade test
-                    time.sleep(60)
-
-                    self.upgrade_to_version(version_meta, partial=True, nodes=(node,), internode_ssl=internode_ssl)
-
-                    logger.debug(str(self.fixture_dtest_setup.subprocs))
-                    self._check_on_subprocs(self.fixture_dtest_setup.subprocs)
-                    logger.debug('Successfully upgraded %d of %d nodes to %s' %
-                          (num + 1, len(self.cluster.nodelist()), version_meta.version))
-                self.cluster.set_install_dir(version=version_meta.version)
-                self.install_nodetool_legacy_parsing()
-                self.fixture_dtest_setup.reinitialize_cluster_for_different_version()
-
-            # Stop write processes
-            write_proc.terminate()
-            # wait for the verification queue's to empty (and check all rows) before continuing
-            self._check_on_subprocs([verify_proc])  # make sure the verification processes are running still
-            self._wait_until_queue_condition('writes pending verification', verification_queue, operator.le, 0, max_wait_s=1200)
-            self._check_on_subprocs([verify_proc])  # make sure the verification processes are running still
+        self._finish_upgrade_scenario(after_upgrade_call)
 
-            self._terminate_subprocs()
-        # not a rolling upgrade, do everything in parallel:
+    def _shared_prefix_upgrade_scenario(self, after_upgrade_call=()):
+        """
+        The parallel upgrade scenario, resumed from the longest upgrade snapshot of a prefix
+        of this test's versions (see upgrade_snapshots), and saving a snapshot at every version
+        it goes through for tests which share a longer prefix.
+
+        snapshot_keys[i] is the state with every node drained and stopped at version i, after
+        the writes which are checked once it is upgraded to version i + 1.
+        """
+        self.prepare()
+        version_metas = self.test_version_metas
+        snapshots = UpgradeSnapshotStore()
+        snapshot_keys = [snapshots.key('parallel', self.extra_config, version_metas[:i + 1])
+                         for i in range(len(version_metas) - 1)]
+        resume_index = max((i for i, key in enumerate(snapshot_keys) if snapshots.has(key)), default=None)
+        cluster = self.cluster
+        # cluster wide options carry over through upgrades, so they are those of the first version either way
+        self._enable_user_defined_functions(version_metas[0])
+
+        if resume_index is None:
+            self.row_values = set()
+            logger.debug('Creating cluster (%s)' % version_metas[0].version)
+            cluster.populate(3)
+            [node.start(use_jna=True, wait_for_binary_proto=True) for node in cluster.nodelist()]
+            for i, node in enumerate(cluster.nodelist(), 1):
+                setattr(self, 'node' + str(i), node)
+            self._create_schema()
+            stopped = False
         else:
-            # upgrade through versions
-            for version_meta in self.test_version_metas[1:]:
-                self._write_values()
-                self._increment_counters()
+            resume_meta = version_metas[resume_index]
+            logger.debug('Resuming from the upgrade snapshot at %s' % resume_meta.version)
+            self.reinit_cluster_for_family(resume_meta)
+            self._set_cluster_version(resume_meta)
+            cluster.populate(3)
+            for i, node in enumerate(cluster.nodelist(), 1):
+                setattr(self, 'node' + str(i), node)
+            self.row_values, self.expected_counts = snapshots.restore(snapshot_keys[resume_index], cluster)
+            stopped = True
+
+        for index in range((resume_index or 0) + 1, len(version_metas)):
+            self._log_current_ver(version_metas[index - 1])
+
+            def save_snapshot(key=snapshot_keys[index - 1]):
+                snapshots.save(key, cluster, self.row_values, self.expected_counts)
+
+            self._parallel_upgrade_step(version_metas[index], stopped=stopped,
+                                        on_stopped=None if stopped else save_snapshot)
+            stopped = False
+
+        self._finish_upgrade_scenario(after_upgrade_call)
+
+    def _set_cluster_version(self, version_meta):
+        """
+        Points the cluster at version_meta once its nodes run it.
+        """
+        build_cache.set_install_dir(self.cluster, version_meta)
+        self.install_nodetool_legacy_parsing()
+        self.fixture_dtest_setup.reinitialize_cluster_for_different_version()
+
+    def _parallel_upgrade_step(self, version_meta, internode_ssl=False, stopped=False, on_stopped=None):
+        """
+        Writes values and increments counters, unless the nodes are already stopped (see
+        upgrade_to_version), upgrades every node to version_meta at once, and checks that
+        everything written so far reads back.
+        """
+        if not stopped:
+            self._write_values()
+            self._increment_counters()
 
-                self.upgrade_to_version(version_meta, internode_ssl=internode_ssl)
-                self.cluster.set_install_dir(version=version_meta.version)
-                self.install_nodetool_legacy_parsing()
-                self.fixture_dtest_setup.reinitialize_cluster_for_different_version()
+        self.upgrade_to_version(version_meta, internode_ssl=internode_ssl, stopped=stopped, on_stopped=on_stopped)
+        self._set_cluster_version(version_meta)
 
-                self._check_values()
-                self._check_counters()
-                self._check_select_count()
+        self._check_values()
+        self._check_counters()
+        self._check_select_count()
 
+    def _finish_upgrade_scenario(self, after_upgrade_call=()):
+        """
+        Runs the custom post-upgrade callables once every node runs the last version, and
+        stops the cluster.
+        """
+        version_meta = self.test_version_metas[-1]
         if self.cluster.version() >= '5.1':
             self.cluster.nodelist()[0].nodetool("cms initialize")
-        # run custom post-upgrade callables
         for call in after_upgrade_call:
             call()
 
-            logger.debug('All nodes successfully upgraded to %s' % version_meta.version)
-            self._log_current_ver(version_meta)
+        logger.debug('All nodes successfully upgraded to %s' % version_meta.version)
+        self._log_current_ver(version_meta)
 
-        cluster.stop()
+        self.cluster.stop()
 
     def tearDown(self):
         # just to be super sure we get cleaned up
@@ -562,23 +643,43 @@ class TestUpgrade(Tester):
                     logger.debug("Error terminating subprocess. There could be a lingering process.")
                     pass
 
-    def upgrade_to_version(self, version_meta, partial=False, nodes=None, internode_ssl=False):
+    def upgrade_to_version(self, version_meta, partial=False, nodes=None, internode_ssl=False, stopped=False, on_stopped=None):
         """
         Upgrade Nodes - if *partial* is True, only upgrade those nodes
         that are specified by *nodes*, otherwise ignore *nodes* specified
         and upgrade all nodes.
+
+        If *stopped* is True the nodes are already drained and stopped, e.g. restored from
+        an upgrade snapshot. *on_stopped* is called once the nodes are stopped, before their
+        version changes.
+
+        Nodes are stopped and restarted one after the other, except for a batch of several
+        *nodes* of a rolling upgrade (see _rolling_upgrade_batches), which is stopped and
+        restarted all at once.
         """
         logger.debug('Upgrading {nodes} to {version}'.format(nodes=[n.name for n in nodes] if nodes is not None else 'all nodes', version=version_meta.version))
         logger.debug("JAVA_HOME: " + os.environ.get('JAVA_HOME'))
         if not partial:
             nodes = self.cluster.nodelist()
 
+        batched = partial and len(nodes) > 1
+
         self.install_nodetool_legacy_parsing()
-        for node in nodes:
-            logger.debug('Shutting down node: ' + node.name)
-            node.drain()
-            node.watch_log_for("DRAINED")
-            node.stop(wait_other_notice=False)
+        if not stopped:
+            def drain_and_stop(node):
+                logger.debug('Shutting down node: ' + node.name)
+                node.drain()
+                node.watch_log_for("DRAINED")
+                node.stop(wait_other_notice=False)
+
+            if batched:
+                with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+                    list(executor.map(drain_and_stop, nodes))
+            else:
+                for node in nodes:
+                    drain_and_stop(node)
+        if on_stopped is not None:
+            on_stopped()
 
         family_changed = self.reinit_cluster_for_family(version_meta)
         for node in nodes:
@@ -588,7 +689,7 @@ class TestUpgrade(Tester):
                 new_conf = node.get_conf_dir()
                 if old_conf != new_conf and os.path.exists(old_conf) and not os.path.exists(new_conf):
                     shutil.copytree(old_conf, new_conf)
-            node.set_install_dir(version=version_meta.version)
+            build_cache.set_install_dir(node, version_meta)
             self.install_legacy_parsing(node)
             logger.debug("Set new cassandra dir for %s: %s" % (node.name, node.get_install_dir()))
             if internode_ssl and (LooseVersion(version_meta.family) >= CASSANDRA_4_0):
@@ -603,6 +704,10 @@ class TestUpgrade(Tester):
         # otherwise they won't be grouped into dc's properly for multi-dc tests
         self.cluster._Cluster__update_topology_files()
 
+        if batched:
+            self._restart_batch(nodes, version_meta)
+            return
+
         # Restart nodes on new version
         for node in nodes:
             logger.debug('Starting %s on new version (%s)' % (node.name, version_meta.version))
@@ -612,6 +717,58 @@ class TestUpgrade(Tester):
                        jvm_args=['-Dcassandra.disable_max_protocol_auto_override=true'])  # prevent protocol capping in mixed version clusters
             node.nodetool('upgradesstables -a')
 
+    def _restart_batch(self, nodes, version_meta):
+        """
+        Restarts a batch of stopped nodes on their new version all at once, then waits for
+        the whole batch to be seen as up and upgrades their sstables concurrently.
+        """
+        live_nodes = [node for node in self.cluster.nodelist() if node not in nodes and node.is_live()]
+        marks = [(node, node.mark_log()) for node in live_nodes]
+        for node in nodes:
+            logger.debug('Starting %s on new version (%s)' % (node.name, version_meta.version))
+            # Setup log4j / logback again (necessary moving from 2.0 -> 2.1):
+            node.set_log_level("INFO")
+            node.start(wait_other_notice=False, wait_for_binary_proto=False,
+                       jvm_args=['-Dcassandra.disable_max_protocol_auto_override=true'])  # prevent protocol capping in mixed version clusters
+        for node in nodes:
+            node.wait_for_binary_interface(from_mark=node.mark)
+        for node, mark in marks:
+            node.watch_log_for_alive(list(nodes), from_mark=mark, timeout=400)
+        for node in nodes:
+            node.watch_log_for_alive([other for other in nodes if other is not node], from_mark=node.mark, timeout=400)
+
+        with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
+            list(executor.map(lambda node: node.nodetool('upgradesstables -a'), nodes))
+
+    def _rolling_upgrade_batches(self, keyspace='upgrade'):
+        """
+        Splits the cluster into the batches of nodes a rolling upgrade restarts together,
+        of up to rolling_upgrade_batch_size (or --rolling-upgrade-batch-size) nodes each.
+
+        Nodes of the same rack are batched together first, and a batch never holds more
+        replicas of any token range of the keyspace than QUORUM can do without.
+        """
+        nodes = self.cluster.nodelist()
+        batch_size = self.rolling_upgrade_batch_size or self.dtest_config.rolling_upgrade_batch_size
+        if batch_size <= 1:
+            return [[node] for node in nodes]
+
+        session = self.patient_cql_connection(nodes[0], protocol_version=self.protocol_version)
+        metadata = session.cluster.metadata
+        hosts = {host.address: host for host in metadata.all_hosts()}
+        replica_sets = [frozenset(host.address for host in metadata.token_map.get_replicas(keyspace, token))
+                        for token in metadata.token_map.ring]
+        session.cluster.shutdown()
+
+        def rack_of(node):
+            host = hosts.get(node.address())
+            return (host.datacenter, host.rack) if host is not None else (None, None)
+
+        batches = plan_rolling_batches([(node, node.address(), rack_of(node)) for node in nodes], replica_sets,
+                                       batch_size)
+        logger.debug("Rolling upgrade batches: {}".format([[node.name for node in batch] for batch in batches]))
+        return batches
+
     def _log_current_ver(self, current_version_meta):
         """
         Logs where we currently are in the upgrade path, surrounding the current branch/tag, like ***sometag***
@@ -669,15 +826,12 @@ class TestUpgrade(Tester):
             self.row_values.add(x)
 
     def _check_values(self, consistency_level=ConsistencyLevel.ALL):
+        expected_rows = [(x, str(x)) for x in self.row_values]
         for node in self.cluster.nodelist():
             session = self.patient_cql_connection(node, protocol_version=self.protocol_version)
-            session.execute("use upgrade")
-            for x in self.row_values:
-                query = SimpleStatement("SELECT k,v FROM cf WHERE k=%d" % x, consistency_level=consistency_level)
-                result = session.execute(query)
-                k, v = result[0]
-                assert x == k
-                assert str(x) == v
+            verifier = TokenRangeVerifier(session, 'upgrade', 'cf', columns=('k', 'v'),
+                                          consistency_level=consistency_level)
+            verifier.verify(expected_rows)
 
     def _wait_until_queue_condition(self, label, queue, opfunc, required_len, max_wait_s=600):
         """
@@ -711,34 +865,24 @@ class TestUpgrade(Tester):
 
     def _start_continuous_write_and_verify(self, wait_for_rowcount=0, max_wait_s=600):
         """
-        Starts a writer process, a verifier process, a queue to track writes,
-        and a queue to track successful verifications (which are rewrite candidates).
+        Starts a ContinuousWriteVerifier, which writes rows and verifies them from
+        this process with a bounded number of asynchronous requests in flight.
 
         wait_for_rowcount provides a number of rows to write before unblocking and continuing.
 
-        Returns the writer process, verifier process, and the to_verify_queue.
+        Returns the started ContinuousWriteVerifier.
         """
-        # queue of writes to be verified
-        to_verify_queue = Queue(10000)
-        # queue of verified writes, which are update candidates
-        verification_done_queue = Queue(maxsize=500)
-
-        writer = Process(name="data_writer", target=data_writer, args=(self, to_verify_queue, verification_done_queue, 25))
-        # daemon subprocesses are killed automagically when the parent process exits
-        writer.daemon = True
-        self.fixture_dtest_setup.subprocs.append(writer)
-        writer.start()
+        session = self.patient_cql_connection(self.node1, keyspace="upgrade", protocol_version=self.protocol_version)
+        load = ContinuousWriteVerifier(session, rewrite_probability=25).start()
 
         if wait_for_rowcount > 0:
-            self._wait_until_queue_condition('rows written (but not verified)', to_verify_queue, operator.ge, wait_for_rowcount, max_wait_s=max_wait_s)
-
-        verifier = Process(name="data_checker", target=data_checker, args=(self, to_verify_queue, verification_done_queue))
-        # daemon subprocesses are killed automagically when the parent process exits
-        verifier.daemon = True
-        self.fixture_dtest_setup.subprocs.append(verifier)
-        verifier.start()
+            try:
+                load.wait_for_writes(wait_for_rowcount, max_wait_s=max_wait_s)
+            except Exception:
+                load.stop()
+                raise
 
-        return writer, verifier, to_verify_queue
+        return load
 
     def _start_continuous_counter_increment_and_verify(self, wait_for_rowcount=0, max_wait_s=600):
         """
@@ -7,7 +7,7 @@ from cassandra.query import SimpleStatement
 
 from dtest import Tester
 from thrift_bindings.thrift010 import ttypes as thrift_types
-from thrift_test import get_thrift_client
+from tools.thrift_client import get_thrift_client
 from tools.jmxutils import (JolokiaAgent, make_mbean)
 
 since = pytest.mark.since